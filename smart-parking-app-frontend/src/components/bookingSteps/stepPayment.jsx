@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react'
+import React, { useState, useEffect, useRef } from 'react'
 import { createReservation } from '../../services/reservationService'
 import { initiateOnlinePayment } from '../../services/paymentService'
 import { useNavigate, useLocation } from 'react-router-dom'
@@ -24,6 +24,19 @@ const StepPayment = ({ locationId, vehicleTypeId, selectedSlot, date, time, vehi
   const [selectedMethod, setSelectedMethod] = useState('cash')
   const [billingPhone, setBillingPhone] = useState('')
   const [loading, setLoading] = useState(false)
+  // Reused when a failed cash booking is retried, so a lost response cannot book twice
+  const cashBookingKey = useRef(crypto.randomUUID())
+
+  // Idempotency-Key for opening a checkout: kept for the same payload, so a double
+  // submit or a retry replays the first checkout instead of opening another
+  const checkoutKeyFor = (paymentPayload) => {
+    const body = JSON.stringify(paymentPayload)
+    const saved = JSON.parse(sessionStorage.getItem('pendingCheckout') || 'null')
+    if (saved?.body === body) return saved.key
+    const key = crypto.randomUUID()
+    sessionStorage.setItem('pendingCheckout', JSON.stringify({ key, body }))
+    return key
+  }
 
   // Detect if redirected after payment
   useEffect(() => {
@@ -34,9 +47,12 @@ const StepPayment = ({ locationId, vehicleTypeId, selectedSlot, date, time, vehi
       const cached = sessionStorage.getItem('pendingReservation')
       if (cached) {
         const reservationData = JSON.parse(cached)
-        createReservation(reservationData)
+        const reservationKey = sessionStorage.getItem('pendingReservationKey')
+        createReservation(reservationData, reservationKey)
           .then(() => {
             sessionStorage.removeItem('pendingReservation')
+            sessionStorage.removeItem('pendingReservationKey')
+            sessionStorage.removeItem('pendingCheckout')
             alert('✅ Payment successful and reservation saved!')
             navigate('/reservations')
           })
@@ -68,7 +84,8 @@ const StepPayment = ({ locationId, vehicleTypeId, selectedSlot, date, time, vehi
           mode_of_payment: methodLabel,
           is_paid: false,
         }
-        await createReservation(payload)
+        await createReservation(payload, cashBookingKey.current)
+        cashBookingKey.current = crypto.randomUUID()
         alert('✅ Booking confirmed!')
         navigate('/reservations')
       } catch (error) {
@@ -95,7 +112,7 @@ const StepPayment = ({ locationId, vehicleTypeId, selectedSlot, date, time, vehi
           payment_method: apiPaymentMethod, // mapped value here
         }
 
-        const result = await initiateOnlinePayment(paymentPayload)
+        const result = await initiateOnlinePayment(paymentPayload, checkoutKeyFor(paymentPayload))
         const checkoutUrl = result.checkout_url
 
         const reservationPayload = {
@@ -110,15 +127,22 @@ const StepPayment = ({ locationId, vehicleTypeId, selectedSlot, date, time, vehi
           vehicle_model: vehicleInfo.vehicleModel,
           color: vehicleInfo.color,
           mode_of_payment: methodLabel,
-          is_paid: true,
+          // Marked paid by the backend once PayMongo confirms this checkout
+          checkout_session: result.id,
         }
 
         // Save to sessionStorage before redirecting
         sessionStorage.setItem('pendingReservation', JSON.stringify(reservationPayload))
+        // Both callback paths send this key, so only one of them creates the reservation
+        sessionStorage.setItem('pendingReservationKey', crypto.randomUUID())
 
         // Redirect to payment checkout
         window.location.href = checkoutUrl
       } catch (err) {
+        // A failed or expired checkout is not worth replaying; the next attempt opens a new one
+        if (err.checkoutStatus && err.checkoutStatus !== 'creating') {
+          sessionStorage.removeItem('pendingCheckout')
+        }
         alert('❌ Failed to initiate payment.')
       } finally {
         setLoading(false)
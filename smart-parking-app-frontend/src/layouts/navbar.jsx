@@ -5,7 +5,8 @@ import useAuth from '../hooks/useAuth'
 import {
   fetchNotificationCount,
   fetchUnreadNotifications,
-  markAllNotificationsRead
+  markAllNotificationsRead,
+  subscribeToNotifications
 } from '../services/notificationService'
 
 const Navbar = () => {
@@ -21,19 +22,22 @@ const Navbar = () => {
   // Authentication hook
   const { user, logout } = useAuth()
 
-  // Fetch the count of unread notifications on load (only for regular users)
+  // Load the unread count, then keep it current from the push channel (only for regular users)
   useEffect(() => {
+    if (!user || user.is_superuser) return
     const loadCount = async () => {
-      if (user && !user.is_superuser) {
-        try {
-          const count = await fetchNotificationCount()
-          setNotifCount(count)
-        } catch (err) {
-          console.error('Failed to fetch notification count', err)
-        }
+      try {
+        const count = await fetchNotificationCount()
+        setNotifCount(count)
+      } catch (err) {
+        console.error('Failed to fetch notification count', err)
       }
     }
     loadCount()
+    return subscribeToNotifications({
+      onUnreadCount: setNotifCount,
+      onNotification: (notification) => setNotifications((prev) => [notification, ...prev]),
+    })
   }, [user])
 
   // Handle logout and redirect
@@ -39,6 +39,7 @@ const AddEditLocation = () => {
   const [form, setForm] = useState({
     name: '',
     address: '',
+    no_show_grace_minutes: '', // Blank uses the server default
     slot_pricings: [], // Nested array for different pricing combinations
   })
 
@@ -66,6 +67,7 @@ const AddEditLocation = () => {
             setForm({
               name: existing.name,
               address: existing.address,
+              no_show_grace_minutes: existing.no_show_grace_minutes ?? '',
               slot_pricings: normalizedSlots,
             })
           } else {
@@ -94,7 +96,7 @@ const AddEditLocation = () => {
     }
   }, [id])
 
-  // Handle input field changes for name and address
+  // Handle input field changes for name, address and grace period
   const handleChange = (e) => {
     const { name, value } = e.target
     setForm((prev) => ({ ...prev, [name]: value }))
@@ -116,12 +118,16 @@ const AddEditLocation = () => {
     setError(null)
 
     try {
+      const payload = {
+        ...form,
+        no_show_grace_minutes: form.no_show_grace_minutes === '' ? null : Number(form.no_show_grace_minutes),
+      }
       if (id) {
         // Update mode
-        await updateLocation(id, form)
+        await updateLocation(id, payload)
       } else {
         // Create mode
-        await createLocation(form)
+        await createLocation(payload)
       }
       navigate('/admin/home?tab=manage-parking') // Go back after success
     } catch (err) {
@@ -169,6 +175,17 @@ const AddEditLocation = () => {
           onChange={handleChange}
         />
 
+        {/* Minutes after a reservation ends before no-shows are cancelled */}
+        <FormInput
+          id="no_show_grace_minutes"
+          name="no_show_grace_minutes"
+          label="No-show Grace Period (minutes)"
+          placeholder="Default"
+          type="number"
+          value={form.no_show_grace_minutes}
+          onChange={handleChange}
+        />
+
         {/* Slot pricing section */}
         <div className="mt-6">
           <h2 className="text-lg font-semibold mb-2">Slot Pricing</h2>
@@ -300,6 +300,10 @@ const Bookings = () => {
                 </div>
               </div>
 
+              {/* Archived reservations are read-only */}
+              {selectedRes.is_archived ? (
+                <p className="mt-4 text-right text-sm text-gray-500">Archived reservation</p>
+              ) : (
               <div className="flex flex-wrap justify-end gap-3 mt-4">
                 {/* Approve button for ongoing and incoming if NOT approved */}
                 {(activeTab === 'ongoing' || activeTab === 'incoming') && !selectedRes.is_approved && (
@@ -358,6 +362,7 @@ const Bookings = () => {
                   </button>
                 )}
               </div>
+              )}
             </div>
           </div>
         </>
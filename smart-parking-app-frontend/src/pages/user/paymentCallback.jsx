@@ -13,9 +13,12 @@ const PaymentCallback = () => {
     const cached = sessionStorage.getItem('pendingReservation') // Retrieve saved reservation data
     if (cached) {
       const reservationData = JSON.parse(cached)
-      createReservation(reservationData) // Create reservation after payment success
+      const reservationKey = sessionStorage.getItem('pendingReservationKey')
+      createReservation(reservationData, reservationKey) // Create reservation after payment success
         .then(() => {
           sessionStorage.removeItem('pendingReservation') // Clear cache on success
+          sessionStorage.removeItem('pendingReservationKey')
+          sessionStorage.removeItem('pendingCheckout')
           alert('✅ Payment successful and reservation saved!')
         })
         .catch(() => {
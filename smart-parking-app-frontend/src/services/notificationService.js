@@ -30,4 +30,44 @@ export const markAllNotificationsRead = async () => {
     console.error('Error marking notifications as read:', err.response?.data || err.message)
     throw err
   }
-}
\ No newline at end of file
+}
+
+// Fetch one page of notification history; pass the returned nextCursor to get the next page
+export const fetchNotificationFeed = async ({ cursor, status = 'all', pageSize } = {}) => {
+  try {
+    const res = await axiosInstance.get('/notifications/', {
+      params: { cursor, status, page_size: pageSize }
+    })
+    return { notifications: res.data.data, nextCursor: res.data.next_cursor }
+  } catch (err) {
+    console.error('Error fetching notifications:', err.response?.data || err.message)
+    throw err
+  }
+}
+
+// Mark specific notifications (ids) or everything up to an id (upToId) as read
+export const markNotificationsRead = async ({ ids, upToId } = {}) => {
+  try {
+    await axiosInstance.patch('/notifications/mark-read/', { ids, up_to_id: upToId })
+  } catch (err) {
+    console.error('Error marking notifications as read:', err.response?.data || err.message)
+    throw err
+  }
+}
+
+// Subscribe to pushed notifications and unread-count changes (server-sent events).
+// EventSource resumes from the last received id on reconnect. Returns an unsubscribe function.
+// The stream is only served when the backend runs under ASGI, so it is opt-in (VITE_NOTIFICATION_STREAM=1).
+export const subscribeToNotifications = ({ onNotification, onUnreadCount }) => {
+  if (import.meta.env.VITE_NOTIFICATION_STREAM !== '1') return () => {}
+  const auth = localStorage.getItem('auth')
+  if (!auth) return () => {}
+  const { access } = JSON.parse(auth)
+  const source = new EventSource(
+    `${import.meta.env.VITE_API_BASE_URL}/notifications/stream/?token=${encodeURIComponent(access)}`
+  )
+  source.addEventListener('notification', (e) => onNotification?.(JSON.parse(e.data)))
+  source.addEventListener('unread_count', (e) => onUnreadCount?.(JSON.parse(e.data).unread_count))
+  source.onerror = () => console.error('Notification stream interrupted, reconnecting')
+  return () => source.close()
+}
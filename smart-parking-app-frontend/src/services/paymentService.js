@@ -1,12 +1,33 @@
 import axiosInstance from './axiosInstance'
 
-// Initiate an online payment with given payload
-export const initiateOnlinePayment = async (payload) => {
+const STATUS_POLL_INTERVAL_MS = 1000
+const STATUS_POLL_ATTEMPTS = 60
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms))
+
+// Initiate an online payment with given payload.
+// Retrying with the same idempotency key returns the original checkout session.
+// The checkout is created in the background, so poll until it is ready.
+export const initiateOnlinePayment = async (payload, idempotencyKey) => {
   try {
-    const response = await axiosInstance.post('/online-payments/', payload)
-    return response.data.data
+    const response = await axiosInstance.post('/online-payments/', payload, {
+      headers: idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {},
+    })
+    let checkout = response.data.data
+    for (let attempt = 0; checkout.status === 'creating' && attempt < STATUS_POLL_ATTEMPTS; attempt++) {
+      await sleep(STATUS_POLL_INTERVAL_MS)
+      const status = await axiosInstance.get(`/online-payments/${checkout.reference_number}/`)
+      checkout = status.data.data
+    }
+    if (checkout.status !== 'pending') {
+      const error = new Error(checkout.error || 'Checkout could not be created')
+      // Still 'creating' means the worker is behind; anything else is final
+      error.checkoutStatus = checkout.status
+      throw error
+    }
+    return checkout
   } catch (error) {
     console.error('Payment Error:', error.response?.data || error.message)
     throw error
   }
-}
\ No newline at end of file
+}
@@ -3,22 +3,38 @@ import axios from 'axios'
 
 const API = import.meta.env.VITE_API_BASE_URL
 
-// Fetch all reservations (admin)
-export const getReservations = async () => {
+// Fetch reservations (admin), following cursor pages until the filtered set is exhausted
+export const getReservations = async (filters = {}) => {
   try {
-    const res = await axiosInstance.get('/admin/reservations/')
-    return res.data
+    const reservations = []
+    let cursor = null
+    do {
+      const res = await axiosInstance.get('/admin/reservations/', {
+        params: { ...filters, page_size: 200, ...(cursor ? { cursor } : {}) }
+      })
+      reservations.push(...res.data.results)
+      cursor = res.data.next_cursor
+    } while (cursor)
+    return reservations
   } catch (err) {
     console.error('Error fetching reservations:', err.response?.data || err.message)
     throw err
   }
 }
 
-// Fetch reservations for current user
-export const getMyReservations = async () => {
+// Fetch reservations for current user; `when` can be 'all', 'upcoming' or 'past'
+export const getMyReservations = async (when = 'all') => {
   try {
-    const res = await axiosInstance.get('/reservations/my/')
-    return res.data
+    const reservations = []
+    let cursor = null
+    do {
+      const res = await axiosInstance.get('/reservations/my/', {
+        params: { when, page_size: 200, ...(cursor ? { cursor } : {}) }
+      })
+      reservations.push(...res.data.results)
+      cursor = res.data.next_cursor
+    } while (cursor)
+    return reservations
   } catch (err) {
     console.error('Error fetching my reservations:', err.response?.data || err.message)
     throw err
@@ -59,13 +75,14 @@ export const checkOutReservation = async (id) => {
 }
 
 // Check slot availability
-export const checkSlotAvailability = async ({ location_id, vehicle_type_id, date, time }) => {
+export const checkSlotAvailability = async ({ location_id, vehicle_type_id, date, time, duration_hours = 1 }) => {
   try {
     const response = await axios.post(`${API}/slots/check-availability/`, {
       location_id,
       vehicle_type_id,
       date,
-      time
+      time,
+      duration_hours
     }, {
       headers: { 'Content-Type': 'application/json' }
     })
@@ -76,10 +93,13 @@ export const checkSlotAvailability = async ({ location_id, vehicle_type_id, date
   }
 }
 
-// Create reservation
-export const createReservation = async (payload) => {
+// Create reservation.
+// Retrying with the same idempotency key never books twice.
+export const createReservation = async (payload, idempotencyKey) => {
   try {
-    const response = await axiosInstance.post('/reservations/create/', payload)
+    const response = await axiosInstance.post('/reservations/create/', payload, {
+      headers: idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {},
+    })
     return response.data
   } catch (err) {
     console.error('Error creating reservation:', err.response?.data || err.message)
@@ -120,6 +140,20 @@ export const markPaidReservation = async (id) => {
   }
 }
 
+// Apply one action to many reservations (admin).
+// action: 'approve' | 'mark_paid' | 'check_in' | 'check_out' | 'cancel'
+// target: { ids: [...] } or { filter: { status, location_id, start_date, end_date, mode_of_payment } }
+// Returns per-id outcomes; with a filter, repeat while has_more is true.
+export const bulkReservationAction = async (action, target) => {
+  try {
+    const res = await axiosInstance.post('/admin/reservations/bulk/', { action, ...target })
+    return res.data
+  } catch (err) {
+    console.error(`Error applying ${action} to reservations:`, err.response?.data || err.message)
+    throw err
+  }
+}
+
 // Fetch dashboard summary (admin)
 export const fetchDashboardSummary = async () => {
   try {
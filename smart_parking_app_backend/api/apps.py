@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Keep the reference data version current on catalogue changes
+        from . import signals  # noqa: F401
+        # Register background task handlers for views and the task worker
+        from . import tasks  # noqa: F401
@@ -0,0 +1,91 @@
+import json
+from functools import wraps
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.utils.translation import gettext_lazy as _
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated, ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+# DRF views cannot be coroutines, so the async read endpoints are plain Django
+# async views. `async_api_view` gives them the parts of @api_view they rely on:
+# JWT authentication, the allowed methods, and DRF-shaped JSON errors.
+
+
+class AsyncJWTAuthentication(JWTAuthentication):
+    # Same checks as JWTAuthentication.get_user, with the user loaded by the async ORM
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        raw_token = self.get_raw_token(header) if header else None
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+        try:
+            user = await get_user_model().objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+        except get_user_model().DoesNotExist as e:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    # Rendered like a DRF Response so both versions of a view send the same bytes
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def _error_response(request, exc):
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = json_response(data, exc.status_code)
+    if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+        response['WWW-Authenticate'] = AsyncJWTAuthentication().authenticate_header(request)
+    return response
+
+
+def request_data(request):
+    # Request body for JSON and form posts, as DRF's default parsers read it
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError as e:
+            raise ParseError(f"JSON parse error - {e}")
+    return request.POST
+
+
+def async_api_view(methods, authenticated=False):
+    # Like @api_view(methods) plus @permission_classes([IsAuthenticated]) when
+    # `authenticated`; otherwise a token is still checked when one is sent
+    allowed = set(methods) | ({'HEAD'} if 'GET' in methods else set())
+
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                if request.method not in allowed:
+                    return json_response(
+                        {'detail': f'Method "{request.method}" not allowed.'}, status.HTTP_405_METHOD_NOT_ALLOWED
+                    )
+                user = await AsyncJWTAuthentication().aauthenticate(request)
+                if user is not None:
+                    request.user = user
+                elif authenticated:
+                    raise NotAuthenticated()
+                return await view(request, *args, **kwargs)
+            except APIException as e:
+                return _error_response(request, e)
+        return wrapper
+    return decorator
@@ -0,0 +1,47 @@
+# Benchmarks run through `python manage.py benchmark <name>`.
+# Each benchmark module exposes `run(stdout, options)`.
+
+import statistics
+from contextlib import contextmanager
+from time import perf_counter
+from django.db import connection
+
+
+@contextmanager
+def temporary_database():
+    # Run against a throwaway test database so the real db.sqlite3 is untouched
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def percentile(sorted_values, fraction):
+    # Nearest-rank percentile of an already sorted list
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def timing_stats(timings):
+    timings = sorted(timings)
+    return {
+        'mean_ms': statistics.fmean(timings),
+        'p50_ms': percentile(timings, 0.50),
+        'p95_ms': percentile(timings, 0.95),
+        'p99_ms': percentile(timings, 0.99),
+        'max_ms': timings[-1],
+    }
+
+
+def measure(func, repeat=50):
+    # Call `func` `repeat` times and return timing statistics in milliseconds
+    timings = []
+    for _ in range(repeat):
+        started = perf_counter()
+        func()
+        timings.append((perf_counter() - started) * 1000)
+    return timing_stats(timings)
+
+
+def format_stats(label, stats):
+    return f"{label:<28} mean {stats['mean_ms']:8.3f} ms   p50 {stats['p50_ms']:8.3f} ms   max {stats['max_ms']:8.3f} ms"
@@ -0,0 +1,55 @@
+import random
+from datetime import date, timedelta
+from django.db.models import Count
+from ..models import ArchivedNotification, ArchivedReservation, DailyReservationRollup, Notification, Reservation
+from ..services import archive, notifications, rollups
+from . import dataset, temporary_database
+
+DEFAULT_RESERVATIONS = 50_000
+# Days of generated history, half of it before today
+DAYS = 120
+# Chunk sizes compared; each run archives a further slice of the history
+CHUNK_SIZES = [250, 1000, 5000]
+
+
+def table_sizes():
+    return (
+        f"live {Reservation.objects.count()} reservations / {Notification.objects.count()} notifications, "
+        f"archive {ArchivedReservation.objects.count()} / {ArchivedNotification.objects.count()}"
+    )
+
+
+def run(stdout, options):
+    rng = random.Random(options['seed'])
+    count = options['reservations'] or DEFAULT_RESERVATIONS
+    today = date.today()
+
+    with temporary_database():
+        dataset.generate(rng, today, reservations=count, days=DAYS)
+        counters = sorted(DailyReservationRollup.objects.values_list('date', 'location_id', 'created', 'paid'))
+        stdout.write(table_sizes())
+
+        # Archive the past half of the history in equal slices, oldest first
+        first_day = today - timedelta(days=DAYS // 2)
+        step = (DAYS // 2) // len(CHUNK_SIZES)
+        for i, chunk_size in enumerate(CHUNK_SIZES, start=1):
+            report = archive.archive(first_day + timedelta(days=step * i), chunk_size)
+            stdout.write(
+                f"{f'chunk size {chunk_size}':<28} {report['reservations']:7d} reservations "
+                f"{report['notifications']:7d} notifications   {report['rows_per_second']:10.0f} rows/s"
+            )
+        stdout.write(table_sizes())
+
+        # Nothing may be lost or double counted on the way
+        if Notification.objects.filter(reservation__date__lt=first_day + timedelta(days=step * len(CHUNK_SIZES))).exists():
+            raise AssertionError("Notifications of archived reservations were left behind")
+        if notifications.reconcile():
+            raise AssertionError("Unread counters drifted while archiving")
+        rollups.rebuild()
+        if sorted(DailyReservationRollup.objects.values_list('date', 'location_id', 'created', 'paid')) != counters:
+            raise AssertionError("Rollups rebuilt from live and archived rows disagree with the originals")
+        duplicated = ArchivedReservation.objects.filter(
+            id__in=Reservation.objects.values('id')
+        ).aggregate(count=Count('id'))['count']
+        if duplicated:
+            raise AssertionError(f"{duplicated} reservations are both live and archived")
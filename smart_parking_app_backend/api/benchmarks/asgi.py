@@ -0,0 +1,209 @@
+import asyncio
+import json
+import random
+import threading
+from contextlib import contextmanager
+from datetime import date, timedelta
+from time import perf_counter, sleep
+from urllib.parse import urlencode
+from django.core.management.base import CommandError
+from django.test import override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework_simplejwt.tokens import AccessToken
+from smart_parking_app_backend.asgi import application
+from ..urls import urlconf_with_reads
+from . import dataset, temporary_database, timing_stats
+from .endpoints import Fixture
+
+# Concurrent throughput of the read endpoints served by their sync views and by
+# their async versions (ASYNC_READ_VIEWS), both under the project's ASGI app.
+#
+# The temporary database lives in memory, so the server runs in this process:
+# uvicorn in a background thread by default, or with `--transport inprocess`
+# the ASGI app is called directly, leaving out sockets and HTTP parsing.
+
+DEFAULT_RESERVATIONS = 20_000
+DEFAULT_CONCURRENCY = 32
+
+
+def read_requests(f):
+    # (name, method, path, query or JSON body, authenticated)
+    day = str(f.anchor + timedelta(days=3))
+    return [
+        ('GET data/locations-vehicles', 'GET', '/api/data/locations-vehicles/', None, False),
+        ('GET locations', 'GET', '/api/locations/', None, False),
+        ('POST slots/check-availability', 'POST', '/api/slots/check-availability/', {
+            'location_id': f.location.id, 'vehicle_type_id': f.vehicle_type_id,
+            'date': day, 'time': '09:00', 'duration_hours': 2,
+        }, False),
+        ('GET user/profile', 'GET', '/api/user/profile/', None, True),
+        ('GET reservations/my', 'GET', '/api/reservations/my/', None, True),
+        ('GET notifications/count', 'GET', '/api/notifications/count/', None, True),
+    ]
+
+
+def _encode(method, path, data, token):
+    # (method, path, query string, headers, body) as sent on the wire
+    headers = {}
+    query, body = '', b''
+    if token:
+        headers['authorization'] = f'Bearer {token}'
+    if method == 'GET':
+        query = urlencode(data or {})
+    else:
+        body = json.dumps(data or {}).encode()
+        headers['content-type'] = 'application/json'
+    return method, path, query, headers, body
+
+
+async def _open_socket(host, port):
+    # One keep-alive HTTP/1.1 connection; returns a coroutine function sending a
+    # request and returning the response status once the body is read
+    reader, writer = await asyncio.open_connection(host, port)
+
+    async def exchange(method, path, query, headers, body):
+        target = f'{path}?{query}' if query else path
+        lines = [f'{method} {target} HTTP/1.1', f'host: {host}:{port}', f'content-length: {len(body)}']
+        lines += [f'{name}: {value}' for name, value in headers.items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        length, chunked = 0, False
+        while (line := await reader.readline()) not in (b'\r\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+            elif name.lower() == 'transfer-encoding':
+                chunked = 'chunked' in value.lower()
+        if chunked:
+            while size := int((await reader.readline()).split(b';')[0], 16):
+                await reader.readexactly(size + 2)
+            await reader.readline()
+        else:
+            await reader.readexactly(length)
+        return status
+    return exchange
+
+
+async def _open_inprocess():
+    async def exchange(method, path, query, headers, body):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+            'query_string': query.encode(), 'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'content-length', str(len(body)).encode())]
+            + [(name.encode(), value.encode()) for name, value in headers.items()],
+            'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+        }
+        received = False
+        status = None
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            # The client never disconnects; Django cancels this wait when done
+            await asyncio.Future()
+
+        async def send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+
+        await application(scope, receive, send)
+        return status
+    return exchange
+
+
+@contextmanager
+def uvicorn_server():
+    try:
+        import uvicorn
+    except ImportError:
+        raise CommandError("uvicorn is not installed: pip install uvicorn, or run with --transport inprocess")
+    server = uvicorn.Server(uvicorn.Config(application, host='127.0.0.1', port=0, lifespan='off', log_level='warning'))
+    # Signal handlers are only installed from the main thread, so this stays quiet
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise CommandError("uvicorn failed to start")
+        sleep(0.01)
+    try:
+        yield server.servers[0].sockets[0].getsockname()[:2]
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+async def _connection(open_connection, request, count, timings):
+    exchange = await open_connection()
+    for _ in range(count):
+        started = perf_counter()
+        status = await exchange(*request)
+        if status >= 400:
+            raise CommandError(f"{request[0]} {request[1]} returned {status}")
+        timings.append((perf_counter() - started) * 1000)
+
+
+async def _load(open_connection, request, concurrency, per_connection):
+    # Requests per second and latency with `concurrency` clients in flight
+    await _connection(open_connection, request, 1, [])
+    timings = []
+    started = perf_counter()
+    await asyncio.gather(*(
+        _connection(open_connection, request, per_connection, timings) for _ in range(concurrency)
+    ))
+    elapsed = perf_counter() - started
+    return {'rps': len(timings) / elapsed, **timing_stats(timings)}
+
+
+def measure(open_connection, requests, concurrency, per_connection):
+    # Each version serves every request in turn; the URLconf is process-wide,
+    # so a server thread picks up the switch too
+    results = {}
+    for async_reads in (False, True):
+        with override_settings(ROOT_URLCONF=urlconf_with_reads(async_reads)):
+            for name, request in requests.items():
+                results[(name, async_reads)] = asyncio.run(
+                    _load(open_connection, request, concurrency, per_connection)
+                )
+    return results
+
+
+def run(stdout, options):
+    rng = random.Random(options['seed'])
+    count = options['reservations'] or DEFAULT_RESERVATIONS
+    concurrency = options.get('concurrency') or DEFAULT_CONCURRENCY
+    transport = options.get('transport') or 'uvicorn'
+
+    setup_test_environment()
+    try:
+        with temporary_database():
+            summary = dataset.generate(rng, date.today(), reservations=count, users=200, locations=10)
+            stdout.write(f"Seeded {summary['reservations']} reservations and {summary['notifications']} notifications")
+            fixture = Fixture(date.today())
+            token = str(AccessToken.for_user(fixture.user))
+            requests = {
+                name: _encode(method, path, data, token if authenticated else None)
+                for name, method, path, data, authenticated in read_requests(fixture)
+            }
+            if transport == 'uvicorn':
+                with uvicorn_server() as (host, port):
+                    results = measure(lambda: _open_socket(host, port), requests, concurrency, options['repeat'])
+            else:
+                results = measure(_open_inprocess, requests, concurrency, options['repeat'])
+    finally:
+        teardown_test_environment()
+
+    stdout.write(f"{transport}, {concurrency} concurrent connections, {options['repeat']} requests each")
+    stdout.write(
+        f"{'endpoint':<32} {'sync req/s':>11} {'async req/s':>12} {'change':>8} {'sync p95':>9} {'async p95':>10}"
+    )
+    for name in requests:
+        sync, async_ = results[(name, False)], results[(name, True)]
+        stdout.write(
+            f"{name:<32} {sync['rps']:11.0f} {async_['rps']:12.0f} {async_['rps'] / sync['rps'] - 1:+8.0%} "
+            f"{sync['p95_ms']:9.2f} {async_['p95_ms']:10.2f}"
+        )
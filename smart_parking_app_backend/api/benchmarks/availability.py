@@ -0,0 +1,82 @@
+import random
+from datetime import date, datetime, time, timedelta
+from ..models import Location, Reservation, SlotType, VehicleType
+from ..services import availability
+from . import format_stats, measure, temporary_database
+
+DEFAULT_RESERVATIONS = 500
+
+
+def legacy_overlap_counts(location_id, vehicle_type_id, search_date, search_time):
+    # Per-row loop previously used by check_slot_availability
+    search_start = datetime.combine(search_date, search_time)
+    search_end = search_start + timedelta(hours=1)
+    reservations = Reservation.objects.filter(
+        location_id=location_id,
+        vehicle_type_id=vehicle_type_id,
+        date=search_date,
+        is_cancelled=False
+    )
+    overlapping_counts = {}
+    for res in reservations:
+        res_start = datetime.combine(res.date, res.time)
+        res_end = res_start + timedelta(hours=res.duration_hours)
+        if res_start < search_end and search_start < res_end:
+            key = res.slot_type.id
+            overlapping_counts[key] = overlapping_counts.get(key, 0) + 1
+    return overlapping_counts
+
+
+def seed(count, rng, search_date):
+    location = Location.objects.create(name='Benchmark Lot', address='1 Benchmark Ave')
+    vehicle_type = VehicleType.objects.create(name='Car')
+    slot_types = [SlotType.objects.create(name=name) for name, _ in SlotType.SLOT_CHOICES]
+    Reservation.objects.bulk_create([
+        Reservation(
+            location=location,
+            slot_type=rng.choice(slot_types),
+            vehicle_type=vehicle_type,
+            date=search_date,
+            time=time(rng.randrange(0, 23), rng.choice([0, 15, 30, 45])),
+            duration_hours=rng.randint(1, 4),
+            plate_number=f'BEN{i:05d}',
+            vehicle_make='Make',
+            vehicle_model='Model',
+            color='Gray',
+            mode_of_payment='Cash',
+            is_cancelled=rng.random() < 0.1,
+        )
+        for i in range(count)
+    ], batch_size=1000)
+    return location.id, vehicle_type.id
+
+
+def run(stdout, options):
+    rng = random.Random(options['seed'])
+    count = options['reservations'] or DEFAULT_RESERVATIONS
+    search_date = date.today()
+    search_time = time(12, 0)
+
+    with temporary_database():
+        location_id, vehicle_type_id = seed(count, rng, search_date)
+        args = (location_id, vehicle_type_id, search_date, search_time)
+
+        expected = legacy_overlap_counts(*args)
+        index = availability.build_index(location_id, vehicle_type_id, search_date)
+        offset = search_time.hour * 3600
+        actual = {k: v for k, v in index.count_overlapping(offset, offset + 3600).items() if v}
+        if expected != actual:
+            raise AssertionError(f"Index disagrees with legacy loop: {actual} != {expected}")
+
+        stdout.write(f"{count} reservations on {search_date}")
+        stdout.write(format_stats('legacy loop', measure(
+            lambda: legacy_overlap_counts(*args), options['repeat'])))
+        stdout.write(format_stats('index build (cold)', measure(
+            lambda: availability.build_index(location_id, vehicle_type_id, search_date), options['repeat'])))
+        stdout.write(format_stats('overlap count (warm)', measure(
+            lambda: index.count_overlapping(offset, offset + 3600), options['repeat'])))
+        availability.clear_indexes()
+        availability.peak_occupancy(*args, duration_hours=6)
+        stdout.write(format_stats('6h peak sweep (warm)', measure(
+            lambda: availability.peak_occupancy(*args, duration_hours=6), options['repeat'])))
+        availability.clear_indexes()
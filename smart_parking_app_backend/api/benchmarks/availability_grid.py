@@ -0,0 +1,68 @@
+import random
+from datetime import date, time, timedelta
+from ..models import Location, Reservation, SlotPricing, SlotType, VehicleType
+from ..services.availability_grid import build_availability_grid, free_slot_columns
+from . import format_stats, measure, temporary_database
+
+DEFAULT_RESERVATIONS = 100_000
+LOCATIONS = 10
+SPREAD_DAYS = 90
+
+
+def seed(count, rng, first_date):
+    locations = Location.objects.bulk_create([
+        Location(name=f'Grid Lot {i}', address=f'{i} Grid Ave') for i in range(LOCATIONS)
+    ])
+    vehicle_types = VehicleType.objects.bulk_create([VehicleType(name='Car'), VehicleType(name='Motorcycle')])
+    slot_types = [SlotType.objects.create(name=name) for name, _ in SlotType.SLOT_CHOICES]
+    SlotPricing.objects.bulk_create([
+        SlotPricing(location_id=location, slot_type_id=slot_type, vehicle_type_id=vehicle_type,
+                    rate_per_hour='50.00', available_slots=200)
+        for location in locations for slot_type in slot_types for vehicle_type in vehicle_types
+    ])
+    Reservation.objects.bulk_create([
+        Reservation(
+            location=rng.choice(locations),
+            slot_type=rng.choice(slot_types),
+            vehicle_type=rng.choice(vehicle_types),
+            date=first_date + timedelta(days=rng.randrange(SPREAD_DAYS)),
+            time=time(rng.randrange(0, 24), rng.choice([0, 30])),
+            duration_hours=rng.randint(1, 8),
+            plate_number=f'GRD{i:06d}',
+            vehicle_make='Make',
+            vehicle_model='Model',
+            color='Gray',
+            mode_of_payment='Cash',
+            is_cancelled=rng.random() < 0.1,
+        )
+        for i in range(count)
+    ], batch_size=2000)
+    return locations[0].id, vehicle_types[0].id
+
+
+def run(stdout, options):
+    rng = random.Random(options['seed'])
+    count = options['reservations'] or DEFAULT_RESERVATIONS
+    first_date = date.today()
+
+    with temporary_database():
+        location_id, vehicle_type_id = seed(count, rng, first_date)
+        start_date = first_date + timedelta(days=SPREAD_DAYS // 2)
+        grid = build_availability_grid(location_id, vehicle_type_id, start_date, 7)
+        shape = (len(grid['grid']), len(grid['grid'][0]), len(grid['slot_types']))
+
+        stdout.write(f"{count} reservations over {SPREAD_DAYS} days, grid shape {shape}")
+        stdout.write(format_stats('7 x 24 grid (end to end)', measure(
+            lambda: build_availability_grid(location_id, vehicle_type_id, start_date, 7), options['repeat'])))
+
+        # Array work alone, separated from the database round trip
+        pricings = list(SlotPricing.objects.filter(location_id=location_id, vehicle_type_id=vehicle_type_id))
+        rows = list(Reservation.objects.filter(
+            location_id=location_id,
+            vehicle_type_id=vehicle_type_id,
+            date__range=(start_date - timedelta(days=1), start_date + timedelta(days=6)),
+            is_cancelled=False
+        ).values_list('slot_type_id', 'date', 'time', 'duration_hours'))
+        stdout.write(f"{len(rows)} rows in range")
+        stdout.write(format_stats('7 x 24 grid (arrays only)', measure(
+            lambda: free_slot_columns(pricings, rows, start_date, 7), options['repeat'])))
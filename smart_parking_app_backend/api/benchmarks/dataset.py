@@ -0,0 +1,143 @@
+# Deterministic synthetic dataset shared by `manage.py seed_data` and the
+# endpoint benchmark. The same seed, sizes and anchor date always produce
+# the same rows.
+
+from datetime import time, timedelta
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from ..models import Location, Notification, Reservation, SlotPricing, SlotType, VehicleType
+from ..services import availability, notifications, occupancy, reference_data, rollups
+
+DEFAULTS = {
+    'locations': 25,
+    'users': 500,
+    'reservations': 100_000,
+    'days': 120,
+}
+BATCH_SIZE = 5000
+PASSWORD = 'benchmark-pass'
+ADMIN_USERNAME = 'benchmark_admin'
+
+VEHICLE_TYPES = ['Car', 'Motorcycle', 'SUV', 'Van']
+VEHICLES = [('Toyota', 'Vios'), ('Honda', 'City'), ('Mitsubishi', 'Montero'), ('Ford', 'Ranger'), ('Yamaha', 'NMAX')]
+COLORS = ['White', 'Black', 'Silver', 'Red', 'Blue', 'Gray']
+PAYMENT_MODES = [('Cash', 6), ('GCash', 4)]
+# Arrival hours weighted towards the working day, and mostly short stays
+HOUR_WEIGHTS = [1] * 6 + [4, 8, 10, 9, 8, 8, 9, 8, 7, 7, 6, 6, 5, 4, 3, 2] + [1] * 2
+DURATION_WEIGHTS = [30, 25, 15, 10, 6, 5, 4, 5]
+NOTIFICATION_RATE = 0.3
+
+
+def _plate(rng):
+    letters = ''.join(rng.choice('ABCDEFGHJKLMNPRSTUVWXYZ') for _ in range(3))
+    return f'{letters} {rng.randrange(1000, 10000)}'
+
+
+def _reference_data(rng, location_count):
+    slot_types = [SlotType.objects.get_or_create(name=name)[0] for name, _ in SlotType.SLOT_CHOICES]
+    vehicle_types = [VehicleType.objects.get_or_create(name=name)[0] for name in VEHICLE_TYPES]
+    locations = Location.objects.bulk_create([
+        Location(name=f'Lot {i + 1:03d}', address=f'{rng.randrange(1, 999)} Street {i + 1}, District {i % 7 + 1}')
+        for i in range(location_count)
+    ])
+    SlotPricing.objects.bulk_create([
+        SlotPricing(
+            location_id=location, slot_type_id=slot_type, vehicle_type_id=vehicle_type,
+            rate_per_hour=rng.choice([20, 30, 40, 50, 60]) * (1 + slot_index),
+            available_slots=rng.randrange(20, 200)
+        )
+        for location in locations
+        for slot_index, slot_type in enumerate(slot_types)
+        for vehicle_type in vehicle_types
+    ], batch_size=BATCH_SIZE)
+    return locations, slot_types, vehicle_types
+
+
+def _users(count):
+    # Hash once; every generated account shares the same password
+    password = make_password(PASSWORD)
+    User.objects.bulk_create(
+        [User(username=ADMIN_USERNAME, password=password, is_staff=True)]
+        + [User(username=f'user{i:05d}', password=password, email=f'user{i:05d}@example.com') for i in range(count)],
+        batch_size=BATCH_SIZE
+    )
+    return list(User.objects.filter(is_staff=False, username__startswith='user').order_by('id'))
+
+
+def _reservation(rng, users, locations, slot_types, vehicle_types, first_day, days, anchor):
+    day = first_day + timedelta(days=rng.randrange(days))
+    past = day < anchor
+    cancelled = rng.random() < 0.08
+    approved = not cancelled and rng.random() < (0.95 if past else 0.6)
+    arrived = past and approved and rng.random() < 0.9
+    make, model = rng.choice(VEHICLES)
+    return Reservation(
+        user=rng.choice(users),
+        location=rng.choice(locations),
+        slot_type=rng.choices(slot_types, weights=[6, 3, 1])[0],
+        vehicle_type=rng.choices(vehicle_types, weights=[6, 2, 2, 1])[0],
+        date=day,
+        time=time(rng.choices(range(24), weights=HOUR_WEIGHTS)[0], rng.choice([0, 15, 30, 45])),
+        duration_hours=rng.choices(range(1, 9), weights=DURATION_WEIGHTS)[0],
+        plate_number=_plate(rng),
+        vehicle_make=make,
+        vehicle_model=model,
+        color=rng.choice(COLORS),
+        mode_of_payment=rng.choices([mode for mode, _ in PAYMENT_MODES], weights=[w for _, w in PAYMENT_MODES])[0],
+        is_paid=approved and rng.random() < 0.8,
+        is_cancelled=cancelled,
+        is_approved=approved,
+        has_arrived=arrived,
+        has_exited=arrived and rng.random() < 0.97,
+    )
+
+
+def generate(rng, anchor, stdout=None, **sizes):
+    # Insert locations, pricings, users, reservations spread evenly around `anchor`
+    # and notifications, then rebuild every derived table from them
+    sizes = {**DEFAULTS, **{name: value for name, value in sizes.items() if value is not None}}
+    first_day = anchor - timedelta(days=sizes['days'] // 2)
+
+    with transaction.atomic():
+        locations, slot_types, vehicle_types = _reference_data(rng, sizes['locations'])
+        users = _users(sizes['users'])
+
+        created = notified = 0
+        while created < sizes['reservations']:
+            batch = [
+                _reservation(rng, users, locations, slot_types, vehicle_types, first_day, sizes['days'], anchor)
+                for _ in range(min(BATCH_SIZE, sizes['reservations'] - created))
+            ]
+            Reservation.objects.bulk_create(batch)
+            notes = [
+                Notification(
+                    user_id=reservation.user_id,
+                    reservation_id=reservation.id,
+                    message=f"Your reservation for {reservation.date} has been "
+                            f"{'cancelled' if reservation.is_cancelled else 'approved'}.",
+                    is_read=rng.random() < 0.7,
+                )
+                for reservation in batch
+                if (reservation.is_cancelled or reservation.is_approved) and rng.random() < NOTIFICATION_RATE
+            ]
+            Notification.objects.bulk_create(notes)
+            created += len(batch)
+            notified += len(notes)
+            if stdout is not None:
+                stdout.write(f"  {created} reservations, {notified} notifications")
+
+        occupancy.rebuild()
+        rollups.rebuild()
+        notifications.reconcile()
+        reference_data.bump_version()
+    availability.clear_indexes()
+
+    return {
+        'locations': len(locations),
+        'slot_pricings': len(locations) * len(slot_types) * len(vehicle_types),
+        'users': len(users) + 1,
+        'reservations': created,
+        'notifications': notified,
+        'first_day': first_day,
+    }
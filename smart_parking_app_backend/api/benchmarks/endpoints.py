@@ -0,0 +1,194 @@
+import json
+import random
+from datetime import date, timedelta
+from pathlib import Path
+from time import perf_counter
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from rest_framework_simplejwt.tokens import AccessToken
+from ..models import Location, Notification, Reservation, SlotPricing
+from . import dataset, temporary_database, timing_stats
+
+DEFAULT_RESERVATIONS = 20_000
+DEFAULT_BASELINE = Path(__file__).parent / 'baselines' / 'endpoints.json'
+# Allowed p95 slowdown against the baseline before an endpoint is flagged
+DEFAULT_TOLERANCE = 0.5
+# Smaller p95 differences are timer noise on millisecond endpoints
+MIN_REGRESSION_MS = 2.0
+
+# Endpoints left out on purpose:
+#   notifications/stream/     long-lived event stream, covered by its own tests
+#   online-payments/          calls the external payment gateway
+#   webhooks/paymongo/        covered by the payments benchmark
+#   login/, register/, token/refresh/, logout/, user/change-password/
+#                             dominated by password hashing or token rotation
+#   locations/delete/, admin/deactivate-user/, admin/activate-user/, admin import
+#                             destructive or one-shot admin operations
+
+
+class Fixture:
+    # Ids and request helpers shared by the endpoint definitions
+    def __init__(self, anchor):
+        self.anchor = anchor
+        self.admin = User.objects.get(username=dataset.ADMIN_USERNAME)
+        # The busiest user makes per-user endpoints return full pages
+        self.user = User.objects.get(pk=Reservation.objects.order_by().values('user_id').annotate(
+            reservations=Count('id')
+        ).order_by('-reservations').values_list('user_id', flat=True)[0])
+        self.location = Location.objects.order_by('id').first()
+        pricing = SlotPricing.objects.filter(location_id=self.location).order_by('id').first()
+        self.slot_type_id = pricing.slot_type_id_id
+        self.vehicle_type_id = pricing.vehicle_type_id_id
+        self._cancellable = []
+        self.notification_ids = list(Notification.objects.filter(user=self.user).order_by('-id').values_list('id', flat=True)[:20])
+        self.clients = {
+            'anonymous': Client(),
+            'user': Client(headers={'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}),
+            'admin': Client(headers={'Authorization': f'Bearer {AccessToken.for_user(self.admin)}'}),
+        }
+
+    def next_cancellable(self):
+        # Each cancel request needs a reservation that is still active
+        if not self._cancellable:
+            self._cancellable = list(Reservation.objects.filter(
+                user=self.user, is_cancelled=False
+            ).order_by('-id').values_list('id', flat=True)[:100])
+        return self._cancellable.pop()
+
+
+def endpoints(f):
+    # (name, client, method, path, body) per iteration i
+    day = str(f.anchor + timedelta(days=3))
+    slot_query = {
+        'location_id': f.location.id, 'vehicle_type_id': f.vehicle_type_id,
+        'date': day, 'time': '09:00', 'duration_hours': 2,
+    }
+    return [
+        ('GET data/locations-vehicles', 'anonymous', 'get', lambda i: ('/api/data/locations-vehicles/', None)),
+        ('GET locations', 'anonymous', 'get', lambda i: ('/api/locations/', None)),
+        ('POST slots/check-availability', 'anonymous', 'post',
+         lambda i: ('/api/slots/check-availability/', slot_query)),
+        ('GET slots/availability-grid', 'anonymous', 'get', lambda i: ('/api/slots/availability-grid/', {
+            'location_id': f.location.id, 'vehicle_type_id': f.vehicle_type_id, 'start_date': day})),
+        ('GET user/profile', 'user', 'get', lambda i: ('/api/user/profile/', None)),
+        ('GET reservations/my', 'user', 'get', lambda i: ('/api/reservations/my/', None)),
+        ('GET reservations/my upcoming', 'user', 'get', lambda i: ('/api/reservations/my/', {'when': 'upcoming'})),
+        ('POST reservations/create', 'user', 'post', lambda i: ('/api/reservations/create/', {
+            'location': f.location.id, 'slot_type': f.slot_type_id, 'vehicle_type': f.vehicle_type_id,
+            'date': str(f.anchor + timedelta(days=10 + i // 24)), 'time': f'{i % 24:02d}:00',
+            'duration_hours': 1, 'plate_number': f'BEN {i:04d}', 'vehicle_make': 'Toyota',
+            'vehicle_model': 'Vios', 'color': 'White', 'mode_of_payment': 'Cash'})),
+        ('POST reservations/<id>/cancel', 'user', 'post',
+         lambda i: (f'/api/reservations/{f.next_cancellable()}/cancel/', None)),
+        ('GET notifications/count', 'user', 'get', lambda i: ('/api/notifications/count/', None)),
+        ('GET notifications/unread', 'user', 'get', lambda i: ('/api/notifications/unread/', None)),
+        ('GET notifications', 'user', 'get', lambda i: ('/api/notifications/', None)),
+        ('PATCH notifications/mark-read', 'user', 'patch',
+         lambda i: ('/api/notifications/mark-read/', {'ids': f.notification_ids[i % 20:i % 20 + 1] or [0]})),
+        ('GET admin/reservations', 'admin', 'get', lambda i: ('/api/admin/reservations/', None)),
+        ('GET admin/reservations pending', 'admin', 'get',
+         lambda i: ('/api/admin/reservations/', {'status': 'pending'})),
+        ('GET admin/dashboard/summary', 'admin', 'get', lambda i: ('/api/admin/dashboard/summary/', None)),
+        ('GET admin/dashboard/trends', 'admin', 'get', lambda i: ('/api/admin/dashboard/trends/', {
+            'start_date': str(f.anchor - timedelta(days=29)), 'end_date': str(f.anchor)})),
+        ('GET users', 'admin', 'get', lambda i: ('/api/users/', None)),
+        ('GET admin/locations/export', 'admin', 'get', lambda i: ('/api/admin/locations/export/', None)),
+    ]
+
+
+def call(client, method, path, body):
+    if method == 'get':
+        response = client.get(path, body)
+    else:
+        response = getattr(client, method)(path, json.dumps(body or {}), content_type='application/json')
+    if response.streaming:
+        b''.join(response.streaming_content)
+    if response.status_code >= 400:
+        raise CommandError(f"{method.upper()} {path} returned {response.status_code}: {response.content[:200]!r}")
+    return response
+
+
+def measure_endpoint(client, method, request_for, repeat):
+    timings, queries = [], []
+    for i in range(repeat):
+        path, body = request_for(i)
+        with CaptureQueriesContext(connection) as captured:
+            started = perf_counter()
+            call(client, method, path, body)
+            timings.append((perf_counter() - started) * 1000)
+        queries.append(len(captured))
+    stats = timing_stats(timings)
+    return {
+        'p50_ms': round(stats['p50_ms'], 3),
+        'p95_ms': round(stats['p95_ms'], 3),
+        'p99_ms': round(stats['p99_ms'], 3),
+        'queries': max(queries),
+    }
+
+
+def compare(results, baseline, tolerance):
+    # Regressions: p95 beyond the tolerance, or any extra query per request
+    regressions = {}
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        problems = []
+        allowed = max(previous['p95_ms'] * (1 + tolerance), previous['p95_ms'] + MIN_REGRESSION_MS)
+        if result['p95_ms'] > allowed:
+            problems.append(f"p95 {previous['p95_ms']:.2f} -> {result['p95_ms']:.2f} ms")
+        if result['queries'] > previous['queries']:
+            problems.append(f"queries {previous['queries']} -> {result['queries']}")
+        if problems:
+            regressions[name] = problems
+    return regressions
+
+
+def run(stdout, options):
+    rng = random.Random(options['seed'])
+    count = options['reservations'] or DEFAULT_RESERVATIONS
+    anchor = date.today()
+    baseline_path = Path(options.get('baseline') or DEFAULT_BASELINE)
+    tolerance = options.get('tolerance')
+    tolerance = DEFAULT_TOLERANCE if tolerance is None else tolerance
+
+    setup_test_environment()
+    try:
+        with temporary_database():
+            summary = dataset.generate(rng, anchor, reservations=count, users=200, locations=10)
+            stdout.write(f"Seeded {summary['reservations']} reservations and {summary['notifications']} notifications")
+            fixture = Fixture(anchor)
+
+            results = {}
+            for name, client_name, method, request_for in endpoints(fixture):
+                client = fixture.clients[client_name]
+                # Warm caches and connections once, as a running server would be
+                call(client, method, *request_for(options['repeat']))
+                results[name] = measure_endpoint(client, method, request_for, options['repeat'])
+    finally:
+        teardown_test_environment()
+
+    baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+    stdout.write(f"{'endpoint':<34} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'base p95':>9}")
+    for name, result in results.items():
+        previous = baseline.get(name, {}).get('p95_ms')
+        stdout.write(
+            f"{name:<34} {result['p50_ms']:9.2f} {result['p95_ms']:9.2f} {result['p99_ms']:9.2f} "
+            f"{result['queries']:8d} {previous if previous is not None else '-':>9}"
+        )
+
+    if options.get('save_baseline'):
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(results, indent=2) + '\n')
+        stdout.write(f"Baseline written to {baseline_path}")
+        return
+
+    regressions = compare(results, baseline, tolerance)
+    for name, problems in regressions.items():
+        stdout.write(f"REGRESSION {name}: {'; '.join(problems)}")
+    if regressions:
+        raise CommandError(f"{len(regressions)} endpoint(s) regressed against {baseline_path}")
@@ -0,0 +1,106 @@
+import random
+from decimal import Decimal
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext
+from ..models import Location, SlotPricing, SlotType, VehicleType
+from ..serializers.location_serializers import LocationCreateSerializer
+from . import format_stats, measure, temporary_database
+
+DEFAULT_PRICINGS = 600
+# Share of submitted rows whose rate or capacity differs between the two payloads
+CHANGED_SHARE = 0.1
+
+
+def legacy_replace(location, slot_pricings_data):
+    # Delete-and-reinsert previously done by LocationCreateSerializer.update
+    location.slot_pricings.all().delete()
+    for sp_data in slot_pricings_data:
+        SlotPricing.objects.create(location_id=location, **sp_data)
+
+
+def diff_update(location, slot_pricings_data):
+    # LocationCreateSerializer.update with already-validated pricings, as the
+    # update view calls it; field validation is left out of the timing
+    serializer = LocationCreateSerializer(location)
+    serializer.update(location, {'slot_pricings': slot_pricings_data})
+    return serializer.pricing_changes
+
+
+def build_payloads(count, rng):
+    # Two pricing matrices over the same pairs that differ in a few rows,
+    # plus a handful of pairs present in only one of them
+    slot_types = list(SlotType.objects.all())
+    vehicle_types = list(VehicleType.objects.all())
+    pairs = [(slot_type, vehicle_type) for vehicle_type in vehicle_types for slot_type in slot_types][:count]
+    first, second = [], []
+    for i, (slot_type, vehicle_type) in enumerate(pairs):
+        row = {
+            'slot_type_id': slot_type,
+            'vehicle_type_id': vehicle_type,
+            'rate_per_hour': Decimal(rng.randint(20, 200)),
+            'available_slots': rng.randint(5, 100),
+        }
+        changed = dict(row)
+        if rng.random() < CHANGED_SHARE:
+            changed['rate_per_hour'] += 5
+        if i % 50 != 0:
+            first.append(row)
+        if i % 50 != 1:
+            second.append(changed)
+    return first, second
+
+
+def seed(count):
+    location = Location.objects.create(name='Benchmark Lot', address='1 Benchmark Ave')
+    SlotType.objects.bulk_create([SlotType(name=name) for name, _ in SlotType.SLOT_CHOICES])
+    vehicle_type_count = -(-count // len(SlotType.SLOT_CHOICES))
+    VehicleType.objects.bulk_create([VehicleType(name=f'Vehicle {i}') for i in range(vehicle_type_count)])
+    return location
+
+
+def alternating(update, location, payloads):
+    # Each call switches to the other payload so every run has real changes to apply
+    state = {'turn': 0}
+
+    def step():
+        with transaction.atomic():
+            update(location, payloads[state['turn'] % 2])
+        state['turn'] += 1
+    return step
+
+
+def count_queries(update, location, slot_pricings_data):
+    # The query log holds at most 9000 entries, and a full log counts as zero
+    reset_queries()
+    with CaptureQueriesContext(connection) as queries:
+        with transaction.atomic():
+            update(location, slot_pricings_data)
+    return len(queries)
+
+
+def run(stdout, options):
+    rng = random.Random(options['seed'])
+    count = options['pricings'] or DEFAULT_PRICINGS
+
+    with temporary_database():
+        location = seed(count)
+        first, second = build_payloads(count, rng)
+
+        legacy_replace(location, first)
+        changes = diff_update(location, second)
+        stdout.write(f"{len(first)} / {len(second)} pricing rows, switching applies {changes}")
+
+        # Both approaches must leave the same pricing matrix behind
+        snapshot = lambda: sorted(location.slot_pricings.values_list(
+            'slot_type_id', 'vehicle_type_id', 'rate_per_hour', 'available_slots'))
+        expected = snapshot()
+        legacy_replace(location, second)
+        if snapshot() != expected:
+            raise AssertionError("Diff update disagrees with delete-and-reinsert")
+
+        stdout.write(f"queries: legacy {count_queries(legacy_replace, location, first)}, "
+                     f"diff {count_queries(diff_update, location, second)}")
+        stdout.write(format_stats('delete and reinsert', measure(
+            alternating(legacy_replace, location, (first, second)), options['repeat'])))
+        stdout.write(format_stats('diff bulk upsert', measure(
+            alternating(diff_update, location, (first, second)), options['repeat'])))
@@ -0,0 +1,83 @@
+import random
+from datetime import date
+from time import perf_counter
+from django.db import transaction
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from ..models import CheckoutSession, DailyReservationRollup, Reservation
+from ..services import payments, rollups
+from ..testing.paymongo_stub import paid_event, signed_webhook
+from . import dataset, format_stats, temporary_database, timing_stats
+
+DEFAULT_RESERVATIONS = 5_000
+# Paid checkouts in the simulated burst, split between both ways of applying them
+BURST = 1_000
+SECRET = 'whsk_benchmark'
+
+
+def link_sessions(reservations):
+    sessions = CheckoutSession.objects.bulk_create([
+        CheckoutSession(session_id=f'cs_bench_{r.id}', reference_number=f'SPA-BENCH-{r.id}', user_id=r.user_id, amount=40)
+        for r in reservations
+    ])
+    for reservation, session in zip(reservations, sessions):
+        reservation.checkout_session = session
+    Reservation.objects.bulk_update(reservations, ['checkout_session'])
+    return [session.session_id for session in sessions]
+
+
+def legacy_apply(session_ids):
+    # What an admin clicking "mark as paid" does, one reservation at a time
+    for session_id in session_ids:
+        reservation = Reservation.objects.get(checkout_session__session_id=session_id)
+        before = rollups.contribution(reservation)
+        with transaction.atomic():
+            reservation.is_paid = True
+            reservation.save()
+            rollups.record_change(reservation, before)
+
+
+def run(stdout, options):
+    rng = random.Random(options['seed'])
+    count = options['reservations'] or DEFAULT_RESERVATIONS
+
+    setup_test_environment()
+    try:
+        with temporary_database(), override_settings(PAYMONGO_WEBHOOK_SECRET=SECRET):
+            dataset.generate(rng, date.today(), reservations=count, users=50, locations=5)
+            unpaid = list(Reservation.objects.filter(is_paid=False, is_cancelled=False).order_by('id')[:BURST])
+            session_ids = link_sessions(unpaid)
+            half = len(session_ids) // 2
+            stdout.write(f"{len(session_ids)} paid checkouts over {count} reservations")
+
+            # Webhook requests only verify and queue, so bursts stay cheap for web workers
+            client = Client()
+            timings = []
+            for session_id in session_ids[half:]:
+                body, signature = signed_webhook(paid_event(session_id), SECRET)
+                started = perf_counter()
+                response = client.post('/api/webhooks/paymongo/', body, content_type='application/json',
+                                       HTTP_PAYMONGO_SIGNATURE=signature)
+                timings.append((perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    raise AssertionError(f"Webhook returned {response.status_code}")
+            stdout.write(format_stats('webhook ingest', timing_stats(timings)))
+
+            started = perf_counter()
+            legacy_apply(session_ids[:half])
+            legacy_seconds = perf_counter() - started
+            started = perf_counter()
+            applied = payments.process_pending()
+            batch_seconds = perf_counter() - started
+            stdout.write(f"{'row by row':<28} {half / legacy_seconds:10.0f} payments/s")
+            stdout.write(f"{'batched worker':<28} {applied / batch_seconds:10.0f} payments/s")
+
+            if Reservation.objects.filter(checkout_session__isnull=False, is_paid=False).exists():
+                raise AssertionError("Some paid checkouts were not applied")
+            # Incremental rollups must agree with a rebuild from raw reservations
+            counters = sorted(DailyReservationRollup.objects.values_list('date', 'location_id', 'paid'))
+            rollups.rebuild()
+            if sorted(DailyReservationRollup.objects.values_list('date', 'location_id', 'paid')) != counters:
+                raise AssertionError("Batched payment rollups disagree with a rebuild")
+    finally:
+        teardown_test_environment()
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import threading
+import time
+from datetime import timedelta
+from functools import wraps
+from time import monotonic
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .models import IdempotencyRecord
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.05
+
+# Requests running in this process, so local duplicates wake as soon as they finish
+_inflight = {}   # record id -> threading.Event
+_inflight_lock = threading.Lock()
+
+
+def _fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def _claim(user, endpoint, key, request_hash):
+    # Insert an in-progress record, or return the existing one. Expired and
+    # abandoned records are taken over with a conditional update so that only
+    # one of several concurrent retries wins. Returns (record, claimed).
+    now = timezone.now()
+    fresh = {
+        'request_hash': request_hash,
+        'is_complete': False,
+        'response_status': None,
+        'response_body': None,
+        'created_at': now,
+        'expires_at': now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+    }
+    try:
+        with transaction.atomic():
+            return IdempotencyRecord.objects.create(user=user, endpoint=endpoint, key=key, **fresh), True
+    except IntegrityError:
+        pass
+
+    record = IdempotencyRecord.objects.filter(user=user, endpoint=endpoint, key=key).first()
+    if record is None:
+        return None, False
+    abandoned = record.expires_at <= now or (
+        not record.is_complete and record.created_at <= now - timedelta(seconds=settings.IDEMPOTENCY_STALE_AFTER)
+    )
+    if abandoned:
+        if IdempotencyRecord.objects.filter(pk=record.pk, created_at=record.created_at).update(**fresh):
+            for name, value in fresh.items():
+                setattr(record, name, value)
+            return record, True
+        return None, False
+    return record, False
+
+
+def _wait_for(record):
+    # Block until the in-flight request completes; None if it failed and released the key
+    event = _inflight.get(record.id)
+    deadline = monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+    while monotonic() < deadline:
+        if event is not None:
+            event.wait(POLL_INTERVAL)
+        else:
+            time.sleep(POLL_INTERVAL)
+        current = IdempotencyRecord.objects.filter(pk=record.id).first()
+        if current is None or current.is_complete:
+            return current
+    return record
+
+
+def _complete(record, response):
+    body = json.loads(json.dumps(response.data, cls=DjangoJSONEncoder))
+    IdempotencyRecord.objects.filter(pk=record.id).update(
+        is_complete=True, response_status=response.status_code, response_body=body
+    )
+
+
+def _execute(view, record, atomic, request, *args, **kwargs):
+    event = threading.Event()
+    with _inflight_lock:
+        _inflight[record.id] = event
+    try:
+        # Server errors are not stored so the client can retry with the same key
+        if atomic:
+            # The side effects and the stored response commit together
+            with transaction.atomic():
+                response = view(request, *args, **kwargs)
+                if response.status_code < 500:
+                    _complete(record, response)
+        else:
+            response = view(request, *args, **kwargs)
+            if response.status_code < 500:
+                _complete(record, response)
+        if response.status_code >= 500:
+            IdempotencyRecord.objects.filter(pk=record.id).delete()
+        return response
+    except Exception:
+        IdempotencyRecord.objects.filter(pk=record.id).delete()
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(record.id, None)
+        event.set()
+
+
+def _replay(record):
+    response = Response(record.response_body, status=record.response_status)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(atomic=False):
+    # Decorate an authenticated DRF view so requests carrying an Idempotency-Key
+    # run at most once per (user, endpoint, key) and repeats get the stored
+    # response. With atomic=True the view's writes and the stored response are
+    # committed in one transaction; leave it off for views calling external services.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key or not request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return Response({"error": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters."},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+            endpoint = request.resolver_match.url_name
+            request_hash = _fingerprint(request)
+            for _ in range(3):
+                record, claimed = _claim(request.user, endpoint, key, request_hash)
+                if claimed:
+                    return _execute(view, record, atomic, request, *args, **kwargs)
+                if record is None:
+                    continue
+                if record.request_hash != request_hash:
+                    return Response({"error": f"{HEADER} was already used for a different request."},
+                                    status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+                if not record.is_complete:
+                    record = _wait_for(record)
+                    if record is None:
+                        continue
+                if record.is_complete:
+                    return _replay(record)
+                break
+
+            response = Response({"error": "A request with this key is still being processed."},
+                                status=status.HTTP_409_CONFLICT)
+            response['Retry-After'] = '1'
+            return response
+        return wrapper
+    return decorator
+
+
+def purge_expired():
+    return IdempotencyRecord.objects.filter(expires_at__lte=timezone.now()).delete()[0]
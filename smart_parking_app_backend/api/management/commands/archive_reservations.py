@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from ...services import archive
+
+
+class Command(BaseCommand):
+    help = "Move reservations older than the retention window, and their notifications, to the archive tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, help="Keep reservations this recent (default: RESERVATION_RETENTION_DAYS)")
+        parser.add_argument('--chunk-size', type=int, help="Reservations moved per transaction (default: ARCHIVE_CHUNK_SIZE)")
+
+    def handle(self, *args, **options):
+        cutoff = archive.retention_cutoff(retention_days=options['retention_days'])
+        report = archive.archive(cutoff, options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {report['reservations']} reservations and {report['notifications']} notifications "
+            f"dated before {cutoff} in {report['chunks']} chunks: {report['seconds']:.2f}s, "
+            f"{report['rows_per_second']:.0f} rows/s."
+        ))
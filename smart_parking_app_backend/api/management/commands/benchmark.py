@@ -0,0 +1,29 @@
+from importlib import import_module
+from django.core.management.base import BaseCommand, CommandError
+
+# Benchmark modules available under api/benchmarks/
+BENCHMARKS = ['availability', 'availability_grid', 'location_pricing', 'endpoints', 'payments', 'archive', 'asgi']
+
+
+class Command(BaseCommand):
+    help = "Run a performance benchmark against a temporary database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=BENCHMARKS)
+        parser.add_argument('--repeat', type=int, default=50, help="Timed iterations per measurement")
+        parser.add_argument('--seed', type=int, default=42, help="Random seed for generated data")
+        parser.add_argument('--reservations', type=int, help="Reservations to generate (benchmark specific default)")
+        parser.add_argument('--pricings', type=int, help="Slot pricing rows to generate (location_pricing only)")
+        parser.add_argument('--baseline', help="Baseline JSON to compare against (endpoints only)")
+        parser.add_argument('--save-baseline', action='store_true', help="Write results as the new baseline (endpoints only)")
+        parser.add_argument('--tolerance', type=float, help="Allowed p95 slowdown as a fraction (endpoints only)")
+        parser.add_argument('--concurrency', type=int, help="Concurrent connections (asgi only)")
+        parser.add_argument('--transport', choices=['uvicorn', 'inprocess'], default='uvicorn',
+                            help="Serve over uvicorn or call the ASGI app directly (asgi only)")
+
+    def handle(self, *args, **options):
+        try:
+            module = import_module(f"api.benchmarks.{options['name']}")
+        except ImportError as e:
+            raise CommandError(str(e))
+        module.run(self.stdout, options)
@@ -0,0 +1,58 @@
+import json
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from ...services import catalog
+
+
+class Command(BaseCommand):
+    help = "Import or export locations and their slot pricings as CSV or NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['import', 'export'])
+        parser.add_argument('path', help="File to read or write, or - for stdin/stdout")
+        parser.add_argument('--file-format', choices=catalog.FORMATS,
+                            help="Defaults to ndjson for .ndjson/.jsonl paths, csv otherwise")
+        parser.add_argument('--chunk-size', type=int, default=catalog.CHUNK_SIZE, help="Rows validated and written per batch")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['file_format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+        if options['action'] == 'import':
+            self.import_catalog(path, file_format, options['chunk_size'])
+        else:
+            self.export_catalog(path, file_format)
+
+    def import_catalog(self, path, file_format, chunk_size):
+        try:
+            stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8-sig')
+        except OSError as e:
+            raise CommandError(str(e))
+        try:
+            report = catalog.import_catalog(stream, file_format, chunk_size)
+        except (catalog.CatalogFormatError, UnicodeDecodeError) as e:
+            raise CommandError(str(e))
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for error in report['errors']:
+            self.stderr.write(f"line {error['line']}: {json.dumps(error['errors'])}")
+        summary = (
+            f"{report['rows']} rows: {report['locations_created']} locations created, "
+            f"{report['pricings_created']} pricings created, {report['pricings_updated']} updated, "
+            f"{report['error_count']} rejected."
+        )
+        self.stdout.write(self.style.WARNING(summary) if report['error_count'] else self.style.SUCCESS(summary))
+
+    def export_catalog(self, path, file_format):
+        if path == '-':
+            for text in catalog.export_catalog(file_format):
+                self.stdout.write(text, ending='')
+            return
+        try:
+            with open(path, 'w', newline='', encoding='utf-8') as stream:
+                for text in catalog.export_catalog(file_format):
+                    stream.write(text)
+        except OSError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Exported catalogue to {path}."))
@@ -0,0 +1,28 @@
+import time
+from django.core.management.base import BaseCommand
+from ...services import payments
+
+
+class Command(BaseCommand):
+    help = "Apply queued PayMongo webhook events in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help="Events applied per transaction")
+        parser.add_argument('--loop', action='store_true', help="Keep polling for new events instead of exiting")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds to wait when the queue is empty (--loop only)")
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                handled = payments.process_pending(options['batch_size'])
+            except Exception as e:
+                if not options['loop']:
+                    raise
+                # The failed batch stays queued and is retried after the pause
+                self.stderr.write(f"Payment batch failed: {e}")
+                handled = 0
+            if handled or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f"Applied {handled} payment events."))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
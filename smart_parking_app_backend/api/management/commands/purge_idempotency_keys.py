@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from ...idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Delete idempotency records whose replay window has passed."
+
+    def handle(self, *args, **options):
+        deleted = purge_expired()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired idempotency records."))
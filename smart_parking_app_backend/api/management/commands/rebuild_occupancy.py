@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from ...services import occupancy
+
+
+class Command(BaseCommand):
+    help = "Recompute per-hour slot occupancy counters from active reservations."
+
+    def handle(self, *args, **options):
+        buckets = occupancy.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {buckets} occupancy buckets."))
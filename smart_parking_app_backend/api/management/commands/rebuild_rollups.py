@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from ...services import rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute daily reservation rollups from scratch."
+
+    def handle(self, *args, **options):
+        rows = rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} daily rollup rows."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from ...services import payments
+
+
+class Command(BaseCommand):
+    help = "Poll PayMongo for checkout sessions still pending and apply their outcome."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, help="Only poll sessions pending for at least this many seconds")
+        parser.add_argument('--batch-size', type=int, default=payments.RECONCILE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        report = payments.reconcile(older_than=options['older_than'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {report['checked']} sessions: {report['paid']} paid, {report['expired']} expired, "
+            f"{report['errors']} errors; {report['reservations']} reservations marked paid."
+        ))
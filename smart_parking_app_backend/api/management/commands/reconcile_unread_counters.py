@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from ...services import notifications
+
+
+class Command(BaseCommand):
+    help = "Recompute per-user unread notification counters and fix any drift."
+
+    def handle(self, *args, **options):
+        drifted = notifications.reconcile()
+        for user_id, unread in sorted(drifted.items()):
+            self.stdout.write(f"user {user_id}: unread set to {unread}")
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {len(drifted)} drifted counters."))
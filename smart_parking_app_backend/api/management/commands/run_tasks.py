@@ -0,0 +1,29 @@
+import signal
+from django.core.management.base import BaseCommand
+from ...services import task_queue
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks with a pool of worker threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, help="Tasks run concurrently (default: TASK_WORKER_THREADS)")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds between polls when the queue is empty")
+        parser.add_argument('--once', action='store_true', help="Run the tasks that are due, then exit")
+        parser.add_argument('--requeue-dead', action='store_true', help="Queue dead-lettered tasks again and exit")
+
+    def handle(self, *args, **options):
+        if options['requeue_dead']:
+            self.stdout.write(self.style.SUCCESS(f"Requeued {task_queue.requeue_dead()} dead tasks."))
+            return
+        if options['once']:
+            self.stdout.write(self.style.SUCCESS(f"Ran {task_queue.run_pending()} tasks."))
+            return
+
+        worker = task_queue.Worker(threads=options['threads'], poll_interval=options['interval'])
+        # Finish the tasks in hand before exiting on Ctrl+C or a deploy's SIGTERM
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: worker.stop())
+        self.stdout.write(f"Worker {worker.worker_id} running {worker.threads} threads.")
+        worker.run()
+        self.stdout.write("Worker stopped.")
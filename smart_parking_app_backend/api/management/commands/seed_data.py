@@ -0,0 +1,40 @@
+import random
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from ...benchmarks import dataset
+from ...models import Location, Reservation
+
+
+class Command(BaseCommand):
+    help = "Fill an empty database with a deterministic synthetic dataset for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42, help="Random seed; the same seed gives the same data")
+        parser.add_argument('--anchor-date', type=date.fromisoformat,
+                            help="Date the reservations are spread around (default: today)")
+        parser.add_argument('--locations', type=int, default=dataset.DEFAULTS['locations'])
+        parser.add_argument('--users', type=int, default=dataset.DEFAULTS['users'])
+        parser.add_argument('--reservations', type=int, default=dataset.DEFAULTS['reservations'],
+                            help="Millions are fine; rows are written in batches")
+        parser.add_argument('--days', type=int, default=dataset.DEFAULTS['days'], help="Days the reservations span")
+
+    def handle(self, *args, **options):
+        # Generated usernames and lots would collide with existing data
+        if Location.objects.exists() or Reservation.objects.exists():
+            raise CommandError("The database already has locations or reservations; seed an empty database.")
+
+        summary = dataset.generate(
+            random.Random(options['seed']),
+            options['anchor_date'] or date.today(),
+            stdout=self.stdout,
+            locations=options['locations'],
+            users=options['users'],
+            reservations=options['reservations'],
+            days=options['days'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {summary['locations']} locations, {summary['slot_pricings']} slot pricings, "
+            f"{summary['users']} users, {summary['reservations']} reservations and "
+            f"{summary['notifications']} notifications from {summary['first_day']}. "
+            f"Accounts use the password '{dataset.PASSWORD}' ('{dataset.ADMIN_USERNAME}' is staff)."
+        ))
@@ -0,0 +1,35 @@
+import time
+from django.core.management.base import BaseCommand
+from ...services import sweeper
+
+
+class Command(BaseCommand):
+    help = "Cancel no-show reservations and check out overstays once their grace period has passed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help="Reservations read and updated per batch")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would change without changing it")
+        parser.add_argument('--loop', action='store_true', help="Keep sweeping instead of exiting")
+        parser.add_argument('--interval', type=float, default=300.0, help="Seconds between sweeps (--loop only)")
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                report = sweeper.sweep(batch_size=options['batch_size'], dry_run=options['dry_run'])
+            except Exception as e:
+                if not options['loop']:
+                    raise
+                # Batches already applied stay applied; the rest is retried next sweep
+                self.stderr.write(f"Sweep failed: {e}")
+            else:
+                summary = (
+                    f"{report['no_shows']} no-shows to cancel and {report['checked_out']} overstays to check out"
+                    if options['dry_run'] else
+                    f"Cancelled {report['no_shows']} no-shows and checked out {report['checked_out']} overstays"
+                )
+                self.stdout.write(self.style.SUCCESS(
+                    f"{summary} among {report['checked']} open reservations ({report['batches']} batches)."
+                ))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
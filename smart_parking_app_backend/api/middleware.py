@@ -0,0 +1,78 @@
+from contextvars import ContextVar
+from time import perf_counter
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from .services import metrics
+
+# Query timer of the request being handled. Context variables follow the request
+# into the worker threads asgiref uses for sync code, so queries are attributed
+# correctly under both WSGI and ASGI.
+_current_timer = ContextVar('request_query_timer', default=None)
+
+
+class QueryTimer:
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+def timed_execute(execute, sql, params, many, context):
+    # Execute wrapper installed on every database connection (see signals.py)
+    timer = _current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timer.queries += 1
+        timer.seconds += perf_counter() - started
+
+
+def _view_name(request):
+    # URL pattern name keeps label cardinality bounded, unlike raw paths
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.url_name or match.view_name or 'unnamed'
+
+
+class RequestMetricsMiddleware:
+    # Records latency, status code, query count and database time per URL name.
+    # Streaming responses are measured up to the first byte.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = QueryTimer()
+        token = _current_timer.set(timer)
+        started = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_timer.reset(token)
+        self._record(request, response, perf_counter() - started, timer)
+        return response
+
+    async def __acall__(self, request):
+        timer = QueryTimer()
+        token = _current_timer.set(timer)
+        started = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_timer.reset(token)
+        self._record(request, response, perf_counter() - started, timer)
+        return response
+
+    def _record(self, request, response, seconds, timer):
+        metrics.record(
+            _view_name(request), request.method, response.status_code,
+            seconds, timer.queries, timer.seconds
+        )
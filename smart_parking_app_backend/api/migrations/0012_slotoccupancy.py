@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:50
+
+from collections import Counter
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def count_buckets(rows):
+    # Reservations per (location, slot type, vehicle type, date, hour) bucket.
+    # A copy of api.services.occupancy.count_buckets as of this migration, so
+    # later changes to the app code do not change what it backfills.
+    counts = Counter()
+    for location_id, slot_type_id, vehicle_type_id, date, time, duration_hours in rows:
+        start = time.hour * 3600 + time.minute * 60 + time.second
+        for hour in range(start // 3600, -(-(start + duration_hours * 3600) // 3600)):
+            counts[(location_id, slot_type_id, vehicle_type_id, date + timedelta(days=hour // 24), hour % 24)] += 1
+    return counts
+
+
+def backfill_occupancy(apps, schema_editor):
+    # Seed counters from reservations that already exist
+    Reservation = apps.get_model('api', 'Reservation')
+    SlotOccupancy = apps.get_model('api', 'SlotOccupancy')
+    rows = Reservation.objects.filter(is_cancelled=False).values_list(
+        'location_id', 'slot_type_id', 'vehicle_type_id', 'date', 'time', 'duration_hours'
+    )
+    SlotOccupancy.objects.bulk_create([
+        SlotOccupancy(
+            location_id=location_id,
+            slot_type_id=slot_type_id,
+            vehicle_type_id=vehicle_type_id,
+            date=date,
+            hour=hour,
+            reserved=reserved,
+        )
+        for (location_id, slot_type_id, vehicle_type_id, date, hour), reserved in count_buckets(rows).items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_rename_creacreated_at_reservation_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('reserved', models.PositiveIntegerField(default=0)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.location')),
+                ('slot_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.slottype')),
+                ('vehicle_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.vehicletype')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('location', 'slot_type', 'vehicle_type', 'date', 'hour'), name='unique_slot_occupancy_bucket')],
+            },
+        ),
+        migrations.RunPython(backfill_occupancy, migrations.RunPython.noop),
+    ]
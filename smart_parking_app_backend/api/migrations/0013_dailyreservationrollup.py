@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+# The counters as api.services.rollups.ROLLUP_AGGREGATES defined them for this
+# migration, kept here so later changes to the app code do not alter it
+ROLLUP_AGGREGATES = {
+    'created': Count('id'),
+    'cancelled': Count('id', filter=Q(is_cancelled=True)),
+    'approved': Count('id', filter=Q(is_cancelled=False, is_approved=True)),
+    'paid': Count('id', filter=Q(is_cancelled=False, is_approved=True, is_paid=True)),
+    'arrived': Count('id', filter=Q(has_arrived=True)),
+    'exited': Count('id', filter=Q(has_arrived=True, has_exited=True)),
+}
+
+
+def backfill_rollups(apps, schema_editor):
+    # Seed daily counters from reservations that already exist
+    Reservation = apps.get_model('api', 'Reservation')
+    DailyReservationRollup = apps.get_model('api', 'DailyReservationRollup')
+    rows = Reservation.objects.order_by().values('date', 'location_id').annotate(**ROLLUP_AGGREGATES)
+    DailyReservationRollup.objects.bulk_create(
+        [DailyReservationRollup(**row) for row in rows], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_slotoccupancy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyReservationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('created', models.IntegerField(default=0)),
+                ('cancelled', models.IntegerField(default=0)),
+                ('approved', models.IntegerField(default=0)),
+                ('paid', models.IntegerField(default=0)),
+                ('arrived', models.IntegerField(default=0)),
+                ('exited', models.IntegerField(default=0)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='api.location')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'location'), name='unique_daily_rollup')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
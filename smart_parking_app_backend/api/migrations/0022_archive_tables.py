@@ -0,0 +1,101 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_reservation_sweeper'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedNotification',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('message', models.TextField()),
+                ('is_read', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedReservation',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('time', models.TimeField()),
+                ('duration_hours', models.PositiveIntegerField(default=1)),
+                ('plate_number', models.CharField(max_length=20)),
+                ('vehicle_make', models.CharField(max_length=50)),
+                ('vehicle_model', models.CharField(max_length=50)),
+                ('color', models.CharField(max_length=30)),
+                ('mode_of_payment', models.CharField(max_length=50)),
+                ('is_paid', models.BooleanField(default=False)),
+                ('is_cancelled', models.BooleanField(default=False)),
+                ('has_arrived', models.BooleanField(default=False)),
+                ('has_exited', models.BooleanField(default=False)),
+                ('is_approved', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['date', 'id'], name='reservation_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivednotification',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_notifications', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedreservation',
+            name='checkout_session',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.checkoutsession'),
+        ),
+        migrations.AddField(
+            model_name='archivedreservation',
+            name='location',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_reservations', to='api.location'),
+        ),
+        migrations.AddField(
+            model_name='archivedreservation',
+            name='slot_type',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.slottype'),
+        ),
+        migrations.AddField(
+            model_name='archivedreservation',
+            name='user',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archived_reservations', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedreservation',
+            name='vehicle_type',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.vehicletype'),
+        ),
+        migrations.AddField(
+            model_name='archivednotification',
+            name='reservation',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='api.archivedreservation'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedreservation',
+            index=models.Index(fields=['user', 'date', 'time', 'id'], name='archived_res_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedreservation',
+            index=models.Index(fields=['created_at', 'id'], name='archived_res_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedreservation',
+            index=models.Index(fields=['mode_of_payment'], name='archived_res_payment_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivednotification',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='archived_notif_user_feed_idx'),
+        ),
+    ]
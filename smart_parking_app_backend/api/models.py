@@ -6,6 +6,9 @@ from django.utils import timezone
 class Location(models.Model):
     name = models.CharField(max_length=100)
     address = models.TextField()
+    # Minutes after a reservation ends before the sweeper treats it as a no-show
+    # or overstay; empty uses NO_SHOW_GRACE_MINUTES
+    no_show_grace_minutes = models.PositiveIntegerField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.name} - {self.address}"
@@ -61,6 +64,10 @@ class Reservation(models.Model):
     # Payment
     mode_of_payment = models.CharField(max_length=50)  # e.g. "cash", "gcash", etc.
     is_paid = models.BooleanField(default=False)
+    # Online checkout that pays for this reservation; its webhook events set is_paid
+    checkout_session = models.OneToOneField(
+        'CheckoutSession', on_delete=models.SET_NULL, null=True, blank=True, related_name='reservation'
+    )
 
     is_cancelled = models.BooleanField(default=False)
     has_arrived = models.BooleanField(default=False)
@@ -68,6 +75,29 @@ class Reservation(models.Model):
     is_approved = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Serves a user's reservations in schedule order, split at "now"
+            models.Index(fields=['user', 'date', 'time', 'id'], name='reservation_user_schedule_idx'),
+            # Availability checks and grids only look at active reservations
+            models.Index(
+                fields=['location', 'vehicle_type', 'date', 'time'],
+                condition=models.Q(is_cancelled=False),
+                name='reservation_active_slot_idx'
+            ),
+            # Admin listing, newest first with keyset pagination
+            models.Index(fields=['created_at', 'id'], name='reservation_created_idx'),
+            # Payment method distribution on the dashboard
+            models.Index(fields=['mode_of_payment'], name='reservation_payment_idx'),
+            # Archiving walks reservations older than the retention window
+            models.Index(fields=['date', 'id'], name='reservation_date_idx'),
+            # Sweeper range scan; only reservations still open are indexed
+            models.Index(
+                fields=['date', 'time', 'id'],
+                condition=models.Q(is_cancelled=False, has_exited=False),
+                name='reservation_open_schedule_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.location.name} - {self.slot_type.name} - {self.vehicle_type.name} - {self.date} {self.time} - Plate: {self.plate_number}"
@@ -80,5 +110,239 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Notification feed, newest first with keyset pagination
+            models.Index(fields=['user', 'created_at', 'id'], name='notification_user_feed_idx'),
+            # Feed filtered to read or unread, and the unread listing
+            models.Index(fields=['user', 'is_read', 'created_at', 'id'], name='notification_user_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Notification for {self.user.username} - Read: {self.is_read}"
+
+# Reserved slot counter per hour, used to enforce capacity when booking
+class SlotOccupancy(models.Model):
+    location = models.ForeignKey(Location, on_delete=models.CASCADE)
+    slot_type = models.ForeignKey(SlotType, on_delete=models.CASCADE)
+    vehicle_type = models.ForeignKey(VehicleType, on_delete=models.CASCADE)
+    date = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    reserved = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['location', 'slot_type', 'vehicle_type', 'date', 'hour'],
+                name='unique_slot_occupancy_bucket'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.location_id} - {self.slot_type_id} - {self.vehicle_type_id} - {self.date} {self.hour:02d}:00 - Reserved: {self.reserved}"
+
+
+# Per-day, per-location reservation counters kept current as reservations change.
+# approved and paid only count reservations that are not cancelled, and exited
+# only counts reservations that also arrived.
+class DailyReservationRollup(models.Model):
+    date = models.DateField()
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='daily_rollups')
+    created = models.IntegerField(default=0)
+    cancelled = models.IntegerField(default=0)
+    approved = models.IntegerField(default=0)
+    paid = models.IntegerField(default=0)
+    arrived = models.IntegerField(default=0)
+    exited = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'location'], name='unique_daily_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.location_id} - Created: {self.created}"
+
+
+# Denormalized count of a user's unread notifications
+class NotificationCounter(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_counter')
+    unread = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Unread notifications for {self.user_id}: {self.unread}"
+
+# Shared version of the location/vehicle type catalogue, bumped on every change
+# so each worker process knows when its cached reference data is stale
+class CatalogVersion(models.Model):
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Catalogue version {self.version}"
+
+# Stored outcome of a request sent with an Idempotency-Key header, so a retry
+# gets the original response instead of repeating the side effects
+class IdempotencyRecord(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_records')
+    endpoint = models.CharField(max_length=100)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    is_complete = models.BooleanField(default=False)
+    response_status = models.PositiveSmallIntegerField(null=True)
+    response_body = models.JSONField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'endpoint', 'key'], name='unique_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.endpoint} {self.key} for {self.user_id}"
+
+
+# Online checkout created through PayMongo, kept so webhook events and
+# reconciliation can find the reservation it pays for
+class CheckoutSession(models.Model):
+    CREATING = 'creating'
+    PENDING = 'pending'
+    PAID = 'paid'
+    EXPIRED = 'expired'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (CREATING, 'Creating'), (PENDING, 'Pending'), (PAID, 'Paid'), (EXPIRED, 'Expired'), (FAILED, 'Failed'),
+    ]
+
+    # Filled in by the background task that calls PayMongo
+    session_id = models.CharField(max_length=100, unique=True, null=True, blank=True)
+    checkout_url = models.URLField(max_length=500, blank=True)
+    error = models.TextField(blank=True)
+    reference_number = models.CharField(max_length=50, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='checkout_sessions')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=CREATING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    paid_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Reconciliation walks pending sessions in id order
+            models.Index(fields=['status', 'id'], name='checkout_session_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.reference_number} - {self.status}"
+
+# Payment webhook event as received, queued until the payment worker applies it
+class PaymentEvent(models.Model):
+    event_id = models.CharField(max_length=100, unique=True)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker only reads events it has not applied yet, in arrival order
+            models.Index(fields=['id'], condition=models.Q(processed_at__isnull=True), name='payment_event_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} {self.event_id}"
+
+# Background job run by `manage.py run_tasks`. Workers claim queued rows with a
+# lease; a task whose lease ran out (crashed worker) is claimed again.
+class Task(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    DEAD = 'dead'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (DEAD, 'Dead')]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField()
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Claiming: due queued tasks in order, and running tasks by lease expiry
+            models.Index(fields=['status', 'run_at', 'id'], name='task_claim_idx'),
+            models.Index(fields=['status', 'locked_until'], name='task_lease_idx'),
+            # Pruning and latency figures over recently finished tasks
+            models.Index(fields=['status', 'finished_at'], name='task_finished_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.id} - {self.status}"
+
+
+# Reservations past the retention window, moved out of the live table by
+# `manage.py archive_reservations`. Rows keep their original ids and columns,
+# so history and exports can read both tables as one.
+class ArchivedReservation(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, related_name='archived_reservations')
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='archived_reservations')
+    slot_type = models.ForeignKey(SlotType, on_delete=models.CASCADE, related_name='+')
+    vehicle_type = models.ForeignKey(VehicleType, on_delete=models.CASCADE, related_name='+')
+    date = models.DateField()
+    time = models.TimeField()
+    duration_hours = models.PositiveIntegerField(default=1)
+    plate_number = models.CharField(max_length=20)
+    vehicle_make = models.CharField(max_length=50)
+    vehicle_model = models.CharField(max_length=50)
+    color = models.CharField(max_length=30)
+    mode_of_payment = models.CharField(max_length=50)
+    is_paid = models.BooleanField(default=False)
+    checkout_session = models.ForeignKey(
+        CheckoutSession, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    is_cancelled = models.BooleanField(default=False)
+    has_arrived = models.BooleanField(default=False)
+    has_exited = models.BooleanField(default=False)
+    is_approved = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # A user's past reservations, newest first with keyset pagination
+            models.Index(fields=['user', 'date', 'time', 'id'], name='archived_res_user_idx'),
+            # Admin listing and export, newest first with keyset pagination
+            models.Index(fields=['created_at', 'id'], name='archived_res_created_idx'),
+            # Payment method distribution on the dashboard
+            models.Index(fields=['mode_of_payment'], name='archived_res_payment_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived reservation {self.id} - {self.date} {self.time} - Plate: {self.plate_number}"
+
+
+# Notifications of archived reservations, kept for the notification feed
+class ArchivedNotification(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_notifications')
+    reservation = models.ForeignKey(ArchivedReservation, on_delete=models.CASCADE, related_name='notifications')
+    message = models.TextField()
+    is_read = models.BooleanField(default=True)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='archived_notif_user_feed_idx'),
+        ]
+
     def __str__(self):
-        return f"Notification for {self.user.username} - Read: {self.is_read}"
\ No newline at end of file
+        return f"Archived notification for {self.user_id}"
@@ -0,0 +1,97 @@
+import base64
+import json
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(values):
+    # Opaque, URL-safe token holding the sort key of the last row on a page
+    raw = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(token, model, fields):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode()))
+        if len(values) != len(fields):
+            raise ValueError
+        # Convert strings back to dates/times using each model field's own parser
+        return [model._meta.get_field(name).to_python(value) for name, value in zip(fields, values)]
+    except Exception:
+        raise InvalidCursor("Invalid cursor.")
+
+
+def _after(fields, values, descending):
+    # Lexicographic "comes after" condition on the sort key, e.g. for (a, b):
+    # a < x OR (a = x AND b < y) when sorting descending
+    lookup = 'lt' if descending else 'gt'
+    condition = Q()
+    for i, (name, value) in enumerate(zip(fields, values)):
+        step = Q(**{f'{name}__{lookup}': value})
+        for prior_name, prior_value in zip(fields[:i], values[:i]):
+            step &= Q(**{prior_name: prior_value})
+        condition |= step
+    return condition
+
+
+def _slice(queryset, fields, cursor, limit, descending):
+    if cursor:
+        queryset = queryset.filter(_after(fields, decode_cursor(cursor, queryset.model, fields), descending))
+    ordering = [f'-{name}' if descending else name for name in fields]
+    return queryset.order_by(*ordering)[:limit]
+
+
+def _fetch(queryset, fields, cursor, limit, descending):
+    return list(_slice(queryset, fields, cursor, limit, descending))
+
+
+async def _afetch(queryset, fields, cursor, limit, descending):
+    return [row async for row in _slice(queryset, fields, cursor, limit, descending)]
+
+
+def _page(rows, fields, page_size):
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor([getattr(rows[-1], name) for name in fields])
+    return rows, next_cursor
+
+
+def keyset_page(queryset, fields, cursor=None, page_size=DEFAULT_PAGE_SIZE, descending=True):
+    # Fetch one page ordered by `fields` (which must end in a unique column)
+    # and the cursor for the next page, without OFFSET scans
+    return _page(_fetch(queryset, fields, cursor, page_size + 1, descending), fields, page_size)
+
+
+async def akeyset_page(queryset, fields, cursor=None, page_size=DEFAULT_PAGE_SIZE, descending=True):
+    # keyset_page for async views
+    return _page(await _afetch(queryset, fields, cursor, page_size + 1, descending), fields, page_size)
+
+
+def _merge(rows, fields, page_size, descending):
+    rows.sort(key=lambda row: [getattr(row, name) for name in fields], reverse=descending)
+    return _page(rows[:page_size + 1], fields, page_size)
+
+
+def union_keyset_page(querysets, fields, cursor=None, page_size=DEFAULT_PAGE_SIZE, descending=True):
+    # Like keyset_page over several querysets read as one, e.g. a live table and
+    # its archive. Their rows must never share a sort key. Each queryset is read
+    # with the same cursor and the pages merged, so the cost stays one indexed
+    # query per table.
+    rows = [row for queryset in querysets for row in _fetch(queryset, fields, cursor, page_size + 1, descending)]
+    return _merge(rows, fields, page_size, descending)
+
+
+async def aunion_keyset_page(querysets, fields, cursor=None, page_size=DEFAULT_PAGE_SIZE, descending=True):
+    # union_keyset_page for async views
+    rows = []
+    for queryset in querysets:
+        rows += await _afetch(queryset, fields, cursor, page_size + 1, descending)
+    return _merge(rows, fields, page_size, descending)
+
@@ -0,0 +1,15 @@
+from rest_framework import serializers
+
+# Serializer for dashboard trend query parameters
+class TrendQuerySerializer(serializers.Serializer):
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    location_id = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        # Keep ranges ordered and bounded to about a year of days
+        if attrs['end_date'] < attrs['start_date']:
+            raise serializers.ValidationError("end_date must not be before start_date.")
+        if (attrs['end_date'] - attrs['start_date']).days > 366:
+            raise serializers.ValidationError("Date range cannot exceed 366 days.")
+        return attrs
@@ -1,5 +1,10 @@
 from rest_framework import serializers
 from ..models import Location, SlotPricing, SlotType, VehicleType
+from ..services import reference_data
+from ..services.availability import MAX_DURATION_HOURS
+
+# Rows per INSERT/UPDATE statement when writing slot pricings
+PRICING_BATCH_SIZE = 200
 
 # Serializer for creating/updating slot pricing entries
 class SlotPricingSerializer(serializers.ModelSerializer):
@@ -16,16 +21,27 @@ class LocationCreateSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Location
-        fields = ['name', 'address', 'slot_pricings']
+        fields = ['name', 'address', 'no_show_grace_minutes', 'slot_pricings']
+
+    def validate_slot_pricings(self, value):
+        # Pricings are matched on (slot type, vehicle type), so each pair may appear once
+        keys = [(sp['slot_type_id'].id, sp['vehicle_type_id'].id) for sp in value]
+        if len(keys) != len(set(keys)):
+            raise serializers.ValidationError("Each slot type and vehicle type pair may only appear once.")
+        return value
 
     def create(self, validated_data):
         # Extract nested pricing data and remove from main payload
         slot_pricings_data = validated_data.pop('slot_pricings')
         # Create the Location instance
         location = Location.objects.create(**validated_data)
-        # Create each SlotPricing associated with the new location
-        for sp_data in slot_pricings_data:
-            SlotPricing.objects.create(location_id=location, **sp_data)
+        # Insert all pricings in batched statements
+        created = SlotPricing.objects.bulk_create(
+            [SlotPricing(location_id=location, **sp_data) for sp_data in slot_pricings_data],
+            batch_size=PRICING_BATCH_SIZE
+        )
+        reference_data.bump_version()
+        self.pricing_changes = {'created': len(created), 'updated': 0, 'deleted': 0, 'unchanged': 0}
         return location
 
     def update(self, instance, validated_data):
@@ -33,16 +49,44 @@ class LocationCreateSerializer(serializers.ModelSerializer):
         slot_pricings_data = validated_data.pop('slot_pricings', None)
         instance.name = validated_data.get('name', instance.name)
         instance.address = validated_data.get('address', instance.address)
+        instance.no_show_grace_minutes = validated_data.get('no_show_grace_minutes', instance.no_show_grace_minutes)
         instance.save()
 
+        self.pricing_changes = {'created': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
         if slot_pricings_data is not None:
-            # Delete all existing slot pricings for this location
-            instance.slot_pricings.all().delete()
-            # Recreate new slot pricing records
-            for sp_data in slot_pricings_data:
-                SlotPricing.objects.create(location_id=instance, **sp_data)
+            self.pricing_changes = self._sync_slot_pricings(instance, slot_pricings_data)
         return instance
 
+    def _sync_slot_pricings(self, location, slot_pricings_data):
+        # Diff the submitted pricings against existing rows keyed on (slot type, vehicle type).
+        # Matching rows keep their primary keys and are only written when a value changed.
+        existing = {
+            (pricing.slot_type_id_id, pricing.vehicle_type_id_id): pricing
+            for pricing in location.slot_pricings.all()
+        }
+        to_create, to_update, unchanged = [], [], 0
+        for sp_data in slot_pricings_data:
+            pricing = existing.pop((sp_data['slot_type_id'].id, sp_data['vehicle_type_id'].id), None)
+            if pricing is None:
+                to_create.append(SlotPricing(location_id=location, **sp_data))
+            elif (pricing.rate_per_hour, pricing.available_slots) != (sp_data['rate_per_hour'], sp_data['available_slots']):
+                pricing.rate_per_hour = sp_data['rate_per_hour']
+                pricing.available_slots = sp_data['available_slots']
+                to_update.append(pricing)
+            else:
+                unchanged += 1
+
+        SlotPricing.objects.bulk_create(to_create, batch_size=PRICING_BATCH_SIZE)
+        SlotPricing.objects.bulk_update(to_update, ['rate_per_hour', 'available_slots'], batch_size=PRICING_BATCH_SIZE)
+        # Whatever is left over was not submitted, so remove it in one statement
+        deleted = 0
+        if existing:
+            deleted, _ = SlotPricing.objects.filter(pk__in=[pricing.pk for pricing in existing.values()]).delete()
+        if to_create or to_update:
+            # Bulk writes skip the signals that keep cached reference data current
+            reference_data.bump_version()
+        return {'created': len(to_create), 'updated': len(to_update), 'deleted': deleted, 'unchanged': unchanged}
+
 # Read-only serializer that returns descriptive slot and vehicle type names
 class SlotPricingDetailSerializer(serializers.ModelSerializer):
     slot_type = serializers.CharField(source='slot_type_id.name')             # SlotType name
@@ -59,7 +103,7 @@ class LocationDetailSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Location
-        fields = ['id', 'name', 'address', 'slot_pricings']
+        fields = ['id', 'name', 'address', 'no_show_grace_minutes', 'slot_pricings']
 
 # Simple serializer for listing or selecting locations
 class LocationSerializer(serializers.ModelSerializer):
@@ -73,6 +117,63 @@ class SlotAvailabilitySearchSerializer(serializers.Serializer):
     vehicle_type_id = serializers.IntegerField()
     date = serializers.DateField()
     time = serializers.TimeField()
+    duration_hours = serializers.IntegerField(min_value=1, max_value=MAX_DURATION_HOURS, default=1)
+
+# Serializer for the availability grid query parameters
+class AvailabilityGridSerializer(serializers.Serializer):
+    location_id = serializers.IntegerField()
+    vehicle_type_id = serializers.IntegerField()
+    start_date = serializers.DateField()
+    days = serializers.IntegerField(min_value=1, max_value=31, default=7)
+
+# One row of a location catalogue import. Slot and vehicle types are given by name
+# and resolved against the lookups passed in the context.
+class CatalogRowSerializer(serializers.Serializer):
+    PRICING_FIELDS = ('slot_type', 'vehicle_type', 'rate_per_hour', 'available_slots')
+
+    location_name = serializers.CharField(max_length=100)
+    address = serializers.CharField()
+    slot_type = serializers.CharField(required=False, allow_null=True)
+    vehicle_type = serializers.CharField(required=False, allow_null=True)
+    rate_per_hour = serializers.DecimalField(max_digits=6, decimal_places=2, required=False, allow_null=True)
+    available_slots = serializers.IntegerField(min_value=0, required=False, allow_null=True)
+
+    def to_internal_value(self, data):
+        # CSV has no nulls, so blank cells mean "not given"
+        data = {
+            key: None if isinstance(value, str) and not value.strip() else value
+            for key, value in data.items()
+        }
+        return super().to_internal_value(data)
+
+    def validate(self, attrs):
+        given = [name for name in self.PRICING_FIELDS if attrs.get(name) is not None]
+        if not given:
+            return attrs
+        missing = [name for name in self.PRICING_FIELDS if name not in given]
+        if missing:
+            raise serializers.ValidationError({name: ["Required when a pricing is given."] for name in missing})
+
+        slot_type = self.context['slot_types'].get(attrs['slot_type'].strip().lower())
+        vehicle_type = self.context['vehicle_types'].get(attrs['vehicle_type'].strip().lower())
+        errors = {}
+        if slot_type is None:
+            errors['slot_type'] = [f"Unknown slot type '{attrs['slot_type']}'."]
+        if vehicle_type is None:
+            errors['vehicle_type'] = [f"Unknown vehicle type '{attrs['vehicle_type']}'."]
+        if errors:
+            raise serializers.ValidationError(errors)
+        attrs['slot_type'], attrs['vehicle_type'] = slot_type, vehicle_type
+        return attrs
+
+# Upload accepted by the catalogue import endpoint
+class CatalogImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    file_format = serializers.ChoiceField(choices=['csv', 'ndjson'], default='csv')
+
+# Query parameters for the catalogue export endpoint
+class CatalogExportSerializer(serializers.Serializer):
+    file_format = serializers.ChoiceField(choices=['csv', 'ndjson'], default='csv')
 
 # Serializer for vehicle type listing
 class VehicleTypeSerializer(serializers.ModelSerializer):
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from ..models import Notification
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
 class NotificationSerializer(serializers.ModelSerializer):
     reservation_time = serializers.SerializerMethodField()
@@ -20,4 +21,20 @@ class NotificationSerializer(serializers.ModelSerializer):
 
     def get_location(self, obj):
         # Return the location name of the associated reservation, if any
-        return obj.reservation.location.name if obj.reservation and obj.reservation.location else None
\ No newline at end of file
+        return obj.reservation.location.name if obj.reservation and obj.reservation.location else None
+
+# Query parameters for the notification feed
+class NotificationFeedQuerySerializer(serializers.Serializer):
+    cursor = serializers.CharField(required=False)
+    page_size = serializers.IntegerField(min_value=1, max_value=MAX_PAGE_SIZE, default=DEFAULT_PAGE_SIZE)
+    status = serializers.ChoiceField(choices=['all', 'unread', 'read'], default='all')
+
+# Selects notifications to mark read: explicit ids and/or everything up to an id
+class MarkNotificationsReadSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=500)
+    up_to_id = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if not attrs.get('ids') and attrs.get('up_to_id') is None:
+            raise serializers.ValidationError("Provide ids or up_to_id.")
+        return attrs
@@ -1,5 +1,8 @@
 from rest_framework import serializers
-from ..models import Reservation, Location, SlotType, VehicleType
+from ..models import ArchivedReservation, Reservation, Location, SlotType, VehicleType, CheckoutSession, SlotPricing
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..services.availability import MAX_DURATION_HOURS
+from ..services.reservation_actions import ACTIONS, MAX_BATCH
 from .user_serializers import UserSerializer
 from .location_serializers import LocationSerializer, SlotTypeSerializer, VehicleTypeSerializer
 
@@ -9,23 +12,54 @@ class ReservationSerializer(serializers.ModelSerializer):
     location = LocationSerializer(read_only=True)
     slot_type = SlotTypeSerializer(read_only=True)
     vehicle_type = VehicleTypeSerializer(read_only=True)
+    # Archived reservations share these fields but can no longer be changed
+    is_archived = serializers.SerializerMethodField()
 
     class Meta:
         model = Reservation
         fields = '__all__'
         read_only_fields = ['user']
 
+    def get_is_archived(self, obj):
+        return isinstance(obj, ArchivedReservation)
+
 # Serializer for creating/updating reservations, expects primary keys for related objects
 class CreateReservationSerializer(serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(read_only=True)
     location = serializers.PrimaryKeyRelatedField(queryset=Location.objects.all())
     slot_type = serializers.PrimaryKeyRelatedField(queryset=SlotType.objects.all())
     vehicle_type = serializers.PrimaryKeyRelatedField(queryset=VehicleType.objects.all())
+    duration_hours = serializers.IntegerField(min_value=1, max_value=MAX_DURATION_HOURS, default=1)
+    # PayMongo checkout session id returned by online-payments/
+    checkout_session = serializers.SlugRelatedField(
+        slug_field='session_id', queryset=CheckoutSession.objects.all(), required=False, allow_null=True
+    )
 
     class Meta:
         model = Reservation
         fields = '__all__'
-        read_only_fields = ['user']
+        # Status is set by admins and by the payment gateway, never by the booking client
+        read_only_fields = ['user', 'is_paid', 'is_approved', 'has_arrived', 'has_exited']
+
+    def validate_checkout_session(self, value):
+        if value is not None and Reservation.objects.filter(checkout_session=value).exists():
+            raise serializers.ValidationError("This checkout session already paid for another reservation.")
+        return value
+
+    def validate(self, attrs):
+        session = attrs.get('checkout_session')
+        if session is None:
+            return attrs
+        # The checkout amount comes from the client, so it must cover this reservation.
+        # A missing pricing is reported by the view when capacity is claimed.
+        rate = SlotPricing.objects.filter(
+            location_id=attrs['location'], slot_type_id=attrs['slot_type'], vehicle_type_id=attrs['vehicle_type']
+        ).values_list('rate_per_hour', flat=True).first()
+        if rate is not None and session.amount != rate * attrs['duration_hours']:
+            raise serializers.ValidationError(
+                {'checkout_session': ["This checkout session's amount does not match the reservation cost."]}
+            )
+        return attrs
 
 # Serializer for admin views showing related objects as string representations
 class ReservationAdminSerializer(serializers.ModelSerializer):
@@ -33,11 +67,15 @@ class ReservationAdminSerializer(serializers.ModelSerializer):
     location = serializers.StringRelatedField()
     slot_type = serializers.StringRelatedField()
     vehicle_type = serializers.StringRelatedField()
+    is_archived = serializers.SerializerMethodField()
 
     class Meta:
         model = Reservation
         fields = '__all__'
 
+    def get_is_archived(self, obj):
+        return isinstance(obj, ArchivedReservation)
+
 # Serializer for updating arrival and exit status only
 class ReservationCheckSerializer(serializers.ModelSerializer):
     class Meta:
@@ -53,4 +91,54 @@ class AdminCancelReservationSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         instance.is_cancelled = validated_data.get('is_cancelled', instance.is_cancelled)
         instance.save()
-        return instance
\ No newline at end of file
+        return instance
+
+# Query parameters for the paginated admin reservation listing
+class AdminReservationFilterSerializer(serializers.Serializer):
+    STATUS_CHOICES = ['pending', 'approved', 'paid', 'unpaid', 'cancelled', 'parked', 'completed']
+
+    cursor = serializers.CharField(required=False)
+    page_size = serializers.IntegerField(min_value=1, max_value=MAX_PAGE_SIZE, default=DEFAULT_PAGE_SIZE)
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    location_id = serializers.IntegerField(required=False)
+    status = serializers.ChoiceField(choices=STATUS_CHOICES, required=False)
+    mode_of_payment = serializers.CharField(required=False)
+    stream = serializers.BooleanField(default=False)
+
+
+# Reservations selected by a bulk action's filter, as in the admin listing
+class ReservationBulkFilterSerializer(serializers.Serializer):
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    location_id = serializers.IntegerField(required=False)
+    status = serializers.ChoiceField(choices=AdminReservationFilterSerializer.STATUS_CHOICES, required=False)
+    mode_of_payment = serializers.CharField(required=False)
+
+    def validate(self, attrs):
+        # Repeating a filtered action while has_more is true works through every
+        # match, so the filter must narrow by date or location, never match the table
+        if not attrs.keys() & {'start_date', 'end_date', 'location_id'}:
+            raise serializers.ValidationError("Filter by a date range or a location.")
+        return attrs
+
+
+# Admin action applied to a list of reservation ids or to a filter
+class BulkReservationActionSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=ACTIONS)
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False, allow_empty=False, max_length=MAX_BATCH
+    )
+    filter = ReservationBulkFilterSerializer(required=False)
+
+    def validate(self, attrs):
+        if ('ids' in attrs) == ('filter' in attrs):
+            raise serializers.ValidationError("Provide either ids or filter.")
+        return attrs
+
+
+# Query parameters for a user's own reservation list
+class UserReservationFilterSerializer(serializers.Serializer):
+    cursor = serializers.CharField(required=False)
+    page_size = serializers.IntegerField(min_value=1, max_value=MAX_PAGE_SIZE, default=DEFAULT_PAGE_SIZE)
+    when = serializers.ChoiceField(choices=['all', 'upcoming', 'past'], default='all')
@@ -0,0 +1,86 @@
+from datetime import date, timedelta
+from time import perf_counter
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Value
+from django.utils import timezone
+from ..models import ArchivedNotification, ArchivedReservation, Notification, Reservation, SlotOccupancy
+from . import notifications
+
+# Columns copied as-is; the archive models use the same attribute names
+RESERVATION_COLUMNS = [field.attname for field in Reservation._meta.concrete_fields]
+NOTIFICATION_COLUMNS = [field.attname for field in Notification._meta.concrete_fields if field.attname != 'is_read']
+
+
+def _copy(target, rows, columns):
+    # INSERT INTO target SELECT ..., so the rows never pass through Python.
+    # `rows` is a values_list() queryset whose columns match `columns`, with
+    # any annotations last as Django places them in the SELECT.
+    select, params = rows.query.sql_with_params()
+    quote = connection.ops.quote_name
+    names = ', '.join(quote(target._meta.get_field(name).column) for name in columns)
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {quote(target._meta.db_table)} ({names}) {select}', params)
+        return cursor.rowcount
+
+
+def retention_cutoff(today=None, retention_days=None):
+    # Reservations dated before this day belong in the archive
+    retention_days = settings.RESERVATION_RETENTION_DAYS if retention_days is None else retention_days
+    return (today or date.today()) - timedelta(days=retention_days)
+
+
+def _move_chunk(cutoff, chunk_size, archived_at, report):
+    # Copy the oldest reservations before `cutoff` and their notifications into
+    # the archive and delete them from the live tables, in one transaction.
+    # Returns False once nothing is left to move.
+    with transaction.atomic():
+        ids = list(
+            Reservation.objects.filter(date__lt=cutoff).order_by('date', 'id').values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return False
+        _copy(
+            ArchivedReservation,
+            Reservation.objects.filter(id__in=ids).annotate(archived_at=Value(archived_at))
+            .values_list(*RESERVATION_COLUMNS, 'archived_at'),
+            RESERVATION_COLUMNS + ['archived_at'],
+        )
+        unread = dict(
+            Notification.objects.filter(reservation_id__in=ids, is_read=False).order_by()
+            .values_list('user_id').annotate(count=Count('id'))
+        )
+        # Archived notifications are kept as read so they stop counting as unread
+        moved = _copy(
+            ArchivedNotification,
+            Notification.objects.filter(reservation_id__in=ids).annotate(read=Value(True))
+            .values_list(*NOTIFICATION_COLUMNS, 'read'),
+            NOTIFICATION_COLUMNS + ['is_read'],
+        )
+        notifications.on_archived(unread)
+        Notification.objects.filter(reservation_id__in=ids).delete()
+        Reservation.objects.filter(id__in=ids).delete()
+    report['reservations'] += len(ids)
+    report['notifications'] += moved
+    report['chunks'] += 1
+    return True
+
+
+def archive(cutoff=None, chunk_size=None):
+    # Move everything dated before `cutoff` a chunk at a time, so each
+    # transaction holds the write lock briefly and a failure only loses the
+    # chunk in progress. Rollup counters are left alone: they already hold
+    # these days. Returns a report with the rows moved and the rate.
+    cutoff = cutoff or retention_cutoff()
+    chunk_size = chunk_size or settings.ARCHIVE_CHUNK_SIZE
+    archived_at = timezone.now()
+    report = {'reservations': 0, 'notifications': 0, 'chunks': 0, 'occupancy_rows': 0}
+    started = perf_counter()
+    while _move_chunk(cutoff, chunk_size, archived_at, report):
+        pass
+    # Capacity counters of archived days are never read again
+    report['occupancy_rows'] = SlotOccupancy.objects.filter(date__lt=cutoff).delete()[0]
+    report['seconds'] = perf_counter() - started
+    moved = report['reservations'] + report['notifications']
+    report['rows_per_second'] = moved / report['seconds'] if report['seconds'] else 0.0
+    return report
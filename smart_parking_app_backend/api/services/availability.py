@@ -0,0 +1,227 @@
+import threading
+from time import monotonic
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from datetime import timedelta
+from django.conf import settings
+from ..models import Reservation
+
+# Seconds an index may be served before it is rebuilt from the database.
+# Bounds staleness caused by writes handled in other worker processes.
+INDEX_TTL = getattr(settings, 'AVAILABILITY_INDEX_TTL', 30)
+# Maximum number of (location, vehicle_type, date) indexes kept in memory
+INDEX_MAX_ENTRIES = getattr(settings, 'AVAILABILITY_INDEX_MAX_ENTRIES', 512)
+# Longest reservation accepted, so spillover never reaches past the next day
+MAX_DURATION_HOURS = 24
+DAY_SECONDS = 24 * 3600
+
+
+def _seconds(value):
+    # Offset of a time of day from midnight, in seconds
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+# Interval index over the reservations occupying one (location, vehicle_type, date).
+# Offsets are seconds from that date's midnight; reservations spilling over
+# from the previous day have negative starts.
+class ReservationIntervalIndex:
+    def __init__(self):
+        self._starts = {}    # slot_type_id -> sorted start offsets
+        self._ends = {}      # slot_type_id -> sorted end offsets
+        self._members = {}   # reservation id -> (slot_type_id, start, end)
+        self.built_at = monotonic()
+
+    def add(self, reservation_id, slot_type_id, start, end):
+        # Adding the same reservation twice is a no-op
+        if reservation_id in self._members:
+            return
+        self._members[reservation_id] = (slot_type_id, start, end)
+        insort(self._starts.setdefault(slot_type_id, []), start)
+        insort(self._ends.setdefault(slot_type_id, []), end)
+
+    def remove(self, reservation_id):
+        member = self._members.pop(reservation_id, None)
+        if member is None:
+            return
+        slot_type_id, start, end = member
+        starts = self._starts[slot_type_id]
+        ends = self._ends[slot_type_id]
+        del starts[bisect_left(starts, start)]
+        del ends[bisect_left(ends, end)]
+
+    def count_overlapping(self, start, end):
+        # Count intervals overlapping [start, end) per slot type.
+        # Every interval ending at or before `start` also starts before `end`,
+        # so the overlap count is a difference of two binary searches.
+        return {
+            slot_type_id: bisect_left(starts, end) - bisect_right(self._ends[slot_type_id], start)
+            for slot_type_id, starts in self._starts.items()
+        }
+
+    def peak_occupancy(self, start, end):
+        # Highest number of concurrent intervals within [start, end) per slot type,
+        # found by sweeping the sorted endpoints that fall inside the window
+        peaks = {}
+        for slot_type_id, starts in self._starts.items():
+            ends = self._ends[slot_type_id]
+            i = bisect_right(starts, start)
+            j = bisect_right(ends, start)
+            occupancy = peak = i - j
+            while i < len(starts) and starts[i] < end:
+                # Ends are processed first on ties since intervals are half-open
+                if j < len(ends) and ends[j] <= starts[i]:
+                    occupancy -= 1
+                    j += 1
+                else:
+                    occupancy += 1
+                    i += 1
+                    peak = max(peak, occupancy)
+            peaks[slot_type_id] = peak
+        return peaks
+
+    def __len__(self):
+        return len(self._members)
+
+
+_indexes = OrderedDict()
+_lock = threading.Lock()
+
+
+def _interval(time, duration_hours, day_offset=0):
+    start = _seconds(time) + day_offset * DAY_SECONDS
+    return start, start + duration_hours * 3600
+
+
+def _index_rows(location_id, vehicle_type_id, date):
+    # The day's reservations and the previous day's spillover, in a single query
+    return Reservation.objects.filter(
+        location_id=location_id,
+        vehicle_type_id=vehicle_type_id,
+        date__range=(date - timedelta(days=1), date),
+        is_cancelled=False
+    ).values_list('id', 'slot_type_id', 'date', 'time', 'duration_hours')
+
+
+def _add_row(index, row, date):
+    reservation_id, slot_type_id, res_date, time, duration_hours = row
+    start, end = _interval(time, duration_hours, (res_date - date).days)
+    if end > 0:
+        index.add(reservation_id, slot_type_id, start, end)
+
+
+def build_index(location_id, vehicle_type_id, date):
+    index = ReservationIntervalIndex()
+    for row in _index_rows(location_id, vehicle_type_id, date):
+        _add_row(index, row, date)
+    return index
+
+
+async def abuild_index(location_id, vehicle_type_id, date):
+    index = ReservationIntervalIndex()
+    async for row in _index_rows(location_id, vehicle_type_id, date):
+        _add_row(index, row, date)
+    return index
+
+
+def _fresh_index(key):
+    with _lock:
+        index = _indexes.get(key)
+        if index is not None and monotonic() - index.built_at < INDEX_TTL:
+            _indexes.move_to_end(key)
+            return index
+    return None
+
+
+def _store_index(key, index):
+    with _lock:
+        _indexes[key] = index
+        _indexes.move_to_end(key)
+        while len(_indexes) > INDEX_MAX_ENTRIES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def get_index(location_id, vehicle_type_id, date):
+    key = (location_id, vehicle_type_id, date)
+    index = _fresh_index(key)
+    if index is None:
+        # Build outside the lock so slow queries do not block other keys
+        index = _store_index(key, build_index(*key))
+    return index
+
+
+async def aget_index(location_id, vehicle_type_id, date):
+    key = (location_id, vehicle_type_id, date)
+    index = _fresh_index(key)
+    if index is None:
+        index = _store_index(key, await abuild_index(*key))
+    return index
+
+
+def _loaded_indexes(reservation):
+    # Built indexes for the days the reservation occupies, with its interval on each
+    start, end = _interval(reservation.time, reservation.duration_hours)
+    for day_offset in range(2):
+        index = _indexes.get((
+            reservation.location_id,
+            reservation.vehicle_type_id,
+            reservation.date + timedelta(days=day_offset)
+        ))
+        shift = day_offset * DAY_SECONDS
+        if index is not None and end - shift > 0:
+            yield index, start - shift, end - shift
+
+
+def record_reservation(reservation):
+    # Keep already built indexes current after a reservation is created
+    if reservation.is_cancelled:
+        return
+    with _lock:
+        for index, start, end in _loaded_indexes(reservation):
+            index.add(reservation.id, reservation.slot_type_id, start, end)
+
+
+def discard_reservation(reservation):
+    # Drop a cancelled reservation from already built indexes
+    with _lock:
+        for index, _, _ in _loaded_indexes(reservation):
+            index.remove(reservation.id)
+
+
+def clear_indexes():
+    with _lock:
+        _indexes.clear()
+
+
+def _day_windows(date, start_time, duration_hours):
+    # (day, start, end) pieces of a window, split at midnight
+    start, end = _interval(start_time, duration_hours)
+    day = date
+    while start < end:
+        yield day, start, min(end, DAY_SECONDS)
+        start, end = 0, end - DAY_SECONDS
+        day += timedelta(days=1)
+
+
+def _merge_peaks(peaks, index, start, end):
+    with _lock:
+        day_peaks = index.peak_occupancy(start, end)
+    for slot_type_id, peak in day_peaks.items():
+        peaks[slot_type_id] = max(peaks.get(slot_type_id, 0), peak)
+
+
+def peak_occupancy(location_id, vehicle_type_id, date, start_time, duration_hours=1):
+    # Peak number of active reservations per slot type during the requested window.
+    # A window crossing midnight is split across the daily indexes it touches.
+    peaks = {}
+    for day, start, end in _day_windows(date, start_time, duration_hours):
+        _merge_peaks(peaks, get_index(location_id, vehicle_type_id, day), start, end)
+    return peaks
+
+
+async def apeak_occupancy(location_id, vehicle_type_id, date, start_time, duration_hours=1):
+    # peak_occupancy for async views
+    peaks = {}
+    for day, start, end in _day_windows(date, start_time, duration_hours):
+        _merge_peaks(peaks, await aget_index(location_id, vehicle_type_id, day), start, end)
+    return peaks
@@ -0,0 +1,76 @@
+from datetime import timedelta
+from itertools import accumulate
+from ..models import Reservation, SlotPricing
+from .availability import DAY_SECONDS
+
+HOUR_SECONDS = 3600
+
+
+def _hour_bounds(date, time, duration_hours, start_date):
+    # Hour buckets [first, last) touched by a reservation, relative to start_date
+    start = (date - start_date).days * DAY_SECONDS + time.hour * HOUR_SECONDS + time.minute * 60 + time.second
+    end = start + duration_hours * HOUR_SECONDS
+    return start // HOUR_SECONDS, -(-end // HOUR_SECONDS)
+
+
+def free_slot_columns(pricings, rows, start_date, days):
+    # Free slots per hour for each pricing, from (slot_type_id, date, time, duration_hours) rows
+    hours = days * 24
+    columns = {pricing.slot_type_id_id: column for column, pricing in enumerate(pricings)}
+
+    # One difference array per slot type: +1 where a reservation starts, -1 where it ends
+    deltas = [[0] * (hours + 1) for _ in pricings]
+    for slot_type_id, date, time, duration_hours in rows:
+        column = columns.get(slot_type_id)
+        if column is None:
+            continue
+        first, last = _hour_bounds(date, time, duration_hours, start_date)
+        first, last = max(first, 0), min(last, hours)
+        if first < last:
+            deltas[column][first] += 1
+            deltas[column][last] -= 1
+
+    # Running sums turn boundary deltas into occupancy, then subtract from capacity
+    return [
+        [max(pricing.available_slots - reserved, 0) for reserved in accumulate(delta[:hours])]
+        for pricing, delta in zip(pricings, deltas)
+    ]
+
+
+def build_availability_grid(location_id, vehicle_type_id, start_date, days):
+    # Free slots for every (day, hour, slot type) in the range. An hour counts a
+    # reservation when it overlaps any part of that hour, so the grid is a
+    # conservative view compared with the minute-accurate availability search.
+    pricings = list(
+        SlotPricing.objects.filter(location_id=location_id, vehicle_type_id=vehicle_type_id)
+        .select_related('slot_type_id')
+        .order_by('slot_type_id')
+    )
+    # Previous day is included for reservations spilling past midnight
+    rows = Reservation.objects.filter(
+        location_id=location_id,
+        vehicle_type_id=vehicle_type_id,
+        date__range=(start_date - timedelta(days=1), start_date + timedelta(days=days - 1)),
+        is_cancelled=False
+    ).values_list('slot_type_id', 'date', 'time', 'duration_hours')
+
+    free = free_slot_columns(pricings, rows, start_date, days)
+    grid = [
+        [[column[day * 24 + hour] for column in free] for hour in range(24)]
+        for day in range(days)
+    ]
+
+    return {
+        'location_id': location_id,
+        'vehicle_type_id': vehicle_type_id,
+        'dates': [str(start_date + timedelta(days=day)) for day in range(days)],
+        'slot_types': [
+            {
+                'id': pricing.slot_type_id_id,
+                'name': pricing.slot_type_id.name,
+                'capacity': pricing.available_slots,
+            }
+            for pricing in pricings
+        ],
+        'grid': grid,
+    }
@@ -0,0 +1,173 @@
+import csv
+import io
+import json
+from itertools import islice
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, transaction
+from ..models import Location, SlotPricing, SlotType, VehicleType
+from ..serializers.location_serializers import CatalogRowSerializer
+from . import reference_data
+
+FORMATS = ('csv', 'ndjson')
+# One row per slot pricing; a location without pricings is a row with only the first two columns
+COLUMNS = ['location_name', 'address', 'slot_type', 'vehicle_type', 'rate_per_hour', 'available_slots']
+CHUNK_SIZE = 500
+# Per-row errors returned in a report; the total is always counted
+MAX_REPORTED_ERRORS = 1000
+
+
+class CatalogFormatError(Exception):
+    pass
+
+
+def read_rows(stream, file_format):
+    # Yield (line number, row dict) from a text stream. Rows that cannot be
+    # parsed are yielded as (line number, None) so they are reported, not fatal.
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        if reader.fieldnames is None or not {'location_name', 'address'} <= set(reader.fieldnames):
+            raise CatalogFormatError(f"CSV header must include: {', '.join(COLUMNS)}")
+        for row in reader:
+            yield reader.line_num, row
+    elif file_format == 'ndjson':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else None
+    else:
+        raise CatalogFormatError(f"Unsupported format: {file_format}")
+
+
+def _validate_chunk(chunk, slot_types, vehicle_types, report):
+    # Validate a chunk without touching the database; returns usable rows
+    valid = []
+    for line_number, row in chunk:
+        if row is None:
+            _add_error(report, line_number, {'row': ["Could not parse row."]})
+            continue
+        serializer = CatalogRowSerializer(data=row, context={'slot_types': slot_types, 'vehicle_types': vehicle_types})
+        if serializer.is_valid():
+            valid.append((line_number, serializer.validated_data))
+        else:
+            _add_error(report, line_number, serializer.errors)
+    return valid
+
+
+def _add_error(report, line_number, errors):
+    report['error_count'] += 1
+    if len(report['errors']) < MAX_REPORTED_ERRORS:
+        report['errors'].append({'line': line_number, 'errors': errors})
+
+
+def _apply_chunk(valid, report):
+    # Write one validated chunk with a fixed number of bulk statements
+    keys = {(data['location_name'], data['address']) for _, data in valid}
+    locations = {}
+    for location in Location.objects.filter(name__in={name for name, _ in keys}).order_by('id'):
+        locations.setdefault((location.name, location.address), location)
+    new_locations = [Location(name=name, address=address) for name, address in keys if (name, address) not in locations]
+    for location in Location.objects.bulk_create(new_locations):
+        locations[(location.name, location.address)] = location
+
+    # Later rows for the same pricing win over earlier ones
+    wanted = {}
+    for _, data in valid:
+        if data.get('slot_type') is not None:
+            location = locations[(data['location_name'], data['address'])]
+            wanted[(location.id, data['slot_type'], data['vehicle_type'])] = data
+
+    existing = {
+        (pricing.location_id_id, pricing.slot_type_id_id, pricing.vehicle_type_id_id): pricing
+        for pricing in SlotPricing.objects.filter(location_id__in={key[0] for key in wanted})
+    }
+    to_create, to_update = [], []
+    for key, data in wanted.items():
+        pricing = existing.get(key)
+        if pricing is None:
+            to_create.append(SlotPricing(
+                location_id_id=key[0], slot_type_id_id=key[1], vehicle_type_id_id=key[2],
+                rate_per_hour=data['rate_per_hour'], available_slots=data['available_slots']
+            ))
+        elif (pricing.rate_per_hour, pricing.available_slots) != (data['rate_per_hour'], data['available_slots']):
+            pricing.rate_per_hour = data['rate_per_hour']
+            pricing.available_slots = data['available_slots']
+            to_update.append(pricing)
+    SlotPricing.objects.bulk_create(to_create)
+    SlotPricing.objects.bulk_update(to_update, ['rate_per_hour', 'available_slots'])
+    if new_locations or to_create or to_update:
+        reference_data.bump_version()
+
+    report['locations_created'] += len(new_locations)
+    report['pricings_created'] += len(to_create)
+    report['pricings_updated'] += len(to_update)
+
+
+def import_catalog(stream, file_format, chunk_size=CHUNK_SIZE):
+    # Upsert locations (matched on name and address) and their pricings (matched on
+    # slot type and vehicle type). Each chunk is applied in its own transaction, or
+    # savepoint when called inside one, so a failing chunk is rolled back and
+    # reported without undoing the others.
+    report = {
+        'rows': 0,
+        'locations_created': 0,
+        'pricings_created': 0,
+        'pricings_updated': 0,
+        'error_count': 0,
+        'errors': [],
+    }
+    slot_types = {}
+    for slot_type in SlotType.objects.order_by('id'):
+        slot_types.setdefault(slot_type.name.lower(), slot_type.id)
+    vehicle_types = {}
+    for vehicle_type in VehicleType.objects.order_by('id'):
+        vehicle_types.setdefault(vehicle_type.name.lower(), vehicle_type.id)
+
+    rows = read_rows(stream, file_format)
+    for chunk in iter(lambda: list(islice(rows, chunk_size)), []):
+        report['rows'] += len(chunk)
+        valid = _validate_chunk(chunk, slot_types, vehicle_types, report)
+        if not valid:
+            continue
+        try:
+            with transaction.atomic():
+                _apply_chunk(valid, report)
+        except DatabaseError as e:
+            for line_number, _ in valid:
+                _add_error(report, line_number, {'row': [f"Not saved: {e}"]})
+    return report
+
+
+def export_rows():
+    # Every pricing row, plus one bare row per location without pricings
+    pricings = SlotPricing.objects.order_by('location_id', 'id').values_list(
+        'location_id__name', 'location_id__address', 'slot_type_id__name',
+        'vehicle_type_id__name', 'rate_per_hour', 'available_slots'
+    )
+    for values in pricings.iterator(chunk_size=CHUNK_SIZE):
+        yield dict(zip(COLUMNS, values))
+    bare = Location.objects.filter(slot_pricings__isnull=True).order_by('id').values_list('name', 'address')
+    for name, address in bare.iterator(chunk_size=CHUNK_SIZE):
+        yield dict(zip(COLUMNS, (name, address, '', '', '', '')))
+
+
+def export_catalog(file_format):
+    # Yield the catalogue as encoded text, one line at a time
+    if file_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=COLUMNS)
+        writer.writeheader()
+        for row in export_rows():
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    elif file_format == 'ndjson':
+        for row in export_rows():
+            yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+    else:
+        raise CatalogFormatError(f"Unsupported format: {file_format}")
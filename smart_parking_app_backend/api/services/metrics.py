@@ -0,0 +1,154 @@
+import threading
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class ViewStats:
+    __slots__ = ('buckets', 'count', 'seconds', 'queries', 'db_seconds')
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)   # last one is +Inf
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+class ThreadStats:
+    # Counters written only by the thread that owns them, so recording needs no lock
+    def __init__(self):
+        self.views = {}      # view name -> ViewStats
+        self.responses = {}  # (view name, method, status) -> count
+
+
+_local = threading.local()
+_all_stats = []
+_registry_lock = threading.Lock()
+
+
+def _thread_stats():
+    stats = getattr(_local, 'stats', None)
+    if stats is None:
+        stats = _local.stats = ThreadStats()
+        # Only taken once per thread, when it records its first request
+        with _registry_lock:
+            _all_stats.append(stats)
+    return stats
+
+
+def _bucket(seconds):
+    for i, bound in enumerate(LATENCY_BUCKETS):
+        if seconds <= bound:
+            return i
+    return len(LATENCY_BUCKETS)
+
+
+def record(view, method, status, seconds, queries=0, db_seconds=0.0):
+    stats = _thread_stats()
+    view_stats = stats.views.get(view)
+    if view_stats is None:
+        view_stats = stats.views[view] = ViewStats()
+    view_stats.buckets[_bucket(seconds)] += 1
+    view_stats.count += 1
+    view_stats.seconds += seconds
+    view_stats.queries += queries
+    view_stats.db_seconds += db_seconds
+    key = (view, method, status)
+    stats.responses[key] = stats.responses.get(key, 0) + 1
+
+
+def snapshot():
+    # Merge every thread's counters. Copies are taken without stopping writers,
+    # so a scrape may miss requests finishing at that moment, never corrupt them.
+    views, responses = {}, {}
+    with _registry_lock:
+        all_stats = list(_all_stats)
+    for stats in all_stats:
+        for view, view_stats in list(stats.views.items()):
+            merged = views.setdefault(view, ViewStats())
+            merged.buckets = [a + b for a, b in zip(merged.buckets, view_stats.buckets)]
+            merged.count += view_stats.count
+            merged.seconds += view_stats.seconds
+            merged.queries += view_stats.queries
+            merged.db_seconds += view_stats.db_seconds
+        for key, count in list(stats.responses.items()):
+            responses[key] = responses.get(key, 0) + count
+    return views, responses
+
+
+def reset():
+    with _registry_lock:
+        for stats in _all_stats:
+            stats.views.clear()
+            stats.responses.clear()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render():
+    # Prometheus text exposition format (version 0.0.4)
+    views, responses = snapshot()
+    lines = [
+        '# HELP http_requests_total Requests handled, by view, method and status code.',
+        '# TYPE http_requests_total counter',
+    ]
+    for (view, method, status), count in sorted(responses.items()):
+        lines.append(f'http_requests_total{{view="{_escape(view)}",method="{method}",status="{status}"}} {count}')
+
+    lines += [
+        '# HELP http_request_duration_seconds Time spent producing a response, by view.',
+        '# TYPE http_request_duration_seconds histogram',
+    ]
+    for view, stats in sorted(views.items()):
+        label = _escape(view)
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), stats.buckets):
+            cumulative += count
+            lines.append(f'http_request_duration_seconds_bucket{{view="{label}",le="{bound}"}} {cumulative}')
+        lines.append(f'http_request_duration_seconds_sum{{view="{label}"}} {stats.seconds:.6f}')
+        lines.append(f'http_request_duration_seconds_count{{view="{label}"}} {stats.count}')
+
+    lines += [
+        '# HELP http_request_db_queries_total Database queries issued while handling requests, by view.',
+        '# TYPE http_request_db_queries_total counter',
+    ]
+    lines += [f'http_request_db_queries_total{{view="{_escape(view)}"}} {stats.queries}' for view, stats in sorted(views.items())]
+    lines += [
+        '# HELP http_request_db_seconds_total Time spent in database queries while handling requests, by view.',
+        '# TYPE http_request_db_seconds_total counter',
+    ]
+    lines += [f'http_request_db_seconds_total{{view="{_escape(view)}"}} {stats.db_seconds:.6f}' for view, stats in sorted(views.items())]
+    return '\n'.join(lines) + '\n'
+
+
+def render_task_queue(stats):
+    # Task queue gauges from task_queue.stats(), in the same text format
+    lines = [
+        '# HELP task_queue_depth Background tasks by name and status (queued, running, dead).',
+        '# TYPE task_queue_depth gauge',
+    ]
+    for (name, status), count in sorted(stats['depth'].items()):
+        lines.append(f'task_queue_depth{{name="{_escape(name)}",status="{status}"}} {count}')
+    lines += [
+        '# HELP task_queue_oldest_due_seconds Time the oldest due task has been waiting for a worker.',
+        '# TYPE task_queue_oldest_due_seconds gauge',
+        f"task_queue_oldest_due_seconds {stats['oldest_due_seconds']:.3f}",
+        '# HELP task_queue_wait_seconds Queue wait of recently finished tasks, by name.',
+        '# TYPE task_queue_wait_seconds gauge',
+    ]
+    for name, entry in sorted(stats['latency'].items()):
+        label = _escape(name)
+        lines.append(f'task_queue_wait_seconds{{name="{label}",stat="avg"}} {entry["wait_sum"] / entry["count"]:.6f}')
+        lines.append(f'task_queue_wait_seconds{{name="{label}",stat="max"}} {entry["wait_max"]:.6f}')
+    lines += [
+        '# HELP task_queue_run_seconds Average run time of recently finished tasks, by name.',
+        '# TYPE task_queue_run_seconds gauge',
+    ]
+    lines += [
+        f'task_queue_run_seconds{{name="{_escape(name)}"}} {entry["run_sum"] / entry["count"]:.6f}'
+        for name, entry in sorted(stats['latency'].items())
+    ]
+    return '\n'.join(lines) + '\n'
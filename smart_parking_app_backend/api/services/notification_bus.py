@@ -0,0 +1,53 @@
+import asyncio
+import threading
+from collections import defaultdict
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+# Fan-out of notification events to streams connected to this process.
+# Any class with the same publish/subscribe interface (for example one
+# backed by an external broker) can be configured via NOTIFICATION_BROKER.
+class InProcessBroker:
+    def __init__(self):
+        self._subscribers = defaultdict(set)   # user_id -> {(loop, queue)}
+        self._lock = threading.Lock()
+
+    def publish(self, user_id, event):
+        # Safe to call from sync request threads; delivery hops onto each stream's loop
+        with self._lock:
+            targets = list(self._subscribers.get(user_id, ()))
+        for loop, queue in targets:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # The stream's event loop has already shut down
+                pass
+
+    def subscribe(self, user_id):
+        # Register a queue for the calling event loop; pair with unsubscribe()
+        queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers[user_id].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        with self._lock:
+            entries = self._subscribers.get(user_id, set())
+            entries.difference_update({entry for entry in entries if entry[1] is queue})
+            if not entries:
+                self._subscribers.pop(user_id, None)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(settings, 'NOTIFICATION_BROKER', 'api.services.notification_bus.InProcessBroker')
+                _broker = import_string(path)()
+    return _broker
@@ -0,0 +1,98 @@
+from collections import Counter, defaultdict
+from django.db import transaction
+from django.db.models import Count, F
+from ..models import Notification, NotificationCounter
+from ..serializers.notification_serializers import NotificationSerializer
+from .notification_bus import get_broker
+
+
+def _counter(user_id):
+    return NotificationCounter.objects.filter(pk=user_id).values_list('unread', flat=True)
+
+
+def unread_count(user_id):
+    # A single primary-key lookup on the counter row. Not cached: the default
+    # cache is per process, and writers in other processes (the task worker,
+    # the sweeper) could not invalidate it.
+    return _counter(user_id).first() or 0
+
+
+async def aunread_count(user_id):
+    # unread_count for async views
+    return await _counter(user_id).afirst() or 0
+
+
+def _adjust_counters(deltas):
+    # Apply per-user unread deltas inside the caller's transaction
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=user_id) for user_id in deltas], ignore_conflicts=True
+    )
+    # One UPDATE per distinct delta, so bulk changes touching many users stay cheap
+    by_delta = defaultdict(list)
+    for user_id, delta in deltas.items():
+        by_delta[delta].append(user_id)
+    for delta, user_ids in by_delta.items():
+        NotificationCounter.objects.filter(pk__in=user_ids).update(unread=F('unread') + delta)
+
+
+def publish_unread_count(user_id):
+    get_broker().publish(user_id, {'type': 'unread_count', 'data': {'unread_count': unread_count(user_id)}})
+
+
+def on_created(notifications):
+    # Count new unread notifications and push them once the rows are committed
+    _adjust_counters(Counter(n.user_id for n in notifications if not n.is_read))
+
+    def push():
+        broker = get_broker()
+        for notification in notifications:
+            broker.publish(notification.user_id, {
+                'type': 'notification',
+                'id': notification.id,
+                'data': NotificationSerializer(notification).data,
+            })
+        for user_id in {notification.user_id for notification in notifications}:
+            publish_unread_count(user_id)
+    transaction.on_commit(push)
+
+
+def on_read(user_id, count):
+    # `count` notifications of the user just went from unread to read
+    _adjust_counters({user_id: -count})
+    transaction.on_commit(lambda: publish_unread_count(user_id))
+
+
+def on_archived(unread_by_user):
+    # Unread notifications moved to the archive no longer count as unread. No
+    # event is pushed: archiving touches many users at once.
+    _adjust_counters({user_id: -count for user_id, count in unread_by_user.items()})
+
+
+def on_deleted(unread_by_user):
+    # Unread notifications deleted along with their reservations, e.g. when a
+    # location is removed. Like archiving, this can touch many users at once.
+    _adjust_counters({user_id: -count for user_id, count in unread_by_user.items()})
+
+
+def reconcile():
+    # Recompute every counter from notifications and fix the ones that drifted
+    with transaction.atomic():
+        actual = dict(
+            Notification.objects.filter(is_read=False).order_by()
+            .values_list('user_id').annotate(count=Count('id'))
+        )
+        stored = dict(NotificationCounter.objects.values_list('user_id', 'unread'))
+        drifted = {
+            user_id: actual.get(user_id, 0)
+            for user_id in actual.keys() | stored.keys()
+            if actual.get(user_id, 0) != stored.get(user_id, 0)
+        }
+        NotificationCounter.objects.bulk_create(
+            [NotificationCounter(user_id=user_id) for user_id in drifted], ignore_conflicts=True
+        )
+        for user_id, unread in drifted.items():
+            NotificationCounter.objects.filter(pk=user_id).update(unread=unread)
+    return drifted
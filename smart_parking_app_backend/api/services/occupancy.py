@@ -0,0 +1,143 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Greatest
+from ..models import Reservation, SlotOccupancy, SlotPricing
+from . import rollups
+
+
+class CapacityExceeded(Exception):
+    pass
+
+
+def hour_buckets(date, time, duration_hours):
+    # (date, hour) buckets touched by a reservation, rolling over midnight
+    start = time.hour * 3600 + time.minute * 60 + time.second
+    first = start // 3600
+    last = -(-(start + duration_hours * 3600) // 3600)
+    return [
+        (date + timedelta(days=hour // 24), hour % 24)
+        for hour in range(first, last)
+    ]
+
+
+def _buckets_filter(reservation):
+    # Match every occupancy row the reservation counts against
+    by_date = {}
+    for date, hour in hour_buckets(reservation.date, reservation.time, reservation.duration_hours):
+        by_date.setdefault(date, []).append(hour)
+    condition = Q()
+    for date, hours in by_date.items():
+        condition |= Q(date=date, hour__in=hours)
+    return Q(
+        location_id=reservation.location_id,
+        slot_type_id=reservation.slot_type_id,
+        vehicle_type_id=reservation.vehicle_type_id,
+    ) & condition
+
+
+def claim(reservation):
+    # Reserve one slot in every hour of the reservation. Must run inside the
+    # transaction that saves the reservation so a full hour rolls back both.
+    if reservation.is_cancelled:
+        return
+    capacity = SlotPricing.objects.values_list('available_slots', flat=True).get(
+        location_id=reservation.location_id,
+        slot_type_id=reservation.slot_type_id,
+        vehicle_type_id=reservation.vehicle_type_id,
+    )
+    buckets = hour_buckets(reservation.date, reservation.time, reservation.duration_hours)
+    SlotOccupancy.objects.bulk_create([
+        SlotOccupancy(
+            location_id=reservation.location_id,
+            slot_type_id=reservation.slot_type_id,
+            vehicle_type_id=reservation.vehicle_type_id,
+            date=date,
+            hour=hour,
+        )
+        for date, hour in buckets
+    ], ignore_conflicts=True)
+
+    # Single conditional UPDATE: an hour already at capacity is left untouched
+    claimed = SlotOccupancy.objects.filter(
+        _buckets_filter(reservation),
+        reserved__lt=capacity
+    ).update(reserved=F('reserved') + 1)
+    if claimed != len(buckets):
+        raise CapacityExceeded("No slots available for the selected time.")
+
+
+def release(reservation):
+    # Give back the slots held by a reservation
+    SlotOccupancy.objects.filter(
+        _buckets_filter(reservation),
+        reserved__gt=0
+    ).update(reserved=F('reserved') - 1)
+
+
+def release_many(reservations):
+    # Give back the slots of many reservations: one UPDATE per location, slot
+    # and vehicle type, day and number of slots freed, instead of one per reservation
+    counts = count_buckets(
+        (r.location_id, r.slot_type_id, r.vehicle_type_id, r.date, r.time, r.duration_hours)
+        for r in reservations
+    )
+    groups = defaultdict(list)
+    for (location_id, slot_type_id, vehicle_type_id, date, hour), freed in counts.items():
+        groups[(location_id, slot_type_id, vehicle_type_id, date, freed)].append(hour)
+    for (location_id, slot_type_id, vehicle_type_id, date, freed), hours in groups.items():
+        SlotOccupancy.objects.filter(
+            location_id=location_id, slot_type_id=slot_type_id, vehicle_type_id=vehicle_type_id,
+            date=date, hour__in=hours
+        ).update(reserved=Greatest(F('reserved') - freed, Value(0)))
+
+
+def cancel(reservation):
+    # Cancel and release capacity exactly once, even under concurrent requests.
+    # Returns False when the reservation was already cancelled.
+    with transaction.atomic():
+        # The rollup delta is taken from the locked row, not the caller's copy,
+        # which an approve or mark-paid may have changed since it was loaded
+        current = Reservation.objects.select_for_update().filter(pk=reservation.pk, is_cancelled=False).first()
+        if current is not None:
+            before = rollups.contribution(current)
+            Reservation.objects.filter(pk=current.pk).update(is_cancelled=True)
+            current.is_cancelled = True
+            release(current)
+            rollups.record_change(current, before)
+            for field in ('is_approved', 'is_paid', 'has_arrived', 'has_exited'):
+                setattr(reservation, field, getattr(current, field))
+    reservation.is_cancelled = True
+    return current is not None
+
+
+def count_buckets(rows):
+    # Occupancy per bucket key from (location_id, slot_type_id, vehicle_type_id, date, time, duration_hours) rows
+    counts = Counter()
+    for location_id, slot_type_id, vehicle_type_id, date, time, duration_hours in rows:
+        for bucket_date, hour in hour_buckets(date, time, duration_hours):
+            counts[(location_id, slot_type_id, vehicle_type_id, bucket_date, hour)] += 1
+    return counts
+
+
+def rebuild():
+    # Recompute every counter from active reservations
+    rows = Reservation.objects.filter(is_cancelled=False).values_list(
+        'location_id', 'slot_type_id', 'vehicle_type_id', 'date', 'time', 'duration_hours'
+    )
+    with transaction.atomic():
+        counts = count_buckets(rows.iterator(chunk_size=2000))
+        SlotOccupancy.objects.all().delete()
+        SlotOccupancy.objects.bulk_create([
+            SlotOccupancy(
+                location_id=location_id,
+                slot_type_id=slot_type_id,
+                vehicle_type_id=vehicle_type_id,
+                date=date,
+                hour=hour,
+                reserved=reserved,
+            )
+            for (location_id, slot_type_id, vehicle_type_id, date, hour), reserved in counts.items()
+        ], batch_size=1000)
+    return len(counts)
@@ -0,0 +1,187 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from ..models import CheckoutSession, PaymentEvent, Reservation
+from . import paymongo, rollups
+
+PAID_EVENT = 'checkout_session.payment.paid'
+# Checkout sessions fetched per reconciliation batch, and concurrent fetches
+RECONCILE_BATCH_SIZE = 50
+RECONCILE_WORKERS = 8
+
+
+def enqueue(payload):
+    # Store a verified webhook event for the worker. PayMongo redelivers until it
+    # gets a 2xx, so a repeated event id is ignored instead of queued twice.
+    data = payload.get('data') or {}
+    event_id = data.get('id')
+    event_type = (data.get('attributes') or {}).get('type')
+    if not event_id or not event_type:
+        raise ValueError("Webhook payload has no event id or type")
+    PaymentEvent.objects.bulk_create(
+        [PaymentEvent(event_id=event_id, event_type=event_type, payload=payload)], ignore_conflicts=True
+    )
+
+
+def open_checkout(checkout_id, attributes):
+    # Background task: create the PayMongo checkout session for a CheckoutSession row
+    checkout = CheckoutSession.objects.get(pk=checkout_id)
+    if checkout.status != CheckoutSession.CREATING:
+        # Finished by an earlier attempt
+        return
+    try:
+        data = paymongo.get_client().create_checkout_session(attributes)
+    except paymongo.GatewayResponseError as e:
+        # Rejected by the gateway; retrying would not help
+        fail_checkout({'checkout_id': checkout_id}, json.dumps(e.details))
+        return
+    except paymongo.GatewayUnavailable as e:
+        if not e.sent:
+            # Never reached the gateway: the task is retried with backoff
+            raise
+        # The POST may have created a session (e.g. it timed out after being
+        # sent). Repeating it could open a second one, so the checkout fails
+        # and the user starts a new one.
+        fail_checkout({'checkout_id': checkout_id}, f"PayMongo did not confirm the checkout: {e}")
+        return
+    if not data.get('id'):
+        fail_checkout({'checkout_id': checkout_id}, "PayMongo returned no checkout session id")
+        return
+    CheckoutSession.objects.filter(pk=checkout_id, status=CheckoutSession.CREATING).update(
+        session_id=data['id'],
+        checkout_url=(data.get('attributes') or {}).get('checkout_url') or '',
+        status=CheckoutSession.PENDING,
+    )
+
+
+def fail_checkout(payload, error):
+    # Also the dead-letter hook of the open_checkout task
+    CheckoutSession.objects.filter(pk=payload['checkout_id'], status=CheckoutSession.CREATING).update(
+        status=CheckoutSession.FAILED, error=error
+    )
+
+
+def _paid_session_id(event):
+    # Checkout session paid by this event, or None for events not acted on
+    if event['event_type'] != PAID_EVENT:
+        return None
+    resource = ((event['payload'].get('data') or {}).get('attributes') or {}).get('data') or {}
+    return resource.get('id')
+
+
+def mark_sessions_paid(session_ids, paid_at=None):
+    # One UPDATE for the sessions and one for their reservations, however many
+    # there are. Returns (sessions changed, reservations changed).
+    if not session_ids:
+        return 0, 0
+    paid_at = paid_at or timezone.now()
+    with transaction.atomic():
+        sessions = CheckoutSession.objects.filter(session_id__in=session_ids).exclude(
+            status=CheckoutSession.PAID
+        ).update(status=CheckoutSession.PAID, paid_at=paid_at)
+        # Lock the rows first so the rollup delta matches exactly what is updated
+        reservation_ids = list(Reservation.objects.select_for_update().filter(
+            checkout_session__session_id__in=session_ids, is_paid=False
+        ).values_list('id', flat=True))
+        if reservation_ids:
+            unpaid = Reservation.objects.filter(id__in=reservation_ids)
+            rollups.record_many(unpaid.filter(is_cancelled=False, is_approved=True), paid=1)
+            unpaid.update(is_paid=True)
+    return sessions, len(reservation_ids)
+
+
+def process_batch(batch_size=None):
+    # Apply the oldest unprocessed events together. Returns how many were handled.
+    batch_size = batch_size or settings.PAYMENT_EVENT_BATCH_SIZE
+    events = list(
+        PaymentEvent.objects.filter(processed_at__isnull=True)
+        .order_by('id').values('id', 'event_type', 'payload')[:batch_size]
+    )
+    if not events:
+        return 0
+    event_ids = [event['id'] for event in events]
+    session_ids = {session_id for session_id in map(_paid_session_id, events) if session_id}
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            mark_sessions_paid(session_ids, now)
+            PaymentEvent.objects.filter(id__in=event_ids).update(
+                processed_at=now, attempts=F('attempts') + 1, last_error=''
+            )
+    except Exception as e:
+        # Left unprocessed for the next run, with the reason kept for inspection
+        PaymentEvent.objects.filter(id__in=event_ids).update(attempts=F('attempts') + 1, last_error=str(e))
+        raise
+    return len(events)
+
+
+def process_pending(batch_size=None):
+    # Drain the queue batch by batch
+    total = 0
+    while handled := process_batch(batch_size):
+        total += handled
+    return total
+
+
+def _gateway_status(resource):
+    attributes = resource.get('attributes') or {}
+    if any((payment.get('attributes') or {}).get('status') == 'paid' for payment in attributes.get('payments') or []):
+        return CheckoutSession.PAID
+    if attributes.get('status') == 'expired':
+        return CheckoutSession.EXPIRED
+    return CheckoutSession.PENDING
+
+
+def _fetch_status(client, session_id):
+    try:
+        return session_id, _gateway_status(client.retrieve_checkout_session(session_id))
+    except paymongo.GatewayError:
+        return session_id, None
+
+
+def reconcile(client=None, older_than=None, batch_size=RECONCILE_BATCH_SIZE, workers=RECONCILE_WORKERS):
+    # Catch up on webhooks that never arrived: poll checkouts still pending after
+    # `older_than` seconds, a batch at a time over the pooled client, and apply
+    # each batch with one update per outcome
+    client = client or paymongo.get_client()
+    older_than = settings.PAYMENT_RECONCILE_AFTER if older_than is None else older_than
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    report = {'checked': 0, 'paid': 0, 'expired': 0, 'errors': 0, 'reservations': 0}
+
+    # Sessions already paid whose reservation was created after the event was applied
+    stranded = list(CheckoutSession.objects.filter(
+        status=CheckoutSession.PAID, reservation__is_paid=False
+    ).values_list('session_id', flat=True))
+    report['reservations'] += mark_sessions_paid(stranded)[1]
+
+    last_id = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            batch = list(
+                CheckoutSession.objects.filter(status=CheckoutSession.PENDING, id__gt=last_id, created_at__lte=cutoff)
+                .order_by('id').values_list('id', 'session_id')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            outcomes = list(pool.map(partial(_fetch_status, client), [session_id for _, session_id in batch]))
+
+            paid = [session_id for session_id, outcome in outcomes if outcome == CheckoutSession.PAID]
+            expired = [session_id for session_id, outcome in outcomes if outcome == CheckoutSession.EXPIRED]
+            sessions, reservations = mark_sessions_paid(paid)
+            report['paid'] += sessions
+            report['reservations'] += reservations
+            report['expired'] += CheckoutSession.objects.filter(
+                session_id__in=expired, status=CheckoutSession.PENDING
+            ).update(status=CheckoutSession.EXPIRED)
+            report['checked'] += len(batch)
+            report['errors'] += sum(1 for _, outcome in outcomes if outcome is None)
+            if client.breaker.is_open:
+                # The gateway is down; the rest waits for the next run
+                break
+    return report
@@ -0,0 +1,238 @@
+import base64
+import hashlib
+import hmac
+import random
+import threading
+import time
+from time import monotonic
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+# Statuses worth retrying: rate limiting and gateway/proxy failures
+RETRY_STATUSES = {429, 502, 503, 504}
+# A POST is only retried when the gateway cannot have acted on it
+SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+
+class GatewayError(Exception):
+    pass
+
+
+class GatewayUnavailable(GatewayError):
+    # Network failure, timeout, 5xx after retries, or the circuit is open.
+    # `sent` is False only when the gateway cannot have acted on the request.
+    def __init__(self, message, retry_after=None, sent=True):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.sent = sent
+
+
+class GatewayResponseError(GatewayError):
+    # The gateway rejected the request (4xx); retrying will not help
+    def __init__(self, status_code, details):
+        super().__init__(f"PayMongo returned {status_code}")
+        self.status_code = status_code
+        self.details = details
+
+
+class WebhookSignatureError(GatewayError):
+    pass
+
+
+def _never_sent(error):
+    # True when the connection failed before any bytes of the request went out
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class CircuitBreaker:
+    # Opens after `failure_threshold` consecutive failures and rejects calls
+    # for `reset_timeout` seconds, then lets one trial call through (half-open)
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if monotonic() - self._opened_at >= self.reset_timeout and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def retry_after(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 0
+            return max(0, int(self.reset_timeout - (monotonic() - self._opened_at)) + 1)
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = monotonic()
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self._opened_at is not None
+
+
+class PayMongoClient:
+    # Shared HTTP client: one keep-alive pool, fixed auth header, strict timeouts
+    def __init__(self, secret_key, base_url, connect_timeout=3.05, read_timeout=10,
+                 max_retries=2, backoff=0.25, max_backoff=2.0, pool_size=10, breaker=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        # Retries are handled here so they can respect method safety and the breaker
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            # Built once instead of per request
+            'Authorization': 'Basic ' + base64.b64encode(f'{secret_key}:'.encode()).decode(),
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+        })
+
+    def _sleep_before_retry(self, attempt):
+        # Exponential backoff with full jitter
+        time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+
+    def request(self, method, path, json=None, headers=None):
+        method = method.upper()
+        url = f'{self.base_url}/{path.lstrip("/")}'
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                raise GatewayUnavailable(
+                    "PayMongo is unavailable, try again shortly.", self.breaker.retry_after(), sent=False
+                )
+            last_attempt = attempt == self.max_retries
+            try:
+                response = self.session.request(method, url, json=json, headers=headers, timeout=self.timeout)
+            except requests.exceptions.ConnectionError as e:
+                # Includes connect timeouts
+                self.breaker.record_failure()
+                if last_attempt or not (method in SAFE_METHODS or _never_sent(e)):
+                    raise GatewayUnavailable(f"Request to PayMongo failed: {e}", sent=not _never_sent(e))
+                self._sleep_before_retry(attempt)
+                continue
+            except requests.exceptions.Timeout as e:
+                self.breaker.record_failure()
+                if last_attempt or method not in SAFE_METHODS:
+                    raise GatewayUnavailable(f"PayMongo did not respond in time: {e}")
+                self._sleep_before_retry(attempt)
+                continue
+            except requests.exceptions.RequestException as e:
+                # Truncated or undecodable responses, redirect loops: the request
+                # went out. Recorded so a half-open trial always ends.
+                self.breaker.record_failure()
+                if last_attempt or method not in SAFE_METHODS:
+                    raise GatewayUnavailable(f"Request to PayMongo failed: {e}")
+                self._sleep_before_retry(attempt)
+                continue
+
+            if response.status_code >= 500 or response.status_code == 429:
+                self.breaker.record_failure()
+                retryable = response.status_code in RETRY_STATUSES and (
+                    method in SAFE_METHODS or response.status_code in (429, 503))
+                if last_attempt or not retryable:
+                    # 429 and 503 are refusals; other errors may follow partial processing
+                    raise GatewayUnavailable(
+                        f"PayMongo returned {response.status_code}", sent=response.status_code not in (429, 503)
+                    )
+                self._sleep_before_retry(attempt)
+                continue
+
+            self.breaker.record_success()
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+            if response.status_code >= 400:
+                raise GatewayResponseError(response.status_code, body)
+            return body
+
+    def create_checkout_session(self, attributes):
+        return self.request('POST', 'checkout_sessions', json={'data': {'attributes': attributes}}).get('data', {})
+
+    def retrieve_checkout_session(self, session_id):
+        return self.request('GET', f'checkout_sessions/{session_id}').get('data', {})
+
+
+def webhook_signature(payload, secret, timestamp):
+    # HMAC-SHA256 over "<timestamp>.<raw body>", as PayMongo signs webhooks
+    message = str(timestamp).encode() + b'.' + payload
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def verify_webhook_signature(payload, header, secret, tolerance=300, livemode=False, now=None):
+    # Header format: "t=<unix time>,te=<test mode signature>,li=<live mode signature>"
+    if not secret:
+        raise WebhookSignatureError("PayMongo webhook secret missing")
+    parts = dict(item.split('=', 1) for item in (header or '').split(',') if '=' in item)
+    timestamp = parts.get('t', '')
+    signature = parts.get('li' if livemode else 'te', '')
+    if not timestamp.isdigit() or not signature:
+        raise WebhookSignatureError("Malformed Paymongo-Signature header")
+    if abs((now or time.time()) - int(timestamp)) > tolerance:
+        # Stops captured requests from being replayed later
+        raise WebhookSignatureError("Webhook timestamp outside the allowed window")
+    if not hmac.compare_digest(webhook_signature(payload, secret, timestamp), signature):
+        raise WebhookSignatureError("Webhook signature mismatch")
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    # Process-wide client so every checkout reuses pooled connections
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if not settings.PAYMONGO_SECRET_KEY:
+                    raise GatewayError("PayMongo secret key missing")
+                _client = PayMongoClient(
+                    settings.PAYMONGO_SECRET_KEY,
+                    settings.PAYMONGO_API_BASE,
+                    connect_timeout=settings.PAYMONGO_CONNECT_TIMEOUT,
+                    read_timeout=settings.PAYMONGO_READ_TIMEOUT,
+                    max_retries=settings.PAYMONGO_MAX_RETRIES,
+                    breaker=CircuitBreaker(
+                        settings.PAYMONGO_BREAKER_THRESHOLD,
+                        settings.PAYMONGO_BREAKER_RESET_TIMEOUT
+                    ),
+                )
+    return _client
+
+
+def reset_client():
+    # Drop the shared client, e.g. after settings change in tests
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.session.close()
+        _client = None
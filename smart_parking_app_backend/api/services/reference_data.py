@@ -0,0 +1,88 @@
+import hashlib
+import threading
+from django.db.models import F
+from django.http import HttpResponse
+from django.utils.http import parse_etags, quote_etag
+from rest_framework.renderers import JSONRenderer
+from ..models import CatalogVersion
+
+# Single row holding the shared catalogue version
+VERSION_PK = 1
+
+_payloads = {}   # name -> (version, body, etag)
+_lock = threading.Lock()
+
+
+def _version_query():
+    return CatalogVersion.objects.filter(pk=VERSION_PK).values_list('version', flat=True)
+
+
+def current_version():
+    return _version_query().first() or 0
+
+
+async def acurrent_version():
+    return await _version_query().afirst() or 0
+
+
+def bump_version():
+    # Runs inside the writer's transaction, so other processes see the new
+    # version exactly when they can see the changed rows
+    CatalogVersion.objects.bulk_create([CatalogVersion(pk=VERSION_PK)], ignore_conflicts=True)
+    CatalogVersion.objects.filter(pk=VERSION_PK).update(version=F('version') + 1)
+
+
+def clear():
+    with _lock:
+        _payloads.clear()
+
+
+def _cached(name, version):
+    with _lock:
+        cached = _payloads.get(name)
+    if cached is not None and cached[0] == version:
+        return cached[1], cached[2]
+    return None
+
+
+def _store(name, version, data):
+    body = JSONRenderer().render(data)
+    # Strong validator: derived from the exact bytes sent
+    etag = quote_etag(hashlib.sha256(body).hexdigest()[:32])
+    with _lock:
+        _payloads[name] = (version, body, etag)
+    return body, etag
+
+
+def cached_payload(name, build):
+    # Rendered JSON body and ETag for `build()`, rebuilt only when the catalogue
+    # version has moved since this process last built it. The version is read
+    # before the data so a concurrent change can only make the copy newer.
+    version = current_version()
+    return _cached(name, version) or _store(name, version, build())
+
+
+async def acached_payload(name, abuild):
+    # cached_payload for async views; `abuild` is a coroutine function
+    version = await acurrent_version()
+    return _cached(name, version) or _store(name, version, await abuild())
+
+
+def _respond(request, body, etag):
+    # 304 without a body when the client already holds the current representation
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    # Clients must revalidate, which is cheap thanks to the ETag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def cached_response(request, name, build):
+    return _respond(request, *cached_payload(name, build))
+
+
+async def acached_response(request, name, abuild):
+    return _respond(request, *await acached_payload(name, abuild))
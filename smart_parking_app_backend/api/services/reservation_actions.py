@@ -0,0 +1,142 @@
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from ..models import Notification, Reservation
+from . import availability, notifications, occupancy, rollups, task_queue
+
+# Most reservations a single bulk request acts on
+MAX_BATCH = 500
+REFUND_METHODS = ['GCash', 'Maya', 'Card']
+
+# Admin transitions: the state a reservation must be in, and the fields set
+TRANSITIONS = {
+    'approve': ({'is_cancelled': False, 'is_approved': False}, {'is_approved': True}),
+    'mark_paid': ({'is_paid': False}, {'is_paid': True}),
+    'check_in': ({'has_arrived': False}, {'has_arrived': True}),
+    'check_out': ({'has_exited': False}, {'has_exited': True}),
+    'cancel': ({'is_cancelled': False}, {'is_cancelled': True}),
+}
+ACTIONS = list(TRANSITIONS)
+
+# Outcome reported for a reservation that fails a transition's condition
+SKIP_REASONS = {
+    'is_cancelled': 'cancelled',
+    'is_approved': 'already_approved',
+    'is_paid': 'already_paid',
+    'has_arrived': 'already_checked_in',
+    'has_exited': 'already_checked_out',
+}
+
+# Cancellation reason given when the sweeper cancels a reservation nobody arrived for
+NO_SHOW = 'no_show'
+
+
+def cancellation_message(reservation, reason=None):
+    # Refund wording depends on how the reservation was paid
+    cancelled = f"Your reservation on {reservation.date} at {reservation.location.name} has been cancelled."
+    if reason == NO_SHOW:
+        cancelled = f"Your reservation on {reservation.date} at {reservation.location.name} was cancelled because no arrival was recorded."
+    if reservation.mode_of_payment in REFUND_METHODS:
+        return f"{cancelled} A refund will be processed shortly."
+    if reservation.mode_of_payment == 'Cash' and reservation.is_paid:
+        return f"{cancelled} Please contact the administrator for a refund."
+    return cancelled
+
+
+def send_cancellation_notices(reservation_ids, reason=None):
+    # Build every message in one pass and create the notifications together.
+    # The task queue delivers at least once, so a reservation that already has
+    # a notice is skipped: cancelling is the only event a reservation is
+    # notified about, and it happens once. The rows are locked so two runs of
+    # the same task cannot both pass that check.
+    with transaction.atomic():
+        reservations = Reservation.objects.filter(
+            id__in=reservation_ids, is_cancelled=True, user__isnull=False
+        ).filter(
+            ~Exists(Notification.objects.filter(reservation=OuterRef('pk')))
+        ).select_related('location').select_for_update(of=('self',)).order_by('id')
+        created = Notification.objects.bulk_create([
+            Notification(user_id=r.user_id, reservation=r, message=cancellation_message(r, reason))
+            for r in reservations
+        ])
+        notifications.on_created(created)
+    return len(created)
+
+
+def _skip_reason(reservation, condition):
+    for field, value in condition.items():
+        if getattr(reservation, field) != value:
+            return SKIP_REASONS[field]
+    return None
+
+
+def _apply(action, reservations, limit=None, reason=None):
+    # Apply `action` to the locked rows of `reservations` with one conditional
+    # UPDATE, keeping rollups, occupancy and notifications in step. `reason`
+    # picks the wording of cancellation notices. Returns {reservation id: outcome}.
+    condition, changes = TRANSITIONS[action]
+    outcomes = {}
+    with transaction.atomic():
+        rows = reservations.select_related('location').select_for_update(of=('self',)).order_by('id')
+        rows = list(rows[:limit] if limit else rows)
+        eligible = []
+        for reservation in rows:
+            skipped = _skip_reason(reservation, condition)
+            outcomes[reservation.id] = skipped or 'updated'
+            if skipped is None:
+                eligible.append(reservation)
+        if not eligible:
+            return outcomes
+
+        Reservation.objects.filter(id__in=[r.id for r in eligible], **condition).update(**changes)
+        changed = []
+        for reservation in eligible:
+            changed.append((reservation, rollups.contribution(reservation)))
+            for field, value in changes.items():
+                setattr(reservation, field, value)
+        rollups.record_changes(changed)
+
+        if action == 'cancel':
+            occupancy.release_many(eligible)
+            # Committed with the cancellations; a worker sends the notices
+            task_queue.enqueue(
+                'send_cancellation_notices', {'reservation_ids': [r.id for r in eligible], 'reason': reason}
+            )
+
+            def discard():
+                for reservation in eligible:
+                    availability.discard_reservation(reservation)
+            transaction.on_commit(discard)
+    return outcomes
+
+
+def apply_to_ids(action, ids):
+    # Outcomes in the order the ids were given, including ids that do not exist
+    outcomes = _apply(action, Reservation.objects.filter(id__in=ids))
+    return [{'id': pk, 'outcome': outcomes.get(pk, 'not_found')} for pk in dict.fromkeys(ids)]
+
+
+def apply_to_one(action, reservation_id):
+    # Outcome for one reservation, as the single-reservation admin endpoints need it
+    return apply_to_ids(action, [reservation_id])[0]['outcome']
+
+
+def apply_to_queryset(action, reservations):
+    # Act on up to MAX_BATCH matching reservations still eligible for the
+    # action. Returns (outcomes, whether more are left for another request).
+    condition, _ = TRANSITIONS[action]
+    pending = reservations.filter(**condition)
+    outcomes = _apply(action, pending, limit=MAX_BATCH)
+    return [{'id': pk, 'outcome': outcome} for pk, outcome in outcomes.items()], pending.exists()
+
+
+def cancel_no_shows(ids):
+    # Cancel the reservations among `ids` nobody arrived for, freeing their
+    # capacity. Returns how many were cancelled.
+    outcomes = _apply('cancel', Reservation.objects.filter(id__in=ids, has_arrived=False), reason=NO_SHOW)
+    return sum(1 for outcome in outcomes.values() if outcome == 'updated')
+
+
+def check_out_overstays(ids):
+    # Close arrivals that were never checked out so they stop counting as parked
+    outcomes = _apply('check_out', Reservation.objects.filter(id__in=ids, has_arrived=True, is_cancelled=False))
+    return sum(1 for outcome in outcomes.values() if outcome == 'updated')
@@ -0,0 +1,167 @@
+import threading
+from datetime import date as date_type
+from time import monotonic
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from ..models import ArchivedReservation, DailyReservationRollup, Reservation
+
+COUNTERS = ('created', 'cancelled', 'approved', 'paid', 'arrived', 'exited')
+
+# Filtered counts matching `contribution`, for rebuilding from raw reservations
+ROLLUP_AGGREGATES = {
+    'created': Count('id'),
+    'cancelled': Count('id', filter=Q(is_cancelled=True)),
+    'approved': Count('id', filter=Q(is_cancelled=False, is_approved=True)),
+    'paid': Count('id', filter=Q(is_cancelled=False, is_approved=True, is_paid=True)),
+    'arrived': Count('id', filter=Q(has_arrived=True)),
+    'exited': Count('id', filter=Q(has_arrived=True, has_exited=True)),
+}
+
+
+def contribution(reservation):
+    # What a reservation in its current state adds to its day's counters
+    active = not reservation.is_cancelled
+    return {
+        'created': 1,
+        'cancelled': int(reservation.is_cancelled),
+        'approved': int(active and reservation.is_approved),
+        'paid': int(active and reservation.is_approved and reservation.is_paid),
+        'arrived': int(reservation.has_arrived),
+        'exited': int(reservation.has_arrived and reservation.has_exited),
+    }
+
+
+def apply_delta(day, location_id, delta):
+    delta = {name: value for name, value in delta.items() if value}
+    if not delta:
+        return
+    DailyReservationRollup.objects.bulk_create(
+        [DailyReservationRollup(date=day, location_id=location_id)], ignore_conflicts=True
+    )
+    DailyReservationRollup.objects.filter(date=day, location_id=location_id).update(
+        **{name: F(name) + value for name, value in delta.items()}
+    )
+    transaction.on_commit(lambda: past_days.evict(day))
+
+
+def record_created(reservation):
+    apply_delta(reservation.date, reservation.location_id, contribution(reservation))
+
+
+def record_change(reservation, before):
+    # Apply the difference between an earlier contribution and the current state
+    after = contribution(reservation)
+    apply_delta(
+        reservation.date,
+        reservation.location_id,
+        {name: after[name] - before[name] for name in COUNTERS}
+    )
+
+
+def record_changes(changes):
+    # Sum the (reservation, earlier contribution) differences per day and
+    # location, then apply each total once
+    totals = {}
+    for reservation, before in changes:
+        after = contribution(reservation)
+        delta = totals.setdefault((reservation.date, reservation.location_id), dict.fromkeys(COUNTERS, 0))
+        for name in COUNTERS:
+            delta[name] += after[name] - before[name]
+    for (day, location_id), delta in totals.items():
+        apply_delta(day, location_id, delta)
+
+
+def record_many(reservations, **delta):
+    # Apply `delta` once per reservation in the queryset, as one update per
+    # (date, location) instead of one per reservation
+    rows = reservations.order_by().values('date', 'location_id').annotate(count=Count('id'))
+    for row in rows:
+        apply_delta(row['date'], row['location_id'], {name: value * row['count'] for name, value in delta.items()})
+
+
+def rebuild():
+    # Recompute every rollup row from raw reservations, live and archived
+    with transaction.atomic():
+        totals = {}
+        for model in (Reservation, ArchivedReservation):
+            rows = model.objects.order_by().values('date', 'location_id').annotate(**ROLLUP_AGGREGATES)
+            for row in rows:
+                counters = totals.setdefault((row['date'], row['location_id']), dict.fromkeys(COUNTERS, 0))
+                for name in COUNTERS:
+                    counters[name] += row[name]
+        rollups = [
+            DailyReservationRollup(date=day, location_id=location_id, **counters)
+            for (day, location_id), counters in totals.items()
+        ]
+        DailyReservationRollup.objects.all().delete()
+        DailyReservationRollup.objects.bulk_create(rollups, batch_size=1000)
+    past_days.clear()
+    return len(rollups)
+
+
+# Totals for days before today rarely change, so they are kept per process.
+# A change applied here drops the day at once; changes made by other processes
+# (the payment worker, the sweeper, task and archive commands) show up once the
+# entry expires after `ttl` seconds.
+class PastDayCache:
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._totals = {}   # (date, location_id) -> (stored_at, counters)
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = monotonic()
+        with self._lock:
+            return {
+                key: entry[1] for key in keys
+                if (entry := self._totals.get(key)) is not None and now - entry[0] < self.ttl
+            }
+
+    def set_many(self, values):
+        now = monotonic()
+        with self._lock:
+            # Drop expired entries so days that are no longer read do not pile up
+            for key in [key for key, entry in self._totals.items() if now - entry[0] >= self.ttl]:
+                del self._totals[key]
+            self._totals.update((key, (now, counters)) for key, counters in values.items())
+
+    def evict(self, day):
+        with self._lock:
+            for key in [key for key in self._totals if key[0] == day]:
+                del self._totals[key]
+
+    def clear(self):
+        with self._lock:
+            self._totals.clear()
+
+
+past_days = PastDayCache(getattr(settings, 'ROLLUP_PAST_DAY_TTL', 60))
+
+
+def daily_totals(start_date, end_date, location_id=None):
+    # Counters per day in [start_date, end_date], summed over locations unless one is given
+    today = date_type.today()
+    days = [date_type.fromordinal(n) for n in range(start_date.toordinal(), end_date.toordinal() + 1)]
+    keys = [(day, location_id) for day in days]
+    totals = past_days.get_many(keys)
+
+    missing = [day for day in days if (day, location_id) not in totals]
+    if missing:
+        rollups = DailyReservationRollup.objects.filter(date__range=(min(missing), max(missing)))
+        if location_id is not None:
+            rollups = rollups.filter(location_id=location_id)
+        rows = {
+            row['date']: row
+            for row in rollups.order_by().values('date').annotate(
+                **{name: Sum(name) for name in COUNTERS}
+            )
+        }
+        fetched = {
+            (day, location_id): {name: rows.get(day, {}).get(name) or 0 for name in COUNTERS}
+            for day in missing
+        }
+        past_days.set_many({key: value for key, value in fetched.items() if key[0] < today})
+        totals.update(fetched)
+
+    return [{'date': str(day), **totals[(day, location_id)]} for day in days]
@@ -0,0 +1,41 @@
+import threading
+from time import monotonic
+
+
+# Process-local cached value that is recomputed at most once per TTL.
+# Concurrent callers wait for the single in-flight computation instead of
+# each running it themselves.
+class TTLSnapshot:
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._values = {}   # key -> (computed_at, value)
+        self._lock = threading.Lock()
+
+    def _fresh(self, key):
+        entry = self._values.get(key)
+        if entry is not None and monotonic() - entry[0] < self.ttl:
+            return entry
+        return None
+
+    def get(self, compute, key=None):
+        entry = self._fresh(key)
+        if entry is None:
+            with self._lock:
+                # Another caller may have refreshed it while we waited
+                entry = self._fresh(key)
+                if entry is None:
+                    entry = (monotonic(), compute())
+                    # Keys such as the current date are not read again once
+                    # they expire, so drop them instead of keeping one per key
+                    for stale in [k for k in self._values if k != key and entry[0] - self._values[k][0] >= self.ttl]:
+                        del self._values[stale]
+                    self._values[key] = entry
+        return entry[1]
+
+    def invalidate(self, key=None):
+        with self._lock:
+            self._values.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.utils import timezone
+from ..models import Location, Reservation
+from ..pagination import keyset_page
+from . import reservation_actions
+
+# Sort key of the open-schedule index the sweep walks
+SWEEP_ORDER = ['date', 'time', 'id']
+
+
+def grace_periods():
+    # (default grace, {location id: grace}) in minutes
+    overrides = dict(
+        Location.objects.filter(no_show_grace_minutes__isnull=False).values_list('id', 'no_show_grace_minutes')
+    )
+    return settings.NO_SHOW_GRACE_MINUTES, overrides
+
+
+def ends_at(reservation):
+    # Reservation end as a naive local datetime, like its date and time fields
+    return datetime.combine(reservation.date, reservation.time) + timedelta(hours=reservation.duration_hours)
+
+
+def sweep(now=None, batch_size=None, dry_run=False):
+    # Cancel reservations nobody arrived for and check out arrivals that were
+    # never checked out, once their location's grace period after the end has
+    # passed. Open reservations are read in schedule order through a partial
+    # index, a batch at a time, and each batch is applied with one UPDATE per
+    # outcome. Returns a report of the counts.
+    now = timezone.localtime(now).replace(tzinfo=None)
+    batch_size = batch_size or settings.SWEEP_BATCH_SIZE
+    default, overrides = grace_periods()
+    # No reservation starting after this day can be due yet
+    latest_due = now - timedelta(minutes=min([default, *overrides.values()]))
+    candidates = Reservation.objects.filter(
+        is_cancelled=False, has_exited=False, date__lte=latest_due.date()
+    ).only('id', 'date', 'time', 'duration_hours', 'location_id', 'has_arrived')
+
+    report = {'checked': 0, 'no_shows': 0, 'checked_out': 0, 'batches': 0}
+    cursor = None
+    while True:
+        batch, cursor = keyset_page(candidates, SWEEP_ORDER, cursor, batch_size, descending=False)
+        due = [
+            r for r in batch
+            if ends_at(r) + timedelta(minutes=overrides.get(r.location_id, default)) <= now
+        ]
+        no_shows = [r.id for r in due if not r.has_arrived]
+        overstays = [r.id for r in due if r.has_arrived]
+        report['checked'] += len(batch)
+        report['batches'] += 1
+        if dry_run:
+            report['no_shows'] += len(no_shows)
+            report['checked_out'] += len(overstays)
+        else:
+            if no_shows:
+                report['no_shows'] += reservation_actions.cancel_no_shows(no_shows)
+            if overstays:
+                report['checked_out'] += reservation_actions.check_out_overstays(overstays)
+        if cursor is None:
+            return report
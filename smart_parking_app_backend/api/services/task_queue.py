@@ -0,0 +1,221 @@
+import os
+import random
+import socket
+import threading
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+from time import monotonic
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+from ..models import Task
+
+# Finished tasks looked at for latency figures
+LATENCY_WINDOW = 300
+LATENCY_SAMPLE = 1000
+PRUNE_INTERVAL = 60
+
+
+class UnknownTask(Exception):
+    pass
+
+
+class Handler:
+    __slots__ = ('func', 'max_attempts', 'on_dead')
+
+    def __init__(self, func, max_attempts, on_dead):
+        self.func = func
+        self.max_attempts = max_attempts
+        self.on_dead = on_dead
+
+
+_handlers = {}   # task name -> Handler
+
+
+def register(name, max_attempts=None, on_dead=None):
+    # Register a task function, called with the task payload as keyword arguments.
+    # `on_dead(payload, error)` runs once when the task is dead-lettered.
+    def decorator(func):
+        _handlers[name] = Handler(func, max_attempts, on_dead)
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, delay=0):
+    # Insert the task in the caller's transaction: it becomes visible to workers
+    # only if the work that queued it commits
+    handler = _handlers.get(name)
+    if handler is None:
+        raise UnknownTask(f"No task registered as {name!r}")
+    return Task.objects.create(
+        name=name,
+        payload=payload or {},
+        max_attempts=handler.max_attempts or settings.TASK_MAX_ATTEMPTS,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def claim(worker_id, limit):
+    # Lease up to `limit` due tasks to this worker. Rows locked by another
+    # worker are skipped (FOR UPDATE SKIP LOCKED). SQLite has no row locks, but
+    # the IMMEDIATE transaction holds the database write lock from the SELECT
+    # to the UPDATE, so concurrent claims are serialised and never overlap.
+    now = timezone.now()
+    due = Task.objects.filter(
+        Q(status=Task.QUEUED, run_at__lte=now) | Q(status=Task.RUNNING, locked_until__lt=now)
+    ).order_by('run_at', 'id')
+    token = f'{worker_id}:{uuid.uuid4().hex[:8]}'
+    with transaction.atomic():
+        ids = list(due.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit])
+        if not ids:
+            return []
+        Task.objects.filter(id__in=ids).update(
+            status=Task.RUNNING,
+            locked_by=token,
+            locked_until=now + timedelta(seconds=settings.TASK_LEASE_SECONDS),
+            attempts=F('attempts') + 1,
+            started_at=now,
+        )
+    return list(Task.objects.filter(id__in=ids, locked_by=token).order_by('run_at', 'id'))
+
+
+def backoff(attempts, retry_after=None):
+    # Exponential backoff with jitter, never shorter than a delay the error asked for
+    delay = min(settings.TASK_RETRY_MAX_BACKOFF, settings.TASK_RETRY_BACKOFF * 2 ** (attempts - 1))
+    delay = random.uniform(delay / 2, delay)
+    return max(delay, retry_after or 0)
+
+
+def run(task):
+    # Run a claimed task and record the outcome. Updates are conditional on the
+    # lease token so a worker whose lease expired cannot overwrite a newer run.
+    # Returns True on success.
+    handler = _handlers.get(task.name)
+    try:
+        if handler is None:
+            raise UnknownTask(f"No task registered as {task.name!r}")
+        handler.func(**task.payload)
+    except Exception as e:
+        _record_failure(task, handler, e)
+        return False
+    Task.objects.filter(pk=task.pk, locked_by=task.locked_by).update(
+        status=Task.DONE, finished_at=timezone.now(), locked_until=None, last_error=''
+    )
+    return True
+
+
+def _record_failure(task, handler, error):
+    now = timezone.now()
+    message = f'{type(error).__name__}: {error}'
+    mine = Task.objects.filter(pk=task.pk, locked_by=task.locked_by)
+    if task.attempts < task.max_attempts:
+        mine.update(
+            status=Task.QUEUED, locked_by='', locked_until=None, last_error=message,
+            run_at=now + timedelta(seconds=backoff(task.attempts, getattr(error, 'retry_after', None))),
+        )
+        return
+    # Out of attempts: park it for inspection (see `run_tasks --requeue-dead`)
+    if mine.update(status=Task.DEAD, locked_until=None, finished_at=now, last_error=message) and handler and handler.on_dead:
+        try:
+            handler.on_dead(task.payload, message)
+        except Exception as e:
+            # A failing hook must not take the worker down; keep both errors
+            Task.objects.filter(pk=task.pk).update(last_error=f'{message}\non_dead failed: {type(e).__name__}: {e}')
+
+
+def run_pending(worker_id='inline', limit=None):
+    # Run due tasks one by one in this thread until none are left. Used by
+    # `run_tasks --once` and tests. Returns the number of tasks run.
+    count = 0
+    while limit is None or count < limit:
+        tasks = claim(worker_id, 1)
+        if not tasks:
+            break
+        run(tasks[0])
+        count += 1
+    return count
+
+
+def requeue_dead(ids=None):
+    dead = Task.objects.filter(status=Task.DEAD)
+    if ids:
+        dead = dead.filter(id__in=ids)
+    return dead.update(status=Task.QUEUED, attempts=0, run_at=timezone.now(), finished_at=None, locked_by='')
+
+
+def prune(older_than=None):
+    # Finished tasks are only kept for latency figures and debugging
+    older_than = settings.TASK_RETENTION if older_than is None else older_than
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    return Task.objects.filter(status=Task.DONE, finished_at__lt=cutoff).delete()[0]
+
+
+def stats():
+    # Queue depth per task and status, age of the oldest due task, and wait and
+    # run times of tasks finished in the last LATENCY_WINDOW seconds
+    now = timezone.now()
+    depth = {
+        (row['name'], row['status']): row['count']
+        for row in Task.objects.filter(status__in=[Task.QUEUED, Task.RUNNING, Task.DEAD])
+        .order_by().values('name', 'status').annotate(count=Count('id'))
+    }
+    oldest = Task.objects.filter(status=Task.QUEUED, run_at__lte=now).aggregate(oldest=Min('run_at'))['oldest']
+    latency = {}
+    finished = Task.objects.filter(
+        status=Task.DONE, finished_at__gte=now - timedelta(seconds=LATENCY_WINDOW)
+    ).order_by('-finished_at').values_list('name', 'run_at', 'started_at', 'finished_at')[:LATENCY_SAMPLE]
+    for name, run_at, started_at, finished_at in finished:
+        entry = latency.setdefault(name, {'count': 0, 'wait_sum': 0.0, 'wait_max': 0.0, 'run_sum': 0.0})
+        waited = max(0.0, (started_at - run_at).total_seconds())
+        entry['count'] += 1
+        entry['wait_sum'] += waited
+        entry['wait_max'] = max(entry['wait_max'], waited)
+        entry['run_sum'] += (finished_at - started_at).total_seconds()
+    return {
+        'depth': depth,
+        'oldest_due_seconds': (now - oldest).total_seconds() if oldest else 0.0,
+        'latency': latency,
+    }
+
+
+def _run_in_thread(task):
+    # Each pool thread has its own connection; drop it if it went stale
+    close_old_connections()
+    try:
+        return run(task)
+    finally:
+        connection.close()
+
+
+class Worker:
+    # Claims tasks as pool threads free up and runs them concurrently.
+    # `stop()` lets running tasks finish, then `run()` returns.
+    def __init__(self, threads=None, poll_interval=1.0, worker_id=None):
+        self.threads = threads or settings.TASK_WORKER_THREADS
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+        self._stopping = threading.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    def run(self):
+        in_flight = set()
+        last_prune = 0.0
+        with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='task') as pool:
+            while not self._stopping.is_set():
+                in_flight = {future for future in in_flight if not future.done()}
+                free = self.threads - len(in_flight)
+                tasks = claim(self.worker_id, free) if free else []
+                in_flight.update(pool.submit(_run_in_thread, task) for task in tasks)
+                if monotonic() - last_prune > PRUNE_INTERVAL:
+                    prune()
+                    last_prune = monotonic()
+                if len(tasks) < free:
+                    # Queue drained: sleep until the next poll or a stop request
+                    self._stopping.wait(self.poll_interval)
+                elif not free:
+                    wait(in_flight, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+        connection.close()
@@ -0,0 +1,27 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from .middleware import timed_execute
+from .models import Location, SlotPricing, SlotType, VehicleType
+from .services import reference_data
+
+# Bulk writes do not send these signals; code using bulk_create/bulk_update
+# on these models calls reference_data.bump_version() itself.
+CATALOG_MODELS = (Location, SlotPricing, SlotType, VehicleType)
+
+
+def catalog_changed(sender, **kwargs):
+    reference_data.bump_version()
+
+
+for model in CATALOG_MODELS:
+    post_save.connect(catalog_changed, sender=model, dispatch_uid=f'catalog_saved_{model.__name__}')
+    post_delete.connect(catalog_changed, sender=model, dispatch_uid=f'catalog_deleted_{model.__name__}')
+
+
+def track_queries(sender, connection, **kwargs):
+    # Let the metrics middleware count queries on every connection, in any thread
+    if timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(timed_execute)
+
+
+connection_created.connect(track_queries, dispatch_uid='track_queries')
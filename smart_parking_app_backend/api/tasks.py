@@ -0,0 +1,13 @@
+# Background tasks run by `manage.py run_tasks`, queued with task_queue.enqueue
+from .services import payments, reservation_actions, task_queue
+
+
+@task_queue.register('send_cancellation_notices')
+def send_cancellation_notices(reservation_ids, reason=None):
+    reservation_actions.send_cancellation_notices(reservation_ids, reason)
+
+
+# Few attempts: the user is waiting on the checkout page
+@task_queue.register('open_checkout', max_attempts=3, on_dead=payments.fail_checkout)
+def open_checkout(checkout_id, attributes):
+    payments.open_checkout(checkout_id, attributes)
@@ -0,0 +1 @@
+# Helpers for exercising the API locally and in tests, e.g. stand-ins for external services.
@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from ..services.paymongo import webhook_signature
+
+
+class StubPayMongoServer:
+    # Local HTTP server speaking just enough of the PayMongo API for tests.
+    # Queue scripted replies with `respond`; unscripted requests create or
+    # retrieve checkout sessions, which `pay` and `expire` move along.
+    # Usable as a context manager.
+    def __init__(self, host='127.0.0.1', port=0):
+        self.requests = []          # (method, path, headers, body) as received
+        self._replies = deque()     # (status, body, delay seconds)
+        self._lock = threading.Lock()
+        self.sessions = {}          # session id -> checkout session resource
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def respond(self, status=200, body=None, delay=0, times=1):
+        with self._lock:
+            for _ in range(times):
+                self._replies.append((status, body, delay))
+
+    def pay(self, session_id):
+        with self._lock:
+            self.sessions[session_id]['attributes']['payments'] = [
+                {'id': f'pay_{session_id}', 'type': 'payment', 'attributes': {'status': 'paid'}}
+            ]
+
+    def expire(self, session_id):
+        with self._lock:
+            self.sessions[session_id]['attributes']['status'] = 'expired'
+
+    def _next_reply(self, method, path, payload):
+        with self._lock:
+            if self._replies:
+                return self._replies.popleft()
+            if method == 'GET':
+                session = self.sessions.get(path.rstrip('/').rsplit('/', 1)[-1])
+                if session is None:
+                    return 404, {'errors': [{'code': 'resource_not_found'}]}, 0
+                return 200, {'data': json.loads(json.dumps(session))}, 0
+            session_id = f'cs_stub_{len(self.sessions) + 1}'
+            attributes = (payload or {}).get('data', {}).get('attributes', {})
+            self.sessions[session_id] = {
+                'id': session_id,
+                'type': 'checkout_session',
+                'attributes': {
+                    **attributes,
+                    'checkout_url': f'https://checkout.example.test/{session_id}',
+                    'status': 'active',
+                    'payments': [],
+                },
+            }
+            return 200, {'data': json.loads(json.dumps(self.sessions[session_id]))}, 0
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _handle(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                payload = json.loads(raw) if raw else None
+                with stub._lock:
+                    stub.requests.append((self.command, self.path, dict(self.headers), payload))
+                status, body, delay = stub._next_reply(self.command, self.path, payload)
+                if delay:
+                    time.sleep(delay)
+                data = json.dumps(body or {}).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up (timeout) before the reply was sent
+                    pass
+
+            do_GET = do_POST = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def paid_event(session_id, event_id=None, livemode=False):
+    # Webhook body PayMongo sends when a checkout session is paid
+    return {
+        'data': {
+            'id': event_id or f'evt_{session_id}',
+            'type': 'event',
+            'attributes': {
+                'type': 'checkout_session.payment.paid',
+                'livemode': livemode,
+                'data': {'id': session_id, 'type': 'checkout_session', 'attributes': {'status': 'active'}},
+            },
+        }
+    }
+
+
+def signed_webhook(event, secret, timestamp=None):
+    # Raw body and Paymongo-Signature header for posting `event` to the webhook
+    body = json.dumps(event).encode()
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    signature = webhook_signature(body, secret, timestamp)
+    mode = 'li' if event['data']['attributes'].get('livemode') else 'te'
+    return body, f't={timestamp},{mode}={signature}'
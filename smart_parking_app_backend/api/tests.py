@@ -1,7 +1,31 @@
-from django.test import TestCase
+import asyncio
+import json
+import requests
+from io import StringIO
+from time import sleep
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Sum
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import AsyncClient, Client, TestCase, TransactionTestCase, override_settings
+from unittest.mock import patch
+from django.db import OperationalError, connection
+from django.test.utils import CaptureQueriesContext
+from concurrent.futures import ThreadPoolExecutor
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework.test import APITestCase
 from django.contrib.auth.models import User
-from .models import Reservation, Location, SlotType, VehicleType
+from datetime import date, datetime, timedelta, time as dt_time, timezone as dt_timezone
+from .models import Reservation, Location, SlotType, VehicleType, SlotPricing, SlotOccupancy, DailyReservationRollup, Notification, NotificationCounter, IdempotencyRecord, CheckoutSession, PaymentEvent, Task, ArchivedReservation, ArchivedNotification
+from .services import archive, availability, catalog, metrics, notifications, occupancy, payments, paymongo, reference_data, reservation_actions, rollups, sweeper, task_queue
+from .services.snapshot import TTLSnapshot
+from .testing.paymongo_stub import StubPayMongoServer, paid_event, signed_webhook
+from .urls import read_view, urlconf_with_reads
+from .views.dashboard_views import summary_snapshot
+from .views.user_views import aview_profile, view_profile
 
 class ApproveReservationTest(APITestCase):
     def setUp(self):
@@ -87,4 +111,1808 @@ class ApproveReservationTest(APITestCase):
         self.assertEqual(self.reservation.vehicle_make, 'Toyota')
         self.assertEqual(self.reservation.vehicle_model, 'Corolla')
         self.assertEqual(self.reservation.color, 'Blue')
-        self.assertEqual(self.reservation.mode_of_payment, 'cash')
\ No newline at end of file
+        self.assertEqual(self.reservation.mode_of_payment, 'cash')
+
+class SlotAvailabilityIndexTest(APITestCase):
+    def setUp(self):
+        availability.clear_indexes()
+        self.user = User.objects.create_user(username='driver', password='driverpass')
+        self.location = Location.objects.create(name='Index Lot', address='1 Index St')
+        self.standard = SlotType.objects.create(name='standard')
+        self.premium = SlotType.objects.create(name='premium')
+        self.vehicle_type = VehicleType.objects.create(name='Car')
+        SlotPricing.objects.create(
+            location_id=self.location, slot_type_id=self.standard,
+            vehicle_type_id=self.vehicle_type, rate_per_hour='50.00', available_slots=3
+        )
+        SlotPricing.objects.create(
+            location_id=self.location, slot_type_id=self.premium,
+            vehicle_type_id=self.vehicle_type, rate_per_hour='90.00', available_slots=1
+        )
+
+    def tearDown(self):
+        availability.clear_indexes()
+
+    def reserve(self, slot_type, time, duration_hours=1, on=date(2025, 6, 25), **extra):
+        return Reservation.objects.create(
+            user=self.user, location=self.location, slot_type=slot_type,
+            vehicle_type=self.vehicle_type, date=on, time=time,
+            duration_hours=duration_hours, plate_number='XYZ789', vehicle_make='Honda',
+            vehicle_model='Civic', color='Red', mode_of_payment='Cash', **extra
+        )
+
+    def search(self, time='12:00', duration_hours=1, on='2025-06-25'):
+        response = self.client.post('/api/slots/check-availability/', {
+            'location_id': self.location.id,
+            'vehicle_type_id': self.vehicle_type.id,
+            'date': on,
+            'time': time,
+            'duration_hours': duration_hours,
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        return {row['slot_type']: row['available_slots'] for row in response.data['results']}
+
+    def test_counts_only_overlapping_active_reservations(self):
+        self.reserve(self.standard, dt_time(11, 0), duration_hours=2)   # overlaps
+        self.reserve(self.standard, dt_time(10, 0), duration_hours=2)   # ends at 12:00
+        self.reserve(self.standard, dt_time(13, 0))                     # starts at 13:00
+        self.reserve(self.standard, dt_time(12, 30), is_cancelled=True)
+        self.reserve(self.premium, dt_time(12, 59))                     # overlaps
+        self.assertEqual(self.search(), {'standard': 2, 'premium': 0})
+
+    def test_peak_occupancy_across_long_window(self):
+        # Back-to-back reservations never overlap, so the peak is one, not two
+        self.reserve(self.standard, dt_time(12, 0), duration_hours=2)
+        self.reserve(self.standard, dt_time(14, 0), duration_hours=2)
+        self.reserve(self.standard, dt_time(15, 0))
+        self.assertEqual(self.search(duration_hours=2)['standard'], 2)
+        self.assertEqual(self.search(duration_hours=6)['standard'], 1)
+
+    def test_reservations_spanning_midnight(self):
+        # Previous day's reservation spills into the morning of the search date
+        self.reserve(self.premium, dt_time(22, 0), duration_hours=4, on=date(2025, 6, 24))
+        self.assertEqual(self.search(time='01:00')['premium'], 0)
+        self.assertEqual(self.search(time='02:00')['premium'], 1)
+        # A late search window reaches into the next day's early reservations
+        self.reserve(self.standard, dt_time(2, 0), on=date(2025, 6, 26))
+        self.assertEqual(self.search(time='22:00', duration_hours=5)['standard'], 2)
+        self.assertEqual(self.search(time='22:00', duration_hours=5, on='2025-06-24')['premium'], 0)
+
+    def test_index_is_kept_current_on_create_and_cancel(self):
+        self.assertEqual(self.search(), {'standard': 3, 'premium': 1})
+
+        self.client.force_authenticate(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/reservations/create/', {
+                'location': self.location.id, 'slot_type': self.premium.id,
+                'vehicle_type': self.vehicle_type.id, 'date': '2025-06-25', 'time': '12:30',
+                'duration_hours': 1, 'plate_number': 'NEW123', 'vehicle_make': 'Ford',
+                'vehicle_model': 'Focus', 'color': 'White', 'mode_of_payment': 'Cash',
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.search(), {'standard': 3, 'premium': 0})
+
+        reservation = Reservation.objects.get(plate_number='NEW123')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/reservations/{reservation.id}/cancel/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.search(), {'standard': 3, 'premium': 1})
+
+    def test_availability_grid(self):
+        self.reserve(self.standard, dt_time(22, 30), duration_hours=3, on=date(2025, 6, 24))
+        self.reserve(self.standard, dt_time(9, 0), duration_hours=2)
+        self.reserve(self.premium, dt_time(10, 15))
+        self.reserve(self.premium, dt_time(11, 0), is_cancelled=True)
+
+        response = self.client.get('/api/slots/availability-grid/', {
+            'location_id': self.location.id,
+            'vehicle_type_id': self.vehicle_type.id,
+            'start_date': '2025-06-25',
+            'days': 2,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([s['name'] for s in response.data['slot_types']], ['standard', 'premium'])
+        grid = response.data['grid']
+        self.assertEqual((len(grid), len(grid[0]), len(grid[0][0])), (2, 24, 2))
+        self.assertEqual(grid[0][0], [2, 1])    # spillover from the previous evening
+        self.assertEqual(grid[0][1], [2, 1])
+        self.assertEqual(grid[0][2], [3, 1])
+        self.assertEqual(grid[0][9], [2, 1])
+        self.assertEqual(grid[0][10], [2, 0])
+        self.assertEqual(grid[0][11], [3, 0])   # partial hour still counts
+        self.assertEqual(grid[0][12], [3, 1])
+        self.assertEqual(grid[1][10], [3, 1])
+
+
+
+class ReservationCapacityTest(TransactionTestCase):
+    def setUp(self):
+        availability.clear_indexes()
+        self.users = [User.objects.create_user(username=f'driver{i}', password='x') for i in range(4)]
+        self.location = Location.objects.create(name='Busy Lot', address='9 Busy Rd')
+        self.slot_type = SlotType.objects.create(name='standard')
+        self.vehicle_type = VehicleType.objects.create(name='Car')
+        SlotPricing.objects.create(
+            location_id=self.location, slot_type_id=self.slot_type,
+            vehicle_type_id=self.vehicle_type, rate_per_hour='40.00', available_slots=5
+        )
+
+    def tearDown(self):
+        availability.clear_indexes()
+
+    def book(self, user, time='10:00', duration_hours=2, plate='CAP001'):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        try:
+            return client.post('/api/reservations/create/', {
+                'location': self.location.id, 'slot_type': self.slot_type.id,
+                'vehicle_type': self.vehicle_type.id, 'date': '2025-07-01', 'time': time,
+                'duration_hours': duration_hours, 'plate_number': plate, 'vehicle_make': 'Kia',
+                'vehicle_model': 'Rio', 'color': 'Black', 'mode_of_payment': 'Cash',
+            }, format='json').status_code
+        finally:
+            connection.close()
+
+    def test_full_hour_is_rejected_and_cancel_frees_it(self):
+        for i in range(5):
+            self.assertEqual(self.book(self.users[0], plate=f'CAP{i}'), 201)
+        # Overlaps only the second hour, which is already full
+        self.assertEqual(self.book(self.users[1], time='11:00', duration_hours=1), 409)
+        self.assertEqual(self.book(self.users[1], time='12:00', duration_hours=1), 201)
+        self.assertEqual(Reservation.objects.count(), 6)
+
+        client = APIClient()
+        client.force_authenticate(user=self.users[0])
+        reservation = Reservation.objects.filter(user=self.users[0]).first()
+        self.assertEqual(client.post(f'/api/reservations/{reservation.id}/cancel/').status_code, 200)
+        self.assertEqual(client.post(f'/api/reservations/{reservation.id}/cancel/').status_code, 400)
+        self.assertEqual(self.book(self.users[1], time='11:00', duration_hours=1), 201)
+
+    def test_concurrent_bookings_never_overbook(self):
+        attempts = 40
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            codes = list(pool.map(
+                lambda i: self.book(self.users[i % len(self.users)], plate=f'RACE{i}'),
+                range(attempts)
+            ))
+
+        self.assertEqual(codes.count(201), 5)
+        self.assertEqual(codes.count(409), attempts - 5)
+        self.assertEqual(Reservation.objects.count(), 5)
+        self.assertEqual(list(SlotOccupancy.objects.values_list('reserved', flat=True)), [5, 5])
+
+    def test_rebuild_matches_incremental_counters(self):
+        self.assertEqual(self.book(self.users[0], time='23:00', duration_hours=3), 201)
+        incremental = sorted(SlotOccupancy.objects.values_list('date', 'hour', 'reserved'))
+        occupancy.rebuild()
+        self.assertEqual(sorted(SlotOccupancy.objects.values_list('date', 'hour', 'reserved')), incremental)
+        self.assertEqual(len(incremental), 3)
+
+
+class DashboardSummaryTest(APITestCase):
+    def setUp(self):
+        summary_snapshot.clear()
+        self.admin_user = User.objects.create_user(username='admin', password='adminpass', is_staff=True)
+        self.client.force_authenticate(user=self.admin_user)
+        location = Location.objects.create(name='Dash Lot', address='5 Dash St')
+        slot_type = SlotType.objects.create(name='standard')
+        vehicle_type = VehicleType.objects.create(name='Car')
+        today = date.today()
+        for flags, payment in [
+            ({}, 'Cash'),
+            ({'is_approved': True}, 'GCash'),
+            ({'is_approved': True, 'is_paid': True, 'has_arrived': True}, 'GCash'),
+            ({'is_cancelled': True}, 'Card'),
+        ]:
+            Reservation.objects.create(
+                user=self.admin_user, location=location, slot_type=slot_type, vehicle_type=vehicle_type,
+                date=today, time='09:00', plate_number='DASH1', vehicle_make='Mazda',
+                vehicle_model='3', color='Red', mode_of_payment=payment, **flags
+            )
+        # Rows were inserted directly, so seed the rollups from scratch
+        rollups.rebuild()
+
+    def tearDown(self):
+        summary_snapshot.clear()
+        rollups.past_days.clear()
+
+    def test_summary_counts_with_bounded_queries(self):
+        # Rollup totals, the 7-day series, and payment methods of live and archived rows
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/admin/dashboard/summary/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_reservations_today'], 4)
+        self.assertEqual(response.data['total_cancellations_today'], 1)
+        self.assertEqual(response.data['pending_approvals'], 1)
+        self.assertEqual(response.data['currently_parked'], 1)
+        self.assertEqual(response.data['payment_distribution'], {'Cash': 1, 'GCash': 2, 'Card': 1})
+        self.assertEqual(response.data['approval_funnel'], {
+            'pending': 1, 'approved_unpaid': 1, 'approved_paid': 1, 'cancelled': 1,
+        })
+        self.assertEqual(response.data['daily_reservations'][-1]['count'], 4)
+
+        # Served from the snapshot while it is fresh
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/admin/dashboard/summary/').data, response.data)
+
+    def test_cancel_uses_the_current_row_for_rollups(self):
+        reservation = Reservation.objects.get(mode_of_payment='Cash')
+        # Approved and paid after the cancelling request loaded its copy
+        reservation_actions.apply_to_one('approve', reservation.id)
+        reservation_actions.apply_to_one('mark_paid', reservation.id)
+        self.assertTrue(occupancy.cancel(reservation))
+        self.assertFalse(occupancy.cancel(reservation))
+        self.assertTrue(reservation.is_approved)
+
+        incremental = DailyReservationRollup.objects.values(*rollups.COUNTERS).get()
+        rollups.rebuild()
+        self.assertEqual(DailyReservationRollup.objects.values(*rollups.COUNTERS).get(), incremental)
+
+    def test_snapshot_drops_expired_keys(self):
+        snapshot = TTLSnapshot(60)
+        snapshot.get(lambda: 1, key=date(2025, 7, 1))
+        self.assertEqual(snapshot.get(lambda: 2, key=date(2025, 7, 1)), 1)
+        snapshot.ttl = 0
+        for day in range(2, 6):
+            snapshot.get(lambda: day, key=date(2025, 7, day))
+        self.assertEqual(list(snapshot._values), [date(2025, 7, 5)])
+
+    def test_rollups_follow_state_changes(self):
+        reservation = Reservation.objects.get(mode_of_payment='Cash')
+        for url in ['approve/', 'mark-paid/']:
+            method = self.client.put if url == 'mark-paid/' else self.client.patch
+            self.assertEqual(method(f'/api/reservations/{reservation.id}/{url}').status_code, 200)
+        for url in ['check-in/', 'check-out/', 'cancel/']:
+            self.assertEqual(self.client.patch(f'/api/admin/reservations/{reservation.id}/{url}').status_code, 200)
+
+        incremental = list(DailyReservationRollup.objects.values(*rollups.COUNTERS))
+        rollups.rebuild()
+        self.assertEqual(list(DailyReservationRollup.objects.values(*rollups.COUNTERS)), incremental)
+        self.assertEqual(incremental[0], {
+            'created': 4, 'cancelled': 2, 'approved': 2, 'paid': 1, 'arrived': 2, 'exited': 1,
+        })
+
+    def test_repeated_status_changes_count_once(self):
+        reservation = Reservation.objects.get(mode_of_payment='Cash')
+        for _ in range(2):
+            self.assertEqual(self.client.patch(f'/api/reservations/{reservation.id}/approve/').status_code, 200)
+            self.assertEqual(self.client.put(f'/api/reservations/{reservation.id}/mark-paid/').status_code, 200)
+            response = self.client.patch(f'/api/admin/reservations/{reservation.id}/check-in/')
+            self.assertEqual(response.data['data'], {'has_arrived': True, 'has_exited': False})
+        rollup = DailyReservationRollup.objects.values(*rollups.COUNTERS).get()
+        rollups.rebuild()
+        self.assertEqual(DailyReservationRollup.objects.values(*rollups.COUNTERS).get(), rollup)
+
+        # Approving never revives a cancelled reservation
+        cancelled = Reservation.objects.get(is_cancelled=True)
+        self.assertEqual(self.client.patch(f'/api/reservations/{cancelled.id}/approve/').status_code, 400)
+        cancelled.refresh_from_db()
+        self.assertEqual((cancelled.is_cancelled, cancelled.is_approved), (True, False))
+        self.assertEqual(self.client.put('/api/reservations/999999/mark-paid/').status_code, 404)
+
+    def test_trends_reuse_cached_past_days(self):
+        today = date.today()
+        params = {'start_date': str(today - timedelta(days=3)), 'end_date': str(today)}
+        response = self.client.get('/api/admin/dashboard/trends/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([day['created'] for day in response.data['daily']], [0, 0, 0, 4])
+
+        # Only today is fetched again; the past days come from the cache
+        with self.assertNumQueries(1):
+            self.client.get('/api/admin/dashboard/trends/', params)
+
+        # A change written by another process is not evicted here, but shows
+        # up once the cached entries expire
+        yesterday = today - timedelta(days=1)
+        DailyReservationRollup.objects.create(date=yesterday, location=Location.objects.get(), created=2)
+        self.assertEqual(self.client.get('/api/admin/dashboard/trends/', params).data['daily'][2]['created'], 0)
+        with patch.object(rollups.past_days, 'ttl', 0):
+            self.assertEqual(self.client.get('/api/admin/dashboard/trends/', params).data['daily'][2]['created'], 2)
+        self.assertEqual(self.client.get('/api/admin/dashboard/trends/', {
+            'start_date': str(today), 'end_date': str(today - timedelta(days=1)),
+        }).status_code, 400)
+
+
+class AdminReservationListingTest(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_user(username='admin', password='adminpass', is_staff=True)
+        self.client.force_authenticate(user=self.admin_user)
+        self.locations = [
+            Location.objects.create(name=f'Lot {i}', address=f'{i} List St') for i in range(2)
+        ]
+        slot_type = SlotType.objects.create(name='covered')
+        vehicle_type = VehicleType.objects.create(name='Car')
+        Reservation.objects.bulk_create([
+            Reservation(
+                user=self.admin_user, location=self.locations[i % 2], slot_type=slot_type,
+                vehicle_type=vehicle_type, date=date(2025, 7, 1) + timedelta(days=i % 5), time='08:00',
+                plate_number=f'LST{i:03d}', vehicle_make='VW', vehicle_model='Golf', color='Blue',
+                mode_of_payment='GCash' if i % 3 else 'Cash', is_cancelled=i % 4 == 0,
+            )
+            for i in range(25)
+        ])
+
+    def test_cursor_pages_cover_every_row_once(self):
+        seen = []
+        cursor = None
+        while True:
+            params = {'page_size': 7}
+            if cursor:
+                params['cursor'] = cursor
+            # One query each for the live table and the archive
+            with self.assertNumQueries(2):
+                response = self.client.get('/api/admin/reservations/', params)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row['id'] for row in response.data['results'])
+            cursor = response.data['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+        self.assertEqual(self.client.get('/api/admin/reservations/', {'cursor': 'bogus'}).status_code, 400)
+
+    def test_filters_and_streaming_export(self):
+        params = {
+            'location_id': self.locations[0].id, 'status': 'cancelled',
+            'start_date': '2025-07-01', 'end_date': '2025-07-03',
+        }
+        expected = set(Reservation.objects.filter(
+            location=self.locations[0], is_cancelled=True, date__range=('2025-07-01', '2025-07-03')
+        ).values_list('id', flat=True))
+        response = self.client.get('/api/admin/reservations/', params)
+        self.assertEqual({row['id'] for row in response.data['results']}, expected)
+
+        response = self.client.get('/api/admin/reservations/', {'stream': 'true', 'mode_of_payment': 'Cash'})
+        rows = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(rows), Reservation.objects.filter(mode_of_payment='Cash').count())
+        self.assertEqual(rows[0]['location'], 'Lot 0 - 0 List St')
+
+
+class UserReservationListTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='frequent', password='parkerpass')
+        self.other = User.objects.create_user(username='other', password='otherpass')
+        self.client.force_authenticate(user=self.user)
+        location = Location.objects.create(name='Home Lot', address='3 Home Rd')
+        slot_type = SlotType.objects.create(name='standard')
+        vehicle_type = VehicleType.objects.create(name='Car')
+        today = date.today()
+        Reservation.objects.bulk_create([
+            Reservation(
+                user=self.other if i == 0 else self.user, location=location, slot_type=slot_type,
+                vehicle_type=vehicle_type, date=today + timedelta(days=i - 10 if i < 10 else i - 9), time='10:00',
+                plate_number=f'FRQ{i:02d}', vehicle_make='Subaru', vehicle_model='Outback',
+                color='Green', mode_of_payment='Cash',
+            )
+            for i in range(21)
+        ])
+
+    def test_query_count_is_constant(self):
+        # One query each for the live table and the archive
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/reservations/my/', {'page_size': 50})
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertIsNone(response.data['next_cursor'])
+        self.assertEqual(response.data['results'][0]['location']['name'], 'Home Lot')
+
+    def test_upcoming_and_past_split(self):
+        today = date.today()
+        response = self.client.get('/api/reservations/my/', {'when': 'upcoming', 'page_size': 3})
+        # Nothing is booked today, so the split does not depend on the clock
+        dates = [row['date'] for row in response.data['results']]
+        self.assertEqual(dates, [str(today + timedelta(days=i)) for i in range(1, 4)])
+
+        following = self.client.get('/api/reservations/my/', {
+            'when': 'upcoming', 'page_size': 3, 'cursor': response.data['next_cursor'],
+        })
+        self.assertEqual(following.data['results'][0]['date'], str(today + timedelta(days=4)))
+
+        past = self.client.get('/api/reservations/my/', {'when': 'past', 'page_size': 50}).data['results']
+        self.assertEqual(past[0]['date'], str(today - timedelta(days=1)))
+        self.assertEqual(len(past), 9)
+
+
+class NotificationStreamTest(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='listener', password='listenpass')
+        self.token = str(AccessToken.for_user(self.user))
+        location = Location.objects.create(name='Stream Lot', address='7 Stream Ave')
+        self.reservation = Reservation.objects.create(
+            user=self.user, location=location, slot_type=SlotType.objects.create(name='standard'),
+            vehicle_type=VehicleType.objects.create(name='Car'), date='2025-08-01', time='09:00',
+            plate_number='SSE001', vehicle_make='Tesla', vehicle_model='3', color='White',
+            mode_of_payment='Card'
+        )
+        self.seen = Notification.objects.create(user=self.user, reservation=self.reservation, message='seen')
+        self.missed = Notification.objects.create(user=self.user, reservation=self.reservation, message='missed')
+        # Rows were inserted directly, so bring the unread counter in line
+        cache.clear()
+        notifications.reconcile()
+
+    async def read_event(self, stream):
+        return (await asyncio.wait_for(anext(stream), 5)).decode()
+
+    async def test_resume_then_live_push(self):
+        client = AsyncClient()
+        response = await client.get('/api/notifications/stream/', {
+            'token': self.token, 'last_event_id': self.seen.id,
+        })
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+
+        # Only the notification after the last seen id is replayed
+        replayed = await self.read_event(stream)
+        self.assertIn(f'id: {self.missed.id}', replayed)
+        self.assertIn('"message": "missed"', replayed)
+        self.assertIn('"unread_count": 2', await self.read_event(stream))
+
+        # New notifications are pushed without polling
+        created = await sync_to_async(Notification.objects.create)(
+            user=self.user, reservation=self.reservation, message='live'
+        )
+        await sync_to_async(notifications.on_created)([created])
+        pushed = await self.read_event(stream)
+        self.assertIn(f'id: {created.id}', pushed)
+        self.assertIn('"unread_count": 3', await self.read_event(stream))
+        await stream.aclose()
+
+    @patch('api.views.notification_views.STREAM_POLL_INTERVAL', 0.05)
+    async def test_picks_up_notifications_written_by_other_processes(self):
+        response = await AsyncClient().get('/api/notifications/stream/', {'token': self.token})
+        stream = aiter(response.streaming_content)
+        self.assertIn('"unread_count": 2', await self.read_event(stream))
+
+        # As the task worker would: the row and counter change, but this
+        # process's broker never hears about it
+        def notify_elsewhere():
+            created = Notification.objects.create(user=self.user, reservation=self.reservation, message='worker')
+            notifications.reconcile()
+            return created
+        created = await sync_to_async(notify_elsewhere)()
+        polled = await self.read_event(stream)
+        self.assertIn(f'id: {created.id}', polled)
+        self.assertIn('"message": "worker"', polled)
+        self.assertIn('"unread_count": 3', await self.read_event(stream))
+        await stream.aclose()
+
+    def test_not_served_under_wsgi(self):
+        response = Client().get('/api/notifications/stream/', {'token': self.token})
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(response.streaming)
+
+    async def test_rejects_missing_or_bad_token(self):
+        client = AsyncClient()
+        self.assertEqual((await client.get('/api/notifications/stream/')).status_code, 401)
+        self.assertEqual((await client.get('/api/notifications/stream/', {'token': 'nope'})).status_code, 401)
+
+    async def test_rejects_deactivated_user_with_valid_token(self):
+        await User.objects.filter(pk=self.user.pk).aupdate(is_active=False)
+        response = await AsyncClient().get('/api/notifications/stream/', {'token': self.token})
+        self.assertEqual(response.status_code, 401)
+
+
+
+class UnreadCounterTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin_user = User.objects.create_user(username='admin', password='adminpass', is_staff=True)
+        self.user = User.objects.create_user(username='reader', password='readerpass')
+        location = Location.objects.create(name='Counter Lot', address='8 Count Ln')
+        slot_type = SlotType.objects.create(name='standard')
+        vehicle_type = VehicleType.objects.create(name='Car')
+        self.reservations = [
+            Reservation.objects.create(
+                user=self.user, location=location, slot_type=slot_type, vehicle_type=vehicle_type,
+                date='2025-09-01', time='08:00', plate_number=f'CNT{i}', vehicle_make='BMW',
+                vehicle_model='X1', color='Silver', mode_of_payment='GCash'
+            )
+            for i in range(3)
+        ]
+
+    def unread(self):
+        self.client.force_authenticate(user=self.user)
+        return self.client.get('/api/notifications/count/').data['unread_count']
+
+    def test_counter_follows_cancel_and_mark_read(self):
+        self.client.force_authenticate(user=self.admin_user)
+        for reservation in self.reservations[:2]:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.patch(f'/api/admin/reservations/{reservation.id}/cancel/')
+        # Notices are created by the task worker, not the request
+        self.assertEqual(self.unread(), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(task_queue.run_pending(), 2)
+        self.assertEqual(self.unread(), 2)
+
+        # The count is a single primary-key lookup on the counter row
+        with self.assertNumQueries(1):
+            self.assertEqual(self.unread(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch('/api/notifications/mark-all-read/')
+        self.assertEqual(self.unread(), 0)
+        self.assertEqual(NotificationCounter.objects.get(user=self.user).unread, 0)
+
+    def test_deleting_a_location_drops_its_unread_notifications(self):
+        other = Location.objects.create(name='Other Lot', address='9 Count Ln')
+        kept = Reservation.objects.create(
+            user=self.user, location=other, slot_type=self.reservations[0].slot_type,
+            vehicle_type=self.reservations[0].vehicle_type, date='2025-09-01', time='08:00',
+            plate_number='CNTX', vehicle_make='BMW', vehicle_model='X1', color='Silver', mode_of_payment='GCash'
+        )
+        created = Notification.objects.bulk_create([
+            Notification(user=self.user, reservation=reservation, message='notice', is_read=reservation is self.reservations[2])
+            for reservation in [*self.reservations, kept]
+        ])
+        notifications.on_created(created)
+        self.assertEqual(self.unread(), 3)
+
+        response = self.client.delete(f'/api/locations/delete/{self.reservations[0].location_id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.unread(), 1)
+        self.assertEqual(notifications.reconcile(), {})
+
+    def test_cancellation_notices_are_sent_once(self):
+        self.client.force_authenticate(user=self.admin_user)
+        reservation = self.reservations[0]
+        for _ in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(f'/api/admin/reservations/{reservation.id}/cancel/')
+            self.assertEqual(response.status_code, 200)
+        # The second cancel changed nothing, so it queued nothing
+        self.assertEqual(Task.objects.filter(name='send_cancellation_notices').count(), 1)
+
+        # Delivered again, as after an expired lease: no second notice
+        with self.captureOnCommitCallbacks(execute=True):
+            task_queue.run_pending()
+            reservation_actions.send_cancellation_notices([reservation.id])
+        self.assertEqual(Notification.objects.filter(reservation=reservation).count(), 1)
+        self.assertEqual(self.unread(), 1)
+
+    def test_reconcile_fixes_drift(self):
+        Notification.objects.create(user=self.user, reservation=self.reservations[0], message='direct')
+        NotificationCounter.objects.create(user=self.admin_user, unread=4)
+        self.assertEqual(self.unread(), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('reconcile_unread_counters', stdout=StringIO())
+        self.assertEqual(self.unread(), 1)
+        self.assertEqual(NotificationCounter.objects.get(user=self.admin_user).unread, 0)
+
+
+class NotificationFeedTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='feeder', password='feederpass')
+        other = User.objects.create_user(username='other', password='otherpass')
+        location = Location.objects.create(name='Feed Lot', address='9 Feed St')
+        slot_type = SlotType.objects.create(name='standard')
+        vehicle_type = VehicleType.objects.create(name='Car')
+        reservation = Reservation.objects.create(
+            user=self.user, location=location, slot_type=slot_type, vehicle_type=vehicle_type,
+            date='2025-09-01', time='08:00', plate_number='FED1', vehicle_make='Kia',
+            vehicle_model='Rio', color='Red', mode_of_payment='GCash'
+        )
+        self.notifications = Notification.objects.bulk_create([
+            Notification(user=self.user, reservation=reservation, message=f'note {i}', is_read=i < 3)
+            for i in range(7)
+        ])
+        Notification.objects.create(user=other, reservation=reservation, message='not mine')
+        notifications.reconcile()
+        self.client.force_authenticate(user=self.user)
+
+    def test_feed_pages_with_one_query_each(self):
+        seen = []
+        cursor = None
+        while True:
+            params = {'page_size': 3}
+            if cursor:
+                params['cursor'] = cursor
+            # One indexed query each for live and archived notifications
+            with self.assertNumQueries(2):
+                response = self.client.get('/api/notifications/', params)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(item['message'] for item in response.data['data'])
+            cursor = response.data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(len(seen), 7)
+        self.assertNotIn('not mine', seen)
+
+        response = self.client.get('/api/notifications/', {'status': 'read'})
+        self.assertEqual(len(response.data['data']), 3)
+        self.assertTrue(all(item['is_read'] for item in response.data['data']))
+        response = self.client.get('/api/notifications/', {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_mark_ids_and_range_read(self):
+        ids = [notification.id for notification in self.notifications]
+        # Already read ids are ignored in the count
+        response = self.client.patch('/api/notifications/mark-read/', {'ids': [ids[0], ids[5]]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(NotificationCounter.objects.get(user=self.user).unread, 3)
+
+        self.client.patch('/api/notifications/mark-read/', {'up_to_id': ids[4]}, format='json')
+        self.assertEqual(Notification.objects.filter(user=self.user, is_read=False).count(), 1)
+        self.assertEqual(NotificationCounter.objects.get(user=self.user).unread, 1)
+
+        response = self.client.patch('/api/notifications/mark-read/', {}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class LocationPricingUpdateTest(APITestCase):
+    def setUp(self):
+        self.slot_types = [SlotType.objects.create(name=name) for name in ('standard', 'covered', 'premium')]
+        self.car = VehicleType.objects.create(name='Car')
+        response = self.client.post('/api/locations/create/', {
+            'name': 'Pricing Lot',
+            'address': '10 Rate Rd',
+            'slot_pricings': [self.pricing(slot_type, '40.00', 10) for slot_type in self.slot_types[:2]],
+        }, format='json')
+        self.assertEqual(response.data['pricing_changes']['created'], 2)
+        self.location = Location.objects.get(name='Pricing Lot')
+
+    def pricing(self, slot_type, rate, slots):
+        return {'slot_type_id': slot_type.id, 'vehicle_type_id': self.car.id, 'rate_per_hour': rate, 'available_slots': slots}
+
+    def test_update_applies_diff_and_keeps_ids(self):
+        standard = SlotPricing.objects.get(location_id=self.location, slot_type_id=self.slot_types[0])
+        response = self.client.put(f'/api/locations/update/{self.location.id}/', {
+            'name': 'Pricing Lot',
+            'address': '10 Rate Rd',
+            'slot_pricings': [
+                self.pricing(self.slot_types[0], '45.00', 10),
+                self.pricing(self.slot_types[2], '80.00', 4),
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['pricing_changes'], {'created': 1, 'updated': 1, 'deleted': 1, 'unchanged': 0})
+
+        standard.refresh_from_db()
+        self.assertEqual(str(standard.rate_per_hour), '45.00')
+        self.assertEqual(
+            sorted(self.location.slot_pricings.values_list('slot_type_id__name', flat=True)),
+            ['premium', 'standard']
+        )
+
+    def test_duplicate_pairs_rejected(self):
+        response = self.client.put(f'/api/locations/update/{self.location.id}/', {
+            'name': 'Pricing Lot',
+            'address': '10 Rate Rd',
+            'slot_pricings': [self.pricing(self.slot_types[0], '45.00', 10)] * 2,
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.location.slot_pricings.count(), 2)
+
+
+class LocationCatalogTest(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_user(username='admin', password='adminpass', is_staff=True)
+        for name in ('standard', 'covered'):
+            SlotType.objects.create(name=name)
+        VehicleType.objects.create(name='Car')
+        existing = Location.objects.create(name='Old Lot', address='1 Old St')
+        SlotPricing.objects.create(
+            location_id=existing, slot_type_id=SlotType.objects.get(name='standard'),
+            vehicle_type_id=VehicleType.objects.get(name='Car'), rate_per_hour='30.00', available_slots=5
+        )
+        self.client.force_authenticate(user=self.admin_user)
+
+    def upload(self, content, file_format='csv'):
+        return self.client.post('/api/admin/locations/import/', {
+            'file': SimpleUploadedFile(f'catalog.{file_format}', content.encode()),
+            'file_format': file_format,
+        }, format='multipart')
+
+    def test_csv_import_reports_row_errors(self):
+        response = self.upload(
+            "location_name,address,slot_type,vehicle_type,rate_per_hour,available_slots\n"
+            "Old Lot,1 Old St,standard,Car,35.00,5\n"
+            "New Lot,2 New St,covered,car,50.00,8\n"
+            "New Lot,2 New St,rooftop,Car,50.00,8\n"
+            "Bare Lot,3 Bare St,,,,\n"
+            "Half Lot,4 Half St,standard,,,\n"
+        )
+        self.assertEqual(response.status_code, 200)
+        report = response.data
+        self.assertEqual(report['rows'], 5)
+        self.assertEqual((report['locations_created'], report['pricings_created'], report['pricings_updated']), (2, 1, 1))
+        self.assertEqual([error['line'] for error in report['errors']], [4, 6])
+        self.assertIn('slot_type', report['errors'][0]['errors'])
+        self.assertEqual(str(SlotPricing.objects.get(location_id__name='Old Lot').rate_per_hour), '35.00')
+
+    def test_export_round_trips_through_ndjson(self):
+        Location.objects.create(name='Bare Lot', address='3 Bare St')
+        response = self.client.get('/api/admin/locations/export/', {'file_format': 'ndjson'})
+        self.assertEqual(response.status_code, 200)
+        exported = b''.join(response.streaming_content).decode()
+        rows = [json.loads(line) for line in exported.splitlines()]
+        self.assertEqual([row['location_name'] for row in rows], ['Old Lot', 'Bare Lot'])
+
+        Location.objects.all().delete()
+        report = self.upload(exported, 'ndjson').data
+        self.assertEqual((report['locations_created'], report['pricings_created'], report['error_count']), (2, 1, 0))
+
+        out = StringIO()
+        call_command('location_catalog', 'export', '-', stdout=out)
+        self.assertEqual(out.getvalue().splitlines()[1], 'Old Lot,1 Old St,standard,Car,30.00,5')
+
+
+class ReferenceDataCacheTest(APITestCase):
+    def setUp(self):
+        reference_data.clear()
+        self.location = Location.objects.create(name='Cached Lot', address='11 Cache Ct')
+        VehicleType.objects.create(name='Car')
+
+    def test_etag_revalidation_and_version_bump(self):
+        response = self.client.get('/api/data/locations-vehicles/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(json.loads(response.content)['locations'][0]['name'], 'Cached Lot')
+
+        # Only the shared version is read while the catalogue is unchanged
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/data/locations-vehicles/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        self.location.name = 'Renamed Lot'
+        self.location.save()
+        response = self.client.get('/api/data/locations-vehicles/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(json.loads(response.content)['locations'][0]['name'], 'Renamed Lot')
+
+    def test_bulk_pricing_writes_invalidate_details(self):
+        SlotType.objects.create(name='standard')
+        etag = self.client.get('/api/locations/')['ETag']
+        self.assertEqual(self.client.get('/api/locations/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Bulk inserts send no signals, so the import bumps the version itself
+        report = catalog.import_catalog(StringIO(
+            "location_name,address,slot_type,vehicle_type,rate_per_hour,available_slots\n"
+            "Cached Lot,11 Cache Ct,standard,Car,20.00,3\n"
+        ), 'csv')
+        self.assertEqual(report['pricings_created'], 1)
+        response = self.client.get('/api/locations/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)[0]['slot_pricings'][0]['rate_per_hour'], '20.00')
+
+
+class QueryPlanTest(APITestCase):
+    # Fails when a hot path reads reservations or notifications with a full
+    # table scan or sorts them in a temporary B-tree instead of using an index
+    WATCHED_TABLES = ('api_reservation', 'api_notification', 'api_archivedreservation', 'api_archivednotification')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_user(username='admin', password='adminpass', is_staff=True)
+        users = [User.objects.create_user(username=f'planner{i}', password='plannerpass') for i in range(5)]
+        slot_types = [SlotType.objects.create(name=name) for name in ('standard', 'covered')]
+        vehicle_types = [VehicleType.objects.create(name=name) for name in ('Car', 'Motorcycle')]
+        locations = [Location.objects.create(name=f'Plan Lot {i}', address=f'{i} Plan Ave') for i in range(4)]
+        for location in locations:
+            for slot_type in slot_types:
+                for vehicle_type in vehicle_types:
+                    SlotPricing.objects.create(
+                        location_id=location, slot_type_id=slot_type, vehicle_type_id=vehicle_type,
+                        rate_per_hour='25.00', available_slots=50
+                    )
+        first_day = date(2025, 6, 1)
+        reservations = Reservation.objects.bulk_create([
+            Reservation(
+                user=users[i % 5], location=locations[i % 4], slot_type=slot_types[i % 2],
+                vehicle_type=vehicle_types[i % 3 % 2], date=first_day + timedelta(days=i % 60),
+                time=dt_time(i % 24, 0), duration_hours=1 + i % 3, plate_number=f'PLN{i}',
+                vehicle_make='Make', vehicle_model='Model', color='Blue',
+                mode_of_payment=('Cash', 'GCash', 'Card')[i % 3], is_cancelled=i % 7 == 0,
+                is_approved=i % 2 == 0
+            )
+            for i in range(2000)
+        ])
+        Notification.objects.bulk_create([
+            Notification(user=reservation.user, reservation=reservation, message='seeded', is_read=i % 3 == 0)
+            for i, reservation in enumerate(reservations)
+        ])
+        rollups.rebuild()
+        # The first two weeks move to the archive, which hot paths also read
+        archive.archive(date(2025, 6, 15))
+        cls.user = users[0]
+        cls.location = locations[0]
+        cls.vehicle_type = vehicle_types[0]
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        availability.clear_indexes()
+        summary_snapshot.clear()
+        rollups.past_days.clear()
+        cache.clear()
+
+    def assert_indexed(self, requests):
+        with CaptureQueriesContext(connection) as queries:
+            for user, method, path, data in requests:
+                self.client.force_authenticate(user=user)
+                response = getattr(self.client, method)(path, data, format='json')
+                self.assertLess(response.status_code, 300, path)
+        self.assert_plans_indexed(queries)
+
+    def assert_plans_indexed(self, queries):
+        checked = 0
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or not any(table in sql for table in self.WATCHED_TABLES):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = [row[-1] for row in cursor.fetchall()]
+            checked += 1
+            for step in plan:
+                for table in self.WATCHED_TABLES:
+                    self.assertNotRegex(step, rf'^SCAN {table}$', f"Full scan in plan {plan} for {sql}")
+                self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', step, f"Unindexed sort in plan {plan} for {sql}")
+        self.assertGreater(checked, 0)
+
+    def test_reservation_hot_paths(self):
+        slot_query = {
+            'location_id': self.location.id, 'vehicle_type_id': self.vehicle_type.id,
+            'date': '2025-06-10', 'time': '09:00', 'duration_hours': 3,
+        }
+        grid_query = {'location_id': self.location.id, 'vehicle_type_id': self.vehicle_type.id, 'start_date': '2025-06-10'}
+        self.assert_indexed([
+            (None, 'post', '/api/slots/check-availability/', slot_query),
+            (None, 'get', '/api/slots/availability-grid/', grid_query),
+            (self.admin_user, 'get', '/api/admin/reservations/', {}),
+            (self.admin_user, 'get', '/api/admin/reservations/', {'status': 'pending'}),
+            (self.admin_user, 'get', '/api/admin/dashboard/summary/', {}),
+            (self.user, 'get', '/api/reservations/my/', {'when': 'upcoming'}),
+            (self.user, 'get', '/api/reservations/my/', {'when': 'past'}),
+        ])
+
+    def test_sweeper_range_scan(self):
+        with CaptureQueriesContext(connection) as queries:
+            report = sweeper.sweep(now=datetime(2025, 7, 1, tzinfo=dt_timezone.utc), batch_size=200, dry_run=True)
+        self.assertGreater(report['no_shows'], 0)
+        self.assert_plans_indexed(queries)
+
+    def test_notification_hot_paths(self):
+        self.assert_indexed([
+            (self.user, 'get', '/api/notifications/', {}),
+            (self.user, 'get', '/api/notifications/', {'status': 'unread'}),
+            (self.user, 'get', '/api/notifications/unread/', {}),
+        ])
+
+
+class SeedDataTest(TestCase):
+    def seed(self):
+        call_command(
+            'seed_data', reservations=400, users=8, locations=3, days=20,
+            anchor_date=date(2025, 5, 10), stdout=StringIO()
+        )
+        return list(Reservation.objects.order_by('id').values_list('plate_number', 'date', 'time', 'is_cancelled'))
+
+    def test_seed_is_deterministic_and_consistent(self):
+        first = self.seed()
+        self.assertEqual(len(first), 400)
+        self.assertEqual(DailyReservationRollup.objects.aggregate(total=Sum('created'))['total'], 400)
+        self.assertEqual(
+            sum(NotificationCounter.objects.values_list('unread', flat=True)),
+            Notification.objects.filter(is_read=False).count()
+        )
+        with self.assertRaises(CommandError):
+            self.seed()
+
+        Location.objects.all().delete()
+        User.objects.all().delete()
+        self.assertEqual(self.seed(), first)
+
+
+class RequestMetricsTest(APITestCase):
+    def setUp(self):
+        metrics.reset()
+        Location.objects.create(name='Metric Lot', address='12 Gauge St')
+
+    def test_metrics_record_latency_status_and_queries(self):
+        reference_data.clear()
+        self.client.get('/api/data/locations-vehicles/')
+        self.client.get('/api/data/locations-vehicles/')
+        self.client.get('/api/does-not-exist/')
+
+        self.client.force_authenticate(user=User.objects.create_user(username='ops', password='x', is_staff=True))
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('http_requests_total{view="locations-and-vehicles",method="GET",status="200"} 2', body)
+        self.assertIn('http_requests_total{view="unmatched",method="GET",status="404"} 1', body)
+        self.assertIn('http_request_duration_seconds_bucket{view="locations-and-vehicles",le="+Inf"} 2', body)
+        self.assertIn('http_request_duration_seconds_count{view="locations-and-vehicles"} 2', body)
+        # Cold build reads version, locations and vehicle types; the warm hit only the version
+        self.assertIn('http_request_db_queries_total{view="locations-and-vehicles"} 4', body)
+
+    @override_settings(METRICS_SCRAPE_TOKEN='scrape-secret')
+    def test_metrics_need_an_admin_or_the_scrape_token(self):
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 401)
+        self.assertEqual(self.client.get('/api/metrics/', HTTP_X_METRICS_TOKEN='wrong').status_code, 401)
+        self.assertEqual(self.client.get('/api/metrics/', HTTP_X_METRICS_TOKEN='scrape-secret').status_code, 200)
+        self.client.force_authenticate(user=User.objects.create_user(username='driver', password='x'))
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+        with override_settings(METRICS_SCRAPE_TOKEN=None):
+            self.client.force_authenticate(user=None)
+            self.assertEqual(self.client.get('/api/metrics/', HTTP_X_METRICS_TOKEN='').status_code, 401)
+
+    def test_probes(self):
+        self.assertEqual(self.client.get('/api/health/live/').status_code, 200)
+        self.assertEqual(self.client.get('/api/health/ready/').data['status'], 'ok')
+        with patch('api.views.misc_views.connection.cursor', side_effect=OperationalError('database is gone')):
+            response = self.client.get('/api/health/ready/')
+        self.assertEqual(response.status_code, 503)
+
+
+class PayMongoClientTest(APITestCase):
+    checkout = {
+        'description': 'Parking', 'billing_phone': '09170000000', 'line_item_amount': 120.5,
+        'line_item_name': 'Reservation', 'line_item_quantity': 1, 'currency': 'PHP', 'payment_method': 'gcash',
+    }
+
+    def setUp(self):
+        self.stub = StubPayMongoServer().start()
+        self.addCleanup(self.stub.stop)
+        settings_override = override_settings(
+            PAYMONGO_SECRET_KEY='sk_test_stub', PAYMONGO_API_BASE=self.stub.url,
+            PAYMONGO_READ_TIMEOUT=0.3, PAYMONGO_MAX_RETRIES=2, PAYMONGO_BREAKER_THRESHOLD=3
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        paymongo.reset_client()
+        self.addCleanup(paymongo.reset_client)
+        paymongo.get_client().backoff = 0.01
+        self.client.force_authenticate(user=User.objects.create_user(username='payer', password='payerpass'))
+
+    def pay(self):
+        # Queue the checkout, let the worker call the gateway, then read its status
+        response = self.client.post('/api/online-payments/', self.checkout, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['data']['status'], CheckoutSession.CREATING)
+        task_queue.run_pending()
+        return self.client.get(f"/api/online-payments/{response.data['data']['reference_number']}/").data['data']
+
+    def test_checkout_reuses_connection_and_retries_unavailable(self):
+        checkout = self.pay()
+        self.assertEqual(checkout['status'], CheckoutSession.PENDING)
+        self.assertTrue(checkout['checkout_url'].startswith('https://'))
+        method, path, headers, payload = self.stub.requests[0]
+        self.assertEqual(path, '/v1/checkout_sessions')
+        self.assertTrue(headers['Authorization'].startswith('Basic '))
+        self.assertEqual(payload['data']['attributes']['line_items'][0]['amount'], 12050)
+
+        # 503 means the gateway did not act, so the POST is retried
+        self.stub.respond(503, {'errors': []})
+        self.assertEqual(self.pay()['status'], CheckoutSession.PENDING)
+        self.assertEqual(len(self.stub.requests), 3)
+
+        # A rejection fails the checkout without retrying the task
+        self.stub.respond(400, {'errors': [{'code': 'parameter_invalid'}]})
+        checkout = self.pay()
+        self.assertEqual(checkout['status'], CheckoutSession.FAILED)
+        self.assertIn('parameter_invalid', checkout['error'])
+        self.assertEqual(len(self.stub.requests), 4)
+
+    def test_timeout_is_not_retried_and_breaker_fails_fast(self):
+        client = paymongo.get_client()
+        attributes = {'reference_number': 'SPA-BREAKER'}
+        # A POST that timed out may have been processed, so it is not repeated
+        self.stub.respond(200, {}, delay=0.6)
+        with self.assertRaises(paymongo.GatewayUnavailable):
+            client.create_checkout_session(attributes)
+        self.assertEqual(len(self.stub.requests), 1)
+
+        # The third consecutive failure opens the circuit, cutting the retries short
+        self.stub.respond(503, {}, times=3)
+        with self.assertRaises(paymongo.GatewayUnavailable):
+            client.create_checkout_session(attributes)
+        self.assertEqual(len(self.stub.requests), 3)
+        # While open, calls are rejected without touching the gateway
+        with self.assertRaises(paymongo.GatewayUnavailable) as raised:
+            client.create_checkout_session(attributes)
+        self.assertGreater(raised.exception.retry_after, 0)
+        self.assertEqual(len(self.stub.requests), 3)
+
+    def test_broken_response_ends_the_half_open_trial(self):
+        client = paymongo.get_client()
+        client.breaker.reset_timeout = 0
+        for _ in range(client.breaker.failure_threshold):
+            client.breaker.record_failure()
+        with patch.object(client.session, 'request', side_effect=requests.exceptions.ChunkedEncodingError('cut')):
+            with self.assertRaises(paymongo.GatewayUnavailable):
+                client.create_checkout_session({'reference_number': 'SPA-TRIAL'})
+        # The failed trial reopened the circuit; the next trial is let through
+        self.assertEqual(client.create_checkout_session({'reference_number': 'SPA-TRIAL'})['id'][:3], 'cs_')
+
+    def test_gateway_outage_retries_the_task_with_backoff(self):
+        self.stub.respond(503, {}, times=3)
+        response = self.client.post('/api/online-payments/', self.checkout, format='json')
+        self.assertEqual(task_queue.run_pending(), 1)
+        task = Task.objects.get()
+        self.assertEqual((task.status, task.attempts), (Task.QUEUED, 1))
+        self.assertIn('GatewayUnavailable', task.last_error)
+        self.assertGreater(task.run_at, task.started_at)
+        # Not due yet, so nothing runs until the backoff has passed
+        self.assertEqual(task_queue.run_pending(), 0)
+        # Once the backoff has passed and the breaker has cooled down, the retry succeeds
+        Task.objects.update(run_at=task.started_at)
+        paymongo.reset_client()
+        self.assertEqual(task_queue.run_pending(), 1)
+        checkout = CheckoutSession.objects.get(reference_number=response.data['data']['reference_number'])
+        self.assertEqual(checkout.status, CheckoutSession.PENDING)
+
+    def test_timed_out_checkout_post_is_not_retried(self):
+        # The gateway may have created the session, so a second POST could duplicate it
+        self.stub.respond(200, {}, delay=0.6)
+        checkout = self.pay()
+        self.assertEqual(checkout['status'], CheckoutSession.FAILED)
+        self.assertIn('did not confirm', checkout['error'])
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+        self.assertEqual(task_queue.run_pending(), 0)
+        self.assertEqual(len(self.stub.requests), 1)
+
+
+class IdempotencyKeyTest(TransactionTestCase):
+    def setUp(self):
+        availability.clear_indexes()
+        self.addCleanup(availability.clear_indexes)
+        self.user = User.objects.create_user(username='retrier', password='x')
+        self.location = Location.objects.create(name='Retry Lot', address='1 Retry Rd')
+        self.slot_type = SlotType.objects.create(name='standard')
+        self.vehicle_type = VehicleType.objects.create(name='Car')
+        SlotPricing.objects.create(
+            location_id=self.location, slot_type_id=self.slot_type,
+            vehicle_type_id=self.vehicle_type, rate_per_hour='40.00', available_slots=5
+        )
+
+    def book(self, key, plate='IDEM001'):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        try:
+            return client.post('/api/reservations/create/', {
+                'location': self.location.id, 'slot_type': self.slot_type.id,
+                'vehicle_type': self.vehicle_type.id, 'date': '2025-07-01', 'time': '10:00',
+                'duration_hours': 1, 'plate_number': plate, 'vehicle_make': 'Kia',
+                'vehicle_model': 'Rio', 'color': 'Black', 'mode_of_payment': 'Cash',
+            }, format='json', HTTP_IDEMPOTENCY_KEY=key)
+        finally:
+            connection.close()
+
+    def test_retry_replays_the_original_response(self):
+        first = self.book('key-1')
+        self.assertEqual(first.status_code, 201)
+        retry = self.book('key-1')
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Reservation.objects.count(), 1)
+        self.assertEqual(SlotOccupancy.objects.get().reserved, 1)
+
+        # Same key with a different body is a client bug, not a retry
+        self.assertEqual(self.book('key-1', plate='OTHER').status_code, 422)
+        self.assertEqual(self.book('key-2').status_code, 201)
+        self.assertEqual(Reservation.objects.count(), 2)
+
+    def test_concurrent_duplicates_book_once(self):
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            responses = list(pool.map(lambda i: self.book('double-click'), range(6)))
+
+        self.assertEqual([r.status_code for r in responses], [201] * 6)
+        self.assertEqual(len({r.data['id'] for r in responses}), 1)
+        self.assertEqual(sum(1 for r in responses if r.has_header('Idempotent-Replayed')), 5)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    @override_settings(IDEMPOTENCY_WAIT_TIMEOUT=0.2)
+    def test_in_progress_and_abandoned_records(self):
+        self.assertEqual(self.book('seed').status_code, 201)
+        record = IdempotencyRecord.objects.get()
+        IdempotencyRecord.objects.filter(pk=record.pk).update(is_complete=False, response_status=None, response_body=None)
+        response = self.book('seed')
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('Retry-After', response)
+
+        # A record left unfinished by a crashed request is taken over
+        IdempotencyRecord.objects.filter(pk=record.pk).update(created_at=record.created_at - timedelta(minutes=5))
+        self.assertEqual(self.book('seed').status_code, 201)
+        self.assertEqual(Reservation.objects.count(), 2)
+
+        IdempotencyRecord.objects.update(expires_at=record.created_at)
+        out = StringIO()
+        call_command('purge_idempotency_keys', stdout=out)
+        self.assertIn('Deleted 1', out.getvalue())
+
+    def test_checkout_retry_does_not_open_a_second_session(self):
+        stub = StubPayMongoServer().start()
+        self.addCleanup(stub.stop)
+        settings_override = override_settings(PAYMONGO_SECRET_KEY='sk_test_stub', PAYMONGO_API_BASE=stub.url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        paymongo.reset_client()
+        self.addCleanup(paymongo.reset_client)
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        payload = {
+            'description': 'Parking', 'billing_phone': '09170000000', 'line_item_amount': 80,
+            'line_item_name': 'Reservation', 'line_item_quantity': 1, 'currency': 'PHP', 'payment_method': 'gcash',
+        }
+
+        # A server error is not stored, so the same key can be retried
+        with patch.object(task_queue, 'enqueue', side_effect=RuntimeError('queue down')):
+            self.assertEqual(client.post('/api/online-payments/', payload, format='json', HTTP_IDEMPOTENCY_KEY='pay-1').status_code, 500)
+        self.assertFalse(IdempotencyRecord.objects.exists())
+        self.assertFalse(CheckoutSession.objects.exists())
+
+        first = client.post('/api/online-payments/', payload, format='json', HTTP_IDEMPOTENCY_KEY='pay-1')
+        second = client.post('/api/online-payments/', payload, format='json', HTTP_IDEMPOTENCY_KEY='pay-1')
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(task_queue.run_pending(), 1)
+        self.assertEqual(len(stub.requests), 1)
+        reference = stub.requests[0][3]['data']['attributes']['reference_number']
+        self.assertEqual(first.data['data']['reference_number'], reference)
+        self.assertNotEqual(reference, 'REF123456')
+
+
+@override_settings(PAYMONGO_WEBHOOK_SECRET='whsk_test')
+class PaymentWebhookTest(APITestCase):
+    def setUp(self):
+        availability.clear_indexes()
+        self.addCleanup(availability.clear_indexes)
+        self.stub = StubPayMongoServer().start()
+        self.addCleanup(self.stub.stop)
+        settings_override = override_settings(PAYMONGO_SECRET_KEY='sk_test_stub', PAYMONGO_API_BASE=self.stub.url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        paymongo.reset_client()
+        self.addCleanup(paymongo.reset_client)
+        self.user = User.objects.create_user(username='payer', password='x')
+        self.location = Location.objects.create(name='Paid Lot', address='1 Pay Rd')
+        self.slot_type = SlotType.objects.create(name='standard')
+        self.vehicle_type = VehicleType.objects.create(name='Car')
+        SlotPricing.objects.create(
+            location_id=self.location, slot_type_id=self.slot_type,
+            vehicle_type_id=self.vehicle_type, rate_per_hour='40.00', available_slots=50
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def checkout(self):
+        response = self.client.post('/api/online-payments/', {
+            'description': 'Parking', 'billing_phone': '09170000000', 'line_item_amount': 40,
+            'line_item_name': 'Reservation', 'line_item_quantity': 2, 'currency': 'PHP', 'payment_method': 'gcash',
+        }, format='json')
+        self.assertEqual(response.status_code, 202)
+        task_queue.run_pending()
+        return CheckoutSession.objects.get(reference_number=response.data['data']['reference_number']).session_id
+
+    def book(self, session_id, hour=10, **extra):
+        return self.client.post('/api/reservations/create/', {
+            'location': self.location.id, 'slot_type': self.slot_type.id,
+            'vehicle_type': self.vehicle_type.id, 'date': '2025-07-01', 'time': f'{hour:02d}:00',
+            'duration_hours': 2, 'plate_number': 'PAY001', 'vehicle_make': 'Kia', 'vehicle_model': 'Rio', 'color': 'Black',
+            'mode_of_payment': 'GCash', 'checkout_session': session_id, **extra,
+        }, format='json')
+
+    def deliver(self, event, secret='whsk_test', timestamp=None):
+        body, signature = signed_webhook(event, secret, timestamp)
+        return self.client.post('/api/webhooks/paymongo/', body, content_type='application/json',
+                                HTTP_PAYMONGO_SIGNATURE=signature)
+
+    def test_webhook_is_queued_then_applied_by_the_worker(self):
+        session_id = self.checkout()
+        session = CheckoutSession.objects.get(session_id=session_id)
+        self.assertEqual(session.amount, 80)
+        self.assertEqual(session.status, CheckoutSession.PENDING)
+        # The client cannot mark its own reservation paid
+        self.assertEqual(self.book(session_id, is_paid=True).status_code, 201)
+        reservation = Reservation.objects.get()
+        self.assertFalse(reservation.is_paid)
+        Reservation.objects.filter(pk=reservation.pk).update(is_approved=True)
+        rollups.rebuild()
+
+        self.assertEqual(self.deliver(paid_event(session_id), secret='wrong').status_code, 401)
+        self.assertEqual(self.deliver(paid_event(session_id), timestamp=1).status_code, 401)
+        # Redeliveries of the same event are only queued once
+        self.assertEqual(self.deliver(paid_event(session_id)).status_code, 200)
+        self.assertEqual(self.deliver(paid_event(session_id)).status_code, 200)
+        self.assertEqual(PaymentEvent.objects.count(), 1)
+        reservation.refresh_from_db()
+        self.assertFalse(reservation.is_paid)
+
+        call_command('process_payment_events', stdout=StringIO())
+        reservation.refresh_from_db()
+        self.assertTrue(reservation.is_paid)
+        self.assertEqual(CheckoutSession.objects.get().status, CheckoutSession.PAID)
+        self.assertIsNotNone(PaymentEvent.objects.get().processed_at)
+        self.assertEqual(DailyReservationRollup.objects.get().paid, 1)
+        # Reusing a paid session for another reservation is refused
+        self.assertEqual(self.book(session_id, hour=14).status_code, 400)
+
+    def test_booking_cannot_set_status_or_underpay(self):
+        session_id = self.checkout()
+        self.deliver(paid_event(session_id))
+        payments.process_pending()
+        # A paid session for a shorter stay does not cover this reservation
+        response = self.book(session_id, duration_hours=3)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('checkout_session', response.data)
+
+        response = self.book(None, is_paid=True, is_approved=True, has_arrived=True, has_exited=True)
+        self.assertEqual(response.status_code, 201)
+        reservation = Reservation.objects.get()
+        self.assertEqual(
+            (reservation.is_paid, reservation.is_approved, reservation.has_arrived, reservation.has_exited),
+            (False, False, False, False)
+        )
+
+    def test_session_claimed_after_validation_is_refused(self):
+        session_id = self.checkout()
+        self.assertEqual(self.book(session_id).status_code, 201)
+        # As if a concurrent booking committed between validation and the save
+        with patch('api.serializers.reservation_serializers.CreateReservationSerializer.validate_checkout_session',
+                   lambda serializer, value: value):
+            response = self.book(session_id, hour=14)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('checkout_session', response.data)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_paid_before_booking_and_batch_query_count(self):
+        session_id = self.checkout()
+        self.deliver(paid_event(session_id))
+        payments.process_pending()
+        self.assertEqual(self.book(session_id).status_code, 201)
+        self.assertTrue(Reservation.objects.get().is_paid)
+
+        other = User.objects.create_user(username='other', password='x')
+        stranger = CheckoutSession.objects.create(session_id='cs_other', reference_number='SPA-OTHER', user=other, amount=80)
+        self.assertEqual(self.book(stranger.session_id, hour=12).status_code, 400)
+
+        def queue(count, offset):
+            for i in range(offset, offset + count):
+                CheckoutSession.objects.create(session_id=f'cs_batch_{i}', reference_number=f'SPA-{i}', user=self.user, amount=80)
+                self.assertEqual(self.book(f'cs_batch_{i}', hour=i % 24).status_code, 201)
+                self.deliver(paid_event(f'cs_batch_{i}'))
+
+        queue(3, 0)
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(payments.process_batch(), 3)
+        queue(12, 3)
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(payments.process_batch(), 12)
+        self.assertEqual(len(large), len(small))
+        self.assertEqual(Reservation.objects.filter(is_paid=False).count(), 0)
+
+    def test_reconcile_polls_pending_sessions(self):
+        paid, expired, waiting = self.checkout(), self.checkout(), self.checkout()
+        self.book(paid)
+        self.stub.pay(paid)
+        self.stub.expire(expired)
+        requests_before = len(self.stub.requests)
+
+        # Too recent to poll yet
+        self.assertEqual(payments.reconcile(older_than=3600)['checked'], 0)
+        report = payments.reconcile(older_than=0)
+        self.assertEqual(report, {'checked': 3, 'paid': 1, 'expired': 1, 'errors': 0, 'reservations': 1})
+        self.assertEqual(len(self.stub.requests), requests_before + 3)
+        self.assertTrue(Reservation.objects.get().is_paid)
+        self.assertEqual(
+            dict(CheckoutSession.objects.values_list('session_id', 'status')),
+            {paid: CheckoutSession.PAID, expired: CheckoutSession.EXPIRED, waiting: CheckoutSession.PENDING}
+        )
+
+
+class BulkReservationActionTest(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='bulkadmin', password='x', is_staff=True)
+        self.drivers = [User.objects.create_user(username=f'bulk{i}', password='x') for i in range(2)]
+        self.location = Location.objects.create(name='Event Lot', address='5 Event Rd')
+        self.slot_type = SlotType.objects.create(name='standard')
+        self.vehicle_type = VehicleType.objects.create(name='Car')
+        SlotPricing.objects.create(
+            location_id=self.location, slot_type_id=self.slot_type,
+            vehicle_type_id=self.vehicle_type, rate_per_hour='40.00', available_slots=100
+        )
+        self.client.force_authenticate(user=self.admin)
+
+    def reserve(self, count, day='2025-08-01', **fields):
+        reservations = []
+        for i in range(count):
+            reservation = Reservation.objects.create(
+                user=self.drivers[i % 2], location=self.location, slot_type=self.slot_type,
+                vehicle_type=self.vehicle_type, date=date.fromisoformat(day), time=dt_time(8 + i % 3),
+                duration_hours=2, plate_number=f'BLK{i}', vehicle_make='Kia', vehicle_model='Rio', color='Red',
+                mode_of_payment='Cash' if i == 0 else 'GCash', **fields
+            )
+            occupancy.claim(reservation)
+            rollups.record_created(reservation)
+            reservations.append(reservation)
+        return reservations
+
+    def bulk(self, **body):
+        return self.client.post('/api/admin/reservations/bulk/', body, format='json')
+
+    def assert_counters_consistent(self):
+        counters = sorted(DailyReservationRollup.objects.values_list('date', 'approved', 'paid', 'cancelled'))
+        reserved = sorted(SlotOccupancy.objects.values_list('date', 'hour', 'reserved'))
+        rollups.rebuild()
+        occupancy.rebuild()
+        self.assertEqual(sorted(DailyReservationRollup.objects.values_list('date', 'approved', 'paid', 'cancelled')), counters)
+        self.assertEqual(sorted(SlotOccupancy.objects.exclude(reserved=0).values_list('date', 'hour', 'reserved')),
+                         [row for row in reserved if row[2]])
+
+    def test_id_list_reports_each_outcome(self):
+        first, second, cancelled = self.reserve(3)
+        Reservation.objects.filter(pk=second.pk).update(is_approved=True)
+        occupancy.cancel(cancelled)
+        rollups.rebuild()
+
+        response = self.bulk(action='approve', ids=[first.id, second.id, cancelled.id, 999999, first.id])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(response.data['results'], [
+            {'id': first.id, 'outcome': 'updated'},
+            {'id': second.id, 'outcome': 'already_approved'},
+            {'id': cancelled.id, 'outcome': 'cancelled'},
+            {'id': 999999, 'outcome': 'not_found'},
+        ])
+        response = self.bulk(action='mark_paid', ids=[first.id, second.id])
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(DailyReservationRollup.objects.get().paid, 2)
+        self.assert_counters_consistent()
+
+        self.assertEqual(self.bulk(action='approve').status_code, 400)
+        self.assertEqual(self.bulk(action='approve', ids=[1], filter={}).status_code, 400)
+        # A filter matching the whole table is refused
+        for empty in ({}, {'status': 'approved'}, {'mode_of_payment': 'GCash'}):
+            self.assertEqual(self.bulk(action='cancel', filter=empty).status_code, 400)
+        self.assertFalse(Reservation.objects.filter(is_cancelled=True).exclude(pk=cancelled.pk).exists())
+        self.client.force_authenticate(user=self.drivers[0])
+        self.assertEqual(self.bulk(action='approve', ids=[first.id]).status_code, 403)
+
+    def test_filtered_cancel_notifies_in_bulk_and_frees_capacity(self):
+        def cancel_all(day, count):
+            self.reserve(count, day=day, is_approved=True)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.bulk(action='cancel', filter={'status': 'approved', 'start_date': day, 'end_date': day})
+                # One task sends every notice of the request
+                self.assertEqual(task_queue.run_pending(), 1)
+            self.assertEqual(response.data['updated'], count)
+            self.assertFalse(response.data['has_more'])
+            return len(queries)
+
+        # Same shape of hours and users per day, five times the reservations
+        self.assertEqual(cancel_all('2025-08-02', 3), cancel_all('2025-08-03', 15))
+        self.assertEqual(Reservation.objects.filter(is_cancelled=False).count(), 0)
+        self.assertEqual(Notification.objects.count(), 18)
+        cash = Notification.objects.get(reservation__plate_number='BLK0', reservation__date='2025-08-02')
+        self.assertTrue(cash.message.endswith('has been cancelled.'))
+        self.assertIn('A refund will be processed shortly.', Notification.objects.exclude(pk=cash.pk).first().message)
+        self.assertEqual(notifications.unread_count(self.drivers[0].id), 10)
+        self.assertEqual(SlotOccupancy.objects.exclude(reserved=0).count(), 0)
+        self.assert_counters_consistent()
+
+    def test_large_filters_are_batched(self):
+        self.reserve(5)
+        with patch.object(reservation_actions, 'MAX_BATCH', 2):
+            first = self.bulk(action='check_in', filter={'location_id': self.location.id})
+            self.assertEqual((first.data['updated'], first.data['has_more']), (2, True))
+            self.bulk(action='check_in', filter={'location_id': self.location.id})
+            last = self.bulk(action='check_in', filter={'location_id': self.location.id})
+        self.assertEqual((last.data['updated'], last.data['has_more']), (1, False))
+        self.assertEqual(DailyReservationRollup.objects.get().arrived, 5)
+
+
+class TaskQueueTest(TransactionTestCase):
+    def setUp(self):
+        self.calls = []
+        self.dead = []
+
+        def record(n):
+            self.calls.append(n)
+
+        def flaky(n):
+            raise RuntimeError(f'attempt failed for {n}')
+
+        task_queue.register('test.record')(record)
+        task_queue.register('test.flaky', max_attempts=2, on_dead=lambda payload, error: self.dead.append((payload, error)))(flaky)
+        self.addCleanup(task_queue._handlers.pop, 'test.record')
+        self.addCleanup(task_queue._handlers.pop, 'test.flaky')
+
+    def test_failures_back_off_then_dead_letter(self):
+        task = task_queue.enqueue('test.flaky', {'n': 7})
+        self.assertEqual(task_queue.run_pending(), 1)
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.QUEUED, 1))
+        self.assertIn('attempt failed for 7', task.last_error)
+        self.assertGreater(task.run_at, task.started_at)
+        self.assertEqual(task_queue.run_pending(), 0)
+
+        Task.objects.update(run_at=task.started_at)
+        self.assertEqual(task_queue.run_pending(), 1)
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.DEAD, 2))
+        self.assertEqual(self.dead, [({'n': 7}, 'RuntimeError: attempt failed for 7')])
+
+        self.assertEqual(task_queue.requeue_dead(), 1)
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.QUEUED, 0))
+
+    def test_unknown_task_is_rejected_when_queued(self):
+        with self.assertRaises(task_queue.UnknownTask):
+            task_queue.enqueue('test.missing')
+
+    def test_expired_lease_is_reclaimed(self):
+        task = task_queue.enqueue('test.record', {'n': 1})
+        stale, = task_queue.claim('crashed', 1)
+        self.assertEqual(task_queue.claim('other', 1), [])
+        Task.objects.update(locked_until=stale.started_at - timedelta(seconds=1))
+
+        fresh, = task_queue.claim('other', 1)
+        self.assertEqual((fresh.id, fresh.attempts), (task.id, 2))
+        self.assertTrue(task_queue.run(fresh))
+        # The crashed worker's late result is ignored
+        self.assertTrue(task_queue.run(stale))
+        self.assertEqual(Task.objects.get().locked_by, fresh.locked_by)
+        self.assertEqual(self.calls, [1, 1])
+
+    def test_concurrent_claims_never_overlap(self):
+        for n in range(40):
+            task_queue.enqueue('test.record', {'n': n})
+
+        def claim_all(worker_id):
+            claimed = []
+            try:
+                while batch := task_queue.claim(worker_id, 3):
+                    claimed.extend(task.id for task in batch)
+            finally:
+                connection.close()
+            return claimed
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            claimed = [task_id for ids in pool.map(claim_all, ['w1', 'w2', 'w3', 'w4']) for task_id in ids]
+        self.assertEqual(len(claimed), 40)
+        self.assertEqual(set(claimed), set(Task.objects.values_list('id', flat=True)))
+
+    def test_worker_runs_each_task_once(self):
+        for n in range(20):
+            task_queue.enqueue('test.record', {'n': n})
+        worker = task_queue.Worker(threads=4, poll_interval=0.05, worker_id='test')
+        with ThreadPoolExecutor(max_workers=1) as runner:
+            running = runner.submit(worker.run)
+            for _ in range(200):
+                if not Task.objects.exclude(status=Task.DONE).exists():
+                    break
+                sleep(0.05)
+            worker.stop()
+            running.result(timeout=5)
+        self.assertEqual(sorted(self.calls), list(range(20)))
+        self.assertEqual(Task.objects.filter(status=Task.DONE, attempts=1).count(), 20)
+
+        with override_settings(METRICS_SCRAPE_TOKEN='scrape-secret'):
+            body = self.client.get('/api/metrics/', HTTP_X_METRICS_TOKEN='scrape-secret').content.decode()
+        self.assertIn('# TYPE task_queue_depth gauge', body)
+        self.assertIn('task_queue_wait_seconds{name="test.record",stat="max"}', body)
+        self.assertIn('task_queue_run_seconds{name="test.record"}', body)
+
+
+class ReservationSweeperTest(APITestCase):
+    NOW = datetime(2025, 8, 2, 12, 0, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        self.driver = User.objects.create_user(username='sweepdriver', password='x')
+        self.slot_type = SlotType.objects.create(name='standard')
+        self.vehicle_type = VehicleType.objects.create(name='Car')
+        # The default grace period applies to the first lot; the second sets a shorter one
+        self.lot = Location.objects.create(name='Sweep Lot', address='1 Sweep St')
+        self.quick_lot = Location.objects.create(name='Quick Lot', address='2 Sweep St', no_show_grace_minutes=30)
+        for location in (self.lot, self.quick_lot):
+            SlotPricing.objects.create(
+                location_id=location, slot_type_id=self.slot_type,
+                vehicle_type_id=self.vehicle_type, rate_per_hour='40.00', available_slots=10
+            )
+
+    def reserve(self, day, hour, duration_hours=2, location=None, **fields):
+        reservation = Reservation.objects.create(
+            user=self.driver, location=location or self.lot, slot_type=self.slot_type,
+            vehicle_type=self.vehicle_type, date=date.fromisoformat(day), time=dt_time(hour),
+            duration_hours=duration_hours, plate_number='SWP1', vehicle_make='Kia', vehicle_model='Rio',
+            color='Red', mode_of_payment='Cash', **fields
+        )
+        occupancy.claim(reservation)
+        rollups.record_created(reservation)
+        return reservation
+
+    def setUpReservations(self):
+        return {
+            # Ended 10:00, two hours of grace have passed
+            'no_show': self.reserve('2025-08-02', 8),
+            # Ended 11:00, still within the grace period
+            'in_grace': self.reserve('2025-08-02', 9),
+            # Same times, but its lot only allows 30 minutes
+            'quick_no_show': self.reserve('2025-08-02', 9, location=self.quick_lot),
+            # Ran past midnight into today and ended at 03:00
+            'overnight': self.reserve('2025-08-01', 23, duration_hours=4, is_approved=True, is_paid=True),
+            'overstay': self.reserve('2025-08-01', 20, has_arrived=True, is_approved=True),
+            'exited': self.reserve('2025-08-01', 20, has_arrived=True, has_exited=True),
+            'cancelled': self.reserve('2025-08-01', 8, is_cancelled=True),
+            'upcoming': self.reserve('2025-08-03', 8),
+        }
+
+    def test_sweep_cancels_no_shows_and_checks_out_overstays(self):
+        reservations = self.setUpReservations()
+        with CaptureQueriesContext(connection) as queries:
+            report = sweeper.sweep(now=self.NOW)
+        # Reservations after the last day anything can be due on are not read
+        self.assertEqual(report, {'checked': 5, 'no_shows': 3, 'checked_out': 1, 'batches': 1})
+        # One UPDATE for the cancellations and one for the check-outs
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "api_reservation"')]
+        self.assertEqual(len(updates), 2)
+
+        state = {
+            name: Reservation.objects.values_list('is_cancelled', 'has_exited').get(pk=r.pk)
+            for name, r in reservations.items()
+        }
+        self.assertEqual(state['no_show'], (True, False))
+        self.assertEqual(state['quick_no_show'], (True, False))
+        self.assertEqual(state['overnight'], (True, False))
+        self.assertEqual(state['overstay'], (False, True))
+        self.assertEqual(state['in_grace'], (False, False))
+        self.assertEqual(state['upcoming'], (False, False))
+
+        # Capacity of the cancelled reservations is given back
+        held = SlotOccupancy.objects.filter(location=self.lot, date=date(2025, 8, 2), hour=8).values_list('reserved', flat=True)
+        self.assertEqual(list(held), [0])
+        self.assertEqual(SlotOccupancy.objects.get(location=self.quick_lot, hour=9).reserved, 0)
+
+        # Users are told in one background task
+        self.assertEqual(Notification.objects.count(), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(task_queue.run_pending(), 1)
+        messages = list(Notification.objects.values_list('message', flat=True))
+        self.assertEqual(len(messages), 3)
+        self.assertTrue(all('no arrival was recorded' in message for message in messages))
+
+        # Rollups and occupancy agree with a rebuild, and a second sweep has nothing to do
+        counters = sorted(DailyReservationRollup.objects.values_list('date', 'location_id', 'cancelled', 'approved', 'exited'))
+        reserved = sorted(SlotOccupancy.objects.exclude(reserved=0).values_list('location_id', 'date', 'hour', 'reserved'))
+        rollups.rebuild()
+        occupancy.rebuild()
+        self.assertEqual(sorted(DailyReservationRollup.objects.values_list('date', 'location_id', 'cancelled', 'approved', 'exited')), counters)
+        self.assertEqual(sorted(SlotOccupancy.objects.exclude(reserved=0).values_list('location_id', 'date', 'hour', 'reserved')), reserved)
+        self.assertEqual(sweeper.sweep(now=self.NOW)['no_shows'], 0)
+
+    def test_small_batches_and_dry_run(self):
+        self.setUpReservations()
+        preview = sweeper.sweep(now=self.NOW, batch_size=2, dry_run=True)
+        self.assertEqual((preview['no_shows'], preview['checked_out'], preview['batches']), (3, 1, 3))
+        self.assertEqual(Reservation.objects.filter(is_cancelled=True).count(), 1)
+
+        out = StringIO()
+        with patch.object(sweeper.timezone, 'localtime', return_value=self.NOW):
+            call_command('sweep_reservations', batch_size=2, stdout=out)
+        self.assertIn('Cancelled 3 no-shows and checked out 1 overstays', out.getvalue())
+        self.assertEqual(Reservation.objects.filter(is_cancelled=True).count(), 4)
+        # Each batch with cancellations queues its own notices
+        self.assertEqual(Task.objects.filter(name='send_cancellation_notices').count(), 3)
+
+
+class ReservationArchiveTest(APITestCase):
+    CUTOFF = date(2025, 3, 1)
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='archiveadmin', password='x', is_staff=True)
+        self.driver = User.objects.create_user(username='archivedriver', password='x')
+        self.location = Location.objects.create(name='Archive Lot', address='9 Vault Rd')
+        self.slot_type = SlotType.objects.create(name='standard')
+        self.vehicle_type = VehicleType.objects.create(name='Car')
+        SlotPricing.objects.create(
+            location_id=self.location, slot_type_id=self.slot_type,
+            vehicle_type_id=self.vehicle_type, rate_per_hour='40.00', available_slots=10
+        )
+        # Five reservations before the cutoff and three after, each with a notification
+        self.old = [self.reserve(date(2025, 2, 1) + timedelta(days=i), is_cancelled=i == 0) for i in range(5)]
+        self.recent = [self.reserve(date(2025, 3, 1) + timedelta(days=i)) for i in range(3)]
+        Notification.objects.bulk_create([
+            Notification(user=self.driver, reservation=r, message=f'Update {r.id}', is_read=i % 2 == 0)
+            for i, r in enumerate(self.old + self.recent)
+        ])
+        notifications.reconcile()
+
+    def reserve(self, day, **fields):
+        reservation = Reservation.objects.create(
+            user=self.driver, location=self.location, slot_type=self.slot_type, vehicle_type=self.vehicle_type,
+            date=day, time=dt_time(9), duration_hours=2, plate_number='ARC1', vehicle_make='Kia',
+            vehicle_model='Rio', color='Red', mode_of_payment='GCash', **fields
+        )
+        occupancy.claim(reservation)
+        rollups.record_created(reservation)
+        return reservation
+
+    def test_archive_moves_old_rows_in_chunks(self):
+        counters = sorted(DailyReservationRollup.objects.values_list('date', 'created', 'cancelled'))
+        unread_before = notifications.unread_count(self.driver.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            report = archive.archive(self.CUTOFF, chunk_size=2)
+        self.assertEqual((report['reservations'], report['notifications'], report['chunks']), (5, 5, 3))
+        self.assertGreater(report['rows_per_second'], 0)
+
+        # Live tables keep only the operational window; the archive keeps ids and values
+        self.assertEqual(sorted(Reservation.objects.values_list('id', flat=True)), [r.id for r in self.recent])
+        self.assertEqual(sorted(ArchivedReservation.objects.values_list('id', flat=True)), [r.id for r in self.old])
+        self.assertEqual(
+            list(ArchivedReservation.objects.order_by('id').values_list('date', 'is_cancelled', 'created_at')),
+            [(r.date, r.is_cancelled, r.created_at) for r in self.old]
+        )
+        self.assertEqual(Notification.objects.count(), 3)
+        self.assertFalse(ArchivedNotification.objects.filter(is_read=False).exists())
+        self.assertFalse(SlotOccupancy.objects.filter(date__lt=self.CUTOFF).exists())
+
+        # Archived unread notifications stop counting, and the counter matches the rows
+        self.assertEqual(notifications.unread_count(self.driver.id), unread_before - 2)
+        self.assertEqual(notifications.reconcile(), {})
+        # Rollups still cover archived days, including after a rebuild
+        self.assertEqual(sorted(DailyReservationRollup.objects.values_list('date', 'created', 'cancelled')), counters)
+        rollups.rebuild()
+        self.assertEqual(sorted(DailyReservationRollup.objects.values_list('date', 'created', 'cancelled')), counters)
+
+    def test_history_and_export_read_the_archive(self):
+        archive.archive(self.CUTOFF)
+        self.client.force_authenticate(user=self.driver)
+        seen, cursor = [], None
+        while True:
+            params = {'when': 'past', 'page_size': 3}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get('/api/reservations/my/', params)
+            seen += [(row['id'], row['is_archived']) for row in response.data['results']]
+            cursor = response.data['next_cursor']
+            if not cursor:
+                break
+        expected = [(r.id, False) for r in reversed(self.recent)] + [(r.id, True) for r in reversed(self.old)]
+        self.assertEqual(seen, expected)
+
+        feed = self.client.get('/api/notifications/', {'page_size': 20}).data['data']
+        self.assertEqual(len(feed), 8)
+        self.assertEqual(self.client.get('/api/notifications/', {'status': 'unread'}).data['data'],
+                         [n for n in feed if not n['is_read']])
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get('/api/admin/reservations/', {'stream': 'true', 'end_date': '2025-03-01'})
+        exported = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([row['id'] for row in exported], [r.id for r in reversed(self.old + self.recent[:1])])
+        self.assertEqual([row['is_archived'] for row in exported], [False] + [True] * 5)
+        cancelled = self.client.get('/api/admin/reservations/', {'status': 'cancelled'}).data['results']
+        self.assertEqual([row['id'] for row in cancelled], [self.old[0].id])
+
+        out = StringIO()
+        call_command('archive_reservations', retention_days=0, stdout=out)
+        self.assertIn('Archived 3 reservations and 3 notifications', out.getvalue())
+        self.assertIn('rows/s', out.getvalue())
+
+
+class AsyncReadViewTest(TestCase):
+    SYNC_URLS = urlconf_with_reads(False)
+    ASYNC_URLS = urlconf_with_reads(True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='asyncreader', password='x', first_name='Ada', last_name='Sync', email='ada@example.com'
+        )
+        cls.location = Location.objects.create(name='Async Lot', address='5 Loop Rd')
+        slot_type = SlotType.objects.create(name='standard', description='Standard slot', type='basic')
+        vehicle_type = VehicleType.objects.create(name='Car')
+        SlotPricing.objects.create(
+            location_id=cls.location, slot_type_id=slot_type, vehicle_type_id=vehicle_type,
+            rate_per_hour='35.00', available_slots=4
+        )
+        today = date.today()
+        cls.search = {
+            'location_id': cls.location.id, 'vehicle_type_id': vehicle_type.id,
+            'date': str(today + timedelta(days=2)), 'time': '23:00', 'duration_hours': 3,
+        }
+        reservations = [
+            Reservation.objects.create(
+                user=cls.user, location=cls.location, slot_type=slot_type, vehicle_type=vehicle_type,
+                date=today + timedelta(days=offset), time='22:00', duration_hours=4, plate_number=f'ASY{i}',
+                vehicle_make='Mazda', vehicle_model='3', color='Blue', mode_of_payment='Cash'
+            )
+            for i, offset in enumerate([-90, -60, -5, -1, 1, 2, 3])
+        ]
+        Notification.objects.bulk_create([
+            Notification(user=cls.user, reservation=r, message=f'Update {r.id}') for r in reservations
+        ])
+        notifications.reconcile()
+        # The two oldest move to the archive, which the listing reads alongside
+        archive.archive(today - timedelta(days=30))
+
+    def setUp(self):
+        cache.clear()
+        availability.clear_indexes()
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def requests(self):
+        # (method, path, query or body, authenticated)
+        return [
+            ('get', '/api/user/profile/', None, True),
+            ('get', '/api/user/profile/', None, False),
+            ('get', '/api/reservations/my/', {'page_size': 2}, True),
+            ('get', '/api/reservations/my/', {'when': 'past', 'page_size': 10}, True),
+            ('get', '/api/reservations/my/', {'when': 'upcoming'}, True),
+            ('get', '/api/reservations/my/', {'cursor': 'bogus'}, True),
+            ('get', '/api/reservations/my/', {'page_size': 0}, True),
+            ('get', '/api/notifications/count/', None, True),
+            ('get', '/api/notifications/count/', None, False),
+            ('get', '/api/locations/', None, False),
+            ('get', '/api/data/locations-vehicles/', None, False),
+            ('post', '/api/slots/check-availability/', self.search, False),
+            ('post', '/api/slots/check-availability/', {'location_id': self.location.id}, False),
+            ('get', '/api/slots/check-availability/', None, False),
+        ]
+
+    def sync_call(self, method, path, data, authenticated):
+        headers = self.headers if authenticated else {}
+        if method == 'post':
+            return Client().post(path, data, content_type='application/json', headers=headers)
+        return getattr(Client(), method)(path, data, headers=headers)
+
+    async def async_call(self, method, path, data, authenticated):
+        headers = self.headers if authenticated else {}
+        if method == 'post':
+            return await AsyncClient().post(path, data, content_type='application/json', headers=headers)
+        return await getattr(AsyncClient(), method)(path, data, headers=headers)
+
+    def reset_caches(self):
+        cache.clear()
+        reference_data.clear()
+        availability.clear_indexes()
+
+    async def test_responses_match_sync_versions(self):
+        for method, path, data, authenticated in self.requests():
+            with self.subTest(method=method, path=path, data=data, authenticated=authenticated):
+                # Caches are emptied each time so both versions build their own payloads
+                await sync_to_async(self.reset_caches)()
+                with override_settings(ROOT_URLCONF=self.SYNC_URLS):
+                    expected = await sync_to_async(self.sync_call)(method, path, data, authenticated)
+                await sync_to_async(self.reset_caches)()
+                with override_settings(ROOT_URLCONF=self.ASYNC_URLS):
+                    response = await self.async_call(method, path, data, authenticated)
+                    self.assertTrue(asyncio.iscoroutinefunction(response.resolver_match.func))
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(json.loads(response.content), json.loads(expected.content))
+                self.assertEqual(response.get('WWW-Authenticate'), expected.get('WWW-Authenticate'))
+                self.assertEqual(response.get('ETag'), expected.get('ETag'))
+
+    async def test_rejects_bad_tokens(self):
+        with override_settings(ROOT_URLCONF=self.ASYNC_URLS):
+            response = await AsyncClient().get('/api/user/profile/', headers={'Authorization': 'Bearer nope'})
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual(json.loads(response.content)['code'], 'token_not_valid')
+
+            await sync_to_async(User.objects.filter(pk=self.user.pk).update)(is_active=False)
+            response = await AsyncClient().get('/api/notifications/count/', headers=self.headers)
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual(json.loads(response.content)['detail'], 'User is inactive')
+
+    async def test_cached_reference_data_revalidates(self):
+        with override_settings(ROOT_URLCONF=self.ASYNC_URLS):
+            etag = (await AsyncClient().get('/api/locations/'))['ETag']
+            response = await AsyncClient().get('/api/locations/', headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 304)
+
+            # Saving a location moves the catalogue version, so the payload is rebuilt
+            self.location.name = 'Renamed Async Lot'
+            await self.location.asave()
+            response = await AsyncClient().get('/api/locations/', headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.content)[0]['name'], 'Renamed Async Lot')
+
+    def test_setting_picks_the_routed_version(self):
+        self.assertIs(read_view(view_profile), view_profile)
+        with override_settings(ASYNC_READ_VIEWS=True):
+            self.assertIs(read_view(view_profile), aview_profile)
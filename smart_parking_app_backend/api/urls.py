@@ -1,14 +1,46 @@
-from django.urls import path
+from types import ModuleType
+from django.conf import settings
+from django.urls import URLPattern, include, path
 from rest_framework_simplejwt.views import TokenRefreshView
 
 # Import views from their respective modules
 from .views.auth_views import MyTokenObtainPairView, register_user, logout_user, change_password
-from .views.location_views import create_location_with_pricings, location_list_with_slot_details, update_location_with_pricings, delete_location, check_slot_availability, locations_and_vehicle_types
-from .views.reservation_views import create_reservation, user_reservations, cancel_reservation, mark_reservation_as_paid, admin_all_reservations, admin_cancel_reservation, mark_check_in, mark_check_out, approve_reservation
-from .views.user_views import deactivate_user, activate_user, view_regular_users, update_profile, view_profile
-from .views.notification_views import mark_all_notifications_read, count_unread_notifications, list_unread_notifications
-from .views.checkout_views import create_checkout_session
-from .views.dashboard_views import admin_dashboard_summary
+from .views.location_views import create_location_with_pricings, location_list_with_slot_details, update_location_with_pricings, delete_location, check_slot_availability, locations_and_vehicle_types, availability_grid, import_location_catalog, export_location_catalog, alocation_list_with_slot_details, acheck_slot_availability, alocations_and_vehicle_types
+from .views.reservation_views import create_reservation, user_reservations, auser_reservations, cancel_reservation, mark_reservation_as_paid, admin_all_reservations, admin_cancel_reservation, mark_check_in, mark_check_out, approve_reservation, admin_bulk_reservation_action
+from .views.user_views import deactivate_user, activate_user, view_regular_users, update_profile, view_profile, aview_profile
+from .views.notification_views import mark_all_notifications_read, count_unread_notifications, acount_unread_notifications, list_unread_notifications, notification_stream, notification_feed, mark_notifications_read
+from .views.checkout_views import create_checkout_session, checkout_session_status, paymongo_webhook
+from .views.dashboard_views import admin_dashboard_summary, admin_dashboard_trends
+from .views.misc_views import health_check, readiness_check, metrics_view
+
+# Async versions of the hot read endpoints. Under ASGI they skip the hop to the
+# single thread Django runs sync views on; under WSGI each would need its own
+# event loop, so they are only routed when ASYNC_READ_VIEWS is on.
+ASYNC_VIEWS = {
+    view_profile: aview_profile,
+    location_list_with_slot_details: alocation_list_with_slot_details,
+    check_slot_availability: acheck_slot_availability,
+    locations_and_vehicle_types: alocations_and_vehicle_types,
+    user_reservations: auser_reservations,
+    count_unread_notifications: acount_unread_notifications,
+}
+
+
+def read_view(view):
+    return ASYNC_VIEWS[view] if settings.ASYNC_READ_VIEWS else view
+
+
+def urlconf_with_reads(async_reads):
+    # URLconf for the API with the read endpoints in one version whatever the
+    # setting, so tests and benchmarks can compare both in one process
+    versions = ASYNC_VIEWS if async_reads else {aview: view for view, aview in ASYNC_VIEWS.items()}
+    module = ModuleType(f"api_urls_{'async' if async_reads else 'sync'}_reads")
+    module.urlpatterns = [path('api/', include([
+        URLPattern(pattern.pattern, versions.get(pattern.callback, pattern.callback), pattern.default_args, pattern.name)
+        for pattern in urlpatterns
+    ]))]
+    return module
+
 
 urlpatterns = [
     # Auth
@@ -18,25 +50,29 @@ urlpatterns = [
     path('logout/', logout_user, name='logout'),
     path('user/change-password/', change_password, name='change_password'),
     path('user/update/', update_profile, name='update_profile'),
-    path('user/profile/', view_profile, name='view_profile'),
+    path('user/profile/', read_view(view_profile), name='view_profile'),
 
     # Location
     path('locations/create/', create_location_with_pricings, name='create_location'),
-    path('locations/', location_list_with_slot_details, name='location-list'),
+    path('locations/', read_view(location_list_with_slot_details), name='location-list'),
     path('locations/update/<int:location_id>/', update_location_with_pricings, name='update_location'),
     path('locations/delete/<int:location_id>/', delete_location, name='delete_location'),
-    path('slots/check-availability/', check_slot_availability, name='check_slot_availability'),
-    path('data/locations-vehicles/', locations_and_vehicle_types, name='locations-and-vehicles'),
+    path('admin/locations/import/', import_location_catalog, name='import_location_catalog'),
+    path('admin/locations/export/', export_location_catalog, name='export_location_catalog'),
+    path('slots/check-availability/', read_view(check_slot_availability), name='check_slot_availability'),
+    path('slots/availability-grid/', availability_grid, name='availability_grid'),
+    path('data/locations-vehicles/', read_view(locations_and_vehicle_types), name='locations-and-vehicles'),
 
     # Reservation
     path('reservations/create/', create_reservation, name='create_reservation'),
-    path('reservations/my/', user_reservations, name='user_reservations'),
+    path('reservations/my/', read_view(user_reservations), name='user_reservations'),
     path('reservations/<int:reservation_id>/cancel/', cancel_reservation, name='cancel_reservation'),
     path('reservations/<int:reservation_id>/mark-paid/', mark_reservation_as_paid, name='mark_reservation_as_paid'),
     path('reservations/<int:reservation_id>/approve/', approve_reservation, name='approve_reservation'),
 
     # Admin Reservation Management
     path('admin/reservations/', admin_all_reservations, name='admin_all_reservations'),
+    path('admin/reservations/bulk/', admin_bulk_reservation_action, name='admin_bulk_reservation_action'),
     path('admin/reservations/<int:reservation_id>/cancel/', admin_cancel_reservation, name='admin_cancel_reservation'),
     path('admin/reservations/<int:reservation_id>/check-in/', mark_check_in, name='mark_check_in'),
     path('admin/reservations/<int:reservation_id>/check-out/', mark_check_out, name='mark_check_out'),
@@ -48,12 +84,23 @@ urlpatterns = [
 
     # Notifications
     path('notifications/mark-all-read/', mark_all_notifications_read, name='mark_all_notifications_read'),
-    path('notifications/count/', count_unread_notifications, name='count_unread_notifications'),
+    path('notifications/count/', read_view(count_unread_notifications), name='count_unread_notifications'),
     path('notifications/unread/', list_unread_notifications, name='list_unread_notifications'),
+    path('notifications/stream/', notification_stream, name='notification_stream'),
+    path('notifications/', notification_feed, name='notification_feed'),
+    path('notifications/mark-read/', mark_notifications_read, name='mark_notifications_read'),
 
     # Payments / Checkout
     path('online-payments/', create_checkout_session, name='online_payment'),
+    path('online-payments/<str:reference_number>/', checkout_session_status, name='checkout_session_status'),
+    path('webhooks/paymongo/', paymongo_webhook, name='paymongo_webhook'),
 
     # Dashboard
     path('admin/dashboard/summary/', admin_dashboard_summary, name='dashboard_summary'),
+    path('admin/dashboard/trends/', admin_dashboard_trends, name='dashboard_trends'),
+
+    # Probes and monitoring
+    path('health/live/', health_check, name='health_live'),
+    path('health/ready/', readiness_check, name='health_ready'),
+    path('metrics/', metrics_view, name='metrics'),
 ]
\ No newline at end of file
@@ -1,14 +1,20 @@
-import base64
-import os
-import requests
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+import json
+import uuid
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from ..idempotency import idempotent
+from ..models import CheckoutSession
 from ..serializers.payment_serializers import CheckoutSessionSerializer
+from ..services import paymongo, payments, task_queue
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent(atomic=True)
 def create_checkout_session(request):
     # Validate the incoming request data
     serializer = CheckoutSessionSerializer(data=request.data)
@@ -21,66 +27,97 @@ def create_checkout_session(request):
     billing_name = user.get_full_name() or user.username
     billing_email = user.email
 
-    # Retrieve and encode PayMongo secret key
-    secret_key = os.getenv('PAYMONGO_SECRET_KEY')
-    if not secret_key:
-        return Response({'error': 'PayMongo secret key missing'}, status=500)
-    encoded_key = base64.b64encode(secret_key.encode()).decode()
-    headers = {
-        'Authorization': f'Basic {encoded_key}',
-        'Content-Type': 'application/json',
-        'Accept': 'application/json',
-    }
-
     # Prepare payload with validated data
     amount_in_centavos = int(validated['line_item_amount'] * 100)
-    payload = {
-        "data": {
-            "attributes": {
-                "billing": {
-                    "name": billing_name,
-                    "email": billing_email,
-                    "phone": validated['billing_phone']
-                },
-                "send_email_receipt": False,
-                "show_description": True,
-                "show_line_items": True,
-                "description": validated['description'],
-                "line_items": [
-                    {
-                        "currency": validated['currency'],
-                        "amount": amount_in_centavos,
-                        "name": validated['line_item_name'],
-                        "quantity": validated['line_item_quantity']
-                    }
-                ],
-                "payment_method_types": [validated['payment_method']],
-                "cancel_url": "http://localhost:5173/step-payment?payment=cancel",
-                "success_url": "http://localhost:5173/payment-callback",
-                "reference_number": "REF123456"
+    # Unique per session so payments can be matched back to this checkout
+    reference_number = f"SPA-{uuid.uuid4().hex[:16].upper()}"
+    attributes = {
+        "billing": {
+            "name": billing_name,
+            "email": billing_email,
+            "phone": validated['billing_phone']
+        },
+        "send_email_receipt": False,
+        "show_description": True,
+        "show_line_items": True,
+        "description": validated['description'],
+        "line_items": [
+            {
+                "currency": validated['currency'],
+                "amount": amount_in_centavos,
+                "name": validated['line_item_name'],
+                "quantity": validated['line_item_quantity']
             }
-        }
+        ],
+        "payment_method_types": [validated['payment_method']],
+        "cancel_url": "http://localhost:5173/step-payment?payment=cancel",
+        "success_url": "http://localhost:5173/payment-callback",
+        "reference_number": reference_number
     }
 
     try:
-        # Send the checkout session request to PayMongo
-        resp = requests.post('https://api.paymongo.com/v1/checkout_sessions', headers=headers, json=payload)
-        if resp.status_code in (200, 201):
-            response_data = resp.json().get('data', {})
-            return Response({
-                "success": True,
-                "message": "Success",
-                "data": {
-                    "id": response_data.get("id"),
-                    "type": response_data.get("type"),
-                    "checkout_url": response_data.get("attributes", {}).get("checkout_url")
-                }
-            }, status=201)
-        else:
-            return Response({'success': False, 'message': 'PayMongo error', 'details': resp.json()}, status=resp.status_code)
-    except requests.exceptions.RequestException as e:
-        # Handle network errors or request failures gracefully
-        return Response({'success': False, 'message': 'Request to PayMongo failed', 'error': str(e)}, status=503)
+        # The PayMongo call runs in a background task so a slow or unavailable
+        # gateway never holds this request; the client polls the status URL
+        with transaction.atomic():
+            checkout = CheckoutSession.objects.create(
+                reference_number=reference_number,
+                user=user,
+                amount=Decimal(amount_in_centavos * validated['line_item_quantity']) / 100,
+            )
+            task_queue.enqueue('open_checkout', {'checkout_id': checkout.id, 'attributes': attributes})
+        return Response({
+            "success": True,
+            "message": "Checkout is being created",
+            "data": checkout_data(checkout),
+        }, status=202)
     except Exception as e:
-        # Catch-all for any unexpected errors (e.g., JSON decode errors)
-        return Response({'success': False, 'message': 'Unexpected server error', 'error': str(e)}, status=500)
\ No newline at end of file
+        # Catch-all for any unexpected errors
+        return Response({'success': False, 'message': 'Unexpected server error', 'error': str(e)}, status=500)
+
+def checkout_data(checkout):
+    return {
+        "id": checkout.session_id,
+        "reference_number": checkout.reference_number,
+        "status": checkout.status,
+        "checkout_url": checkout.checkout_url or None,
+        "error": checkout.error or None,
+    }
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def checkout_session_status(request, reference_number):
+    # Polled after create_checkout_session until status leaves "creating"
+    try:
+        checkout = CheckoutSession.objects.get(reference_number=reference_number, user=request.user)
+    except CheckoutSession.DoesNotExist:
+        return Response({'success': False, 'message': 'Checkout not found'}, status=404)
+    return Response({"success": True, "data": checkout_data(checkout)}, status=200)
+
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def paymongo_webhook(request):
+    # Verify and queue the event, then acknowledge right away; the payment
+    # worker (process_payment_events) applies queued events in batches
+    if not settings.PAYMONGO_WEBHOOK_SECRET:
+        return Response({"error": "PayMongo webhook secret missing"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    raw = request.body
+    try:
+        payload = json.loads(raw)
+        livemode = bool(payload['data']['attributes'].get('livemode'))
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return Response({"error": "Malformed webhook payload."}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        paymongo.verify_webhook_signature(
+            raw, request.headers.get('Paymongo-Signature'), settings.PAYMONGO_WEBHOOK_SECRET,
+            settings.PAYMONGO_WEBHOOK_TOLERANCE, livemode=livemode
+        )
+    except paymongo.WebhookSignatureError as e:
+        return Response({"error": str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        payments.enqueue(payload)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({"received": True}, status=status.HTTP_200_OK)
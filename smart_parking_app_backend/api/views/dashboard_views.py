@@ -3,63 +3,91 @@ from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
 from datetime import date, timedelta
-from collections import Counter
-from django.db.models import Count
-from ..models import Reservation
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+from ..models import ArchivedReservation, DailyReservationRollup, Reservation
+from ..serializers.dashboard_serializers import TrendQuerySerializer
+from ..services import rollups
+from ..services.snapshot import TTLSnapshot
 
-@api_view(['GET'])
-@permission_classes([IsAdminUser])
-def admin_dashboard_summary(request):
-    try:
-        today = date.today()
+# Dashboard figures shared by every admin tab for a few seconds
+summary_snapshot = TTLSnapshot(getattr(settings, 'DASHBOARD_CACHE_TTL', 10))
 
-        # Calculate start and end of the current week (Monday to Sunday)
-        start_of_week = today - timedelta(days=today.weekday())
-        end_of_week = start_of_week + timedelta(days=6)
+def build_dashboard_summary(today):
+    # Calculate start and end of the current week (Monday to Sunday)
+    start_of_week = today - timedelta(days=today.weekday())
+    end_of_week = start_of_week + timedelta(days=6)
 
-        # Total reservations today
-        total_reservations_today = Reservation.objects.filter(date=today).count()
-        # Total cancellations today
-        total_cancellations_today = Reservation.objects.filter(date=today, is_cancelled=True).count()
-        # Total reservations in current week
-        total_reservations_this_week = Reservation.objects.filter(date__range=(start_of_week, end_of_week)).count()
+    # All scalar counts from the daily rollups in a single pass,
+    # reading one row per day and location instead of every reservation
+    totals = {
+        name: value or 0
+        for name, value in DailyReservationRollup.objects.aggregate(
+            total_reservations_today=Sum('created', filter=Q(date=today)),
+            total_cancellations_today=Sum('cancelled', filter=Q(date=today)),
+            total_reservations_this_week=Sum('created', filter=Q(date__range=(start_of_week, end_of_week))),
+            created=Sum('created'),
+            cancelled=Sum('cancelled'),
+            approved=Sum('approved'),
+            paid=Sum('paid'),
+            arrived=Sum('arrived'),
+            exited=Sum('exited'),
+        ).items()
+    }
+    pending = totals['created'] - totals['cancelled'] - totals['approved']
+
+    # Prepare 7-day daily reservation counts for line chart
+    daily_reservations = [
+        {"date": day['date'], "count": day['created']}
+        for day in rollups.daily_totals(today - timedelta(days=6), today)
+    ]
+
+    # Count payment methods used, grouped in the database, live and archived
+    payment_distribution = {}
+    for model in (Reservation, ArchivedReservation):
+        for item in model.objects.order_by().values('mode_of_payment').annotate(count=Count('id')):
+            payment_distribution[item['mode_of_payment']] = payment_distribution.get(item['mode_of_payment'], 0) + item['count']
+
+    return {
+        "total_reservations_today": totals['total_reservations_today'],
+        "total_reservations_this_week": totals['total_reservations_this_week'],
+        "total_cancellations_today": totals['total_cancellations_today'],
         # Reservations pending approval and not cancelled
-        pending_approvals = Reservation.objects.filter(is_approved=False, is_cancelled=False).count()
+        "pending_approvals": pending,
         # Vehicles currently parked (arrived but not exited)
-        currently_parked = Reservation.objects.filter(has_arrived=True, has_exited=False).count()
+        "currently_parked": totals['arrived'] - totals['exited'],
+        "daily_reservations": daily_reservations,
+        "payment_distribution": payment_distribution,
+        "approval_funnel": {
+            "pending": pending,
+            "approved_unpaid": totals['approved'] - totals['paid'],
+            "approved_paid": totals['paid'],
+            "cancelled": totals['cancelled'],
+        },
+    }
 
-        # Prepare 7-day daily reservation counts for line chart
-        daily_counts = Reservation.objects.filter(
-            date__gte=today - timedelta(days=6)
-        ).values('date').annotate(count=Count('id'))
-        daily_dict = {str(item['date']): item['count'] for item in daily_counts}
-        daily_reservations = [
-            {"date": str(today - timedelta(days=i)), "count": daily_dict.get(str(today - timedelta(days=i)), 0)}
-            for i in reversed(range(7))
-        ]
-
-        # Count payment methods used
-        payments = Reservation.objects.values_list('mode_of_payment', flat=True)
-        payment_distribution = dict(Counter(payments))
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def admin_dashboard_summary(request):
+    try:
+        today = date.today()
+        summary = summary_snapshot.get(lambda: build_dashboard_summary(today), key=today)
+        return Response(summary)
 
-        # Build approval funnel
-        approval_funnel = {
-            "pending": Reservation.objects.filter(is_approved=False, is_cancelled=False).count(),
-            "approved_unpaid": Reservation.objects.filter(is_approved=True, is_paid=False, is_cancelled=False).count(),
-            "approved_paid": Reservation.objects.filter(is_approved=True, is_paid=True, is_cancelled=False).count(),
-            "cancelled": Reservation.objects.filter(is_cancelled=True).count(),
-        }
+    except Exception as e:
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        return Response({
-            "total_reservations_today": total_reservations_today,
-            "total_reservations_this_week": total_reservations_this_week,
-            "total_cancellations_today": total_cancellations_today,
-            "pending_approvals": pending_approvals,
-            "currently_parked": currently_parked,
-            "daily_reservations": daily_reservations,
-            "payment_distribution": payment_distribution,
-            "approval_funnel": approval_funnel,
-        })
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def admin_dashboard_trends(request):
+    serializer = TrendQuerySerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    try:
+        data = serializer.validated_data
+        # Daily counters for the range, read from rollups
+        days = rollups.daily_totals(data['start_date'], data['end_date'], data.get('location_id'))
+        return Response({"daily": days})
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1,17 +1,25 @@
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
+import codecs
 from django.db import transaction
+from django.db.models import Count
+from django.http import StreamingHttpResponse
 from ..serializers.location_serializers import (
     LocationCreateSerializer,
     LocationDetailSerializer,
     SlotAvailabilitySearchSerializer,
+    AvailabilityGridSerializer,
+    CatalogImportSerializer,
+    CatalogExportSerializer,
     LocationSerializer,
     VehicleTypeSerializer
 )
-from ..models import Location, SlotPricing, Reservation, VehicleType
-from datetime import datetime, timedelta
+from ..async_api import async_api_view, json_response, request_data
+from ..models import Location, Notification, SlotPricing, VehicleType
+from ..services import availability, catalog, notifications, reference_data
+from ..services.availability_grid import build_availability_grid
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -22,23 +30,43 @@ def create_location_with_pricings(request):
         with transaction.atomic():
             serializer.is_valid(raise_exception=True)
             serializer.save()
-        return Response({"message": "Location and slot pricings created successfully"}, status=status.HTTP_201_CREATED)
+        return Response({
+            "message": "Location and slot pricings created successfully",
+            "pricing_changes": serializer.pricing_changes
+        }, status=status.HTTP_201_CREATED)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['GET'])
 def location_list_with_slot_details(request):
     try:
-        # Prefetch related fields to reduce query count
-        locations = Location.objects.prefetch_related(
-            'slot_pricings__slot_type_id',
-            'slot_pricings__vehicle_type_id'
-        )
-        serializer = LocationDetailSerializer(locations, many=True)
-        return Response(serializer.data)
+        return reference_data.cached_response(request, 'location_details', build_location_details)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def build_location_details():
+    # Prefetch related fields to reduce query count
+    locations = Location.objects.prefetch_related(
+        'slot_pricings__slot_type_id',
+        'slot_pricings__vehicle_type_id'
+    )
+    return LocationDetailSerializer(locations, many=True).data
+
+# Async version of location_list_with_slot_details, routed under ASGI (ASYNC_READ_VIEWS)
+@async_api_view(['GET'])
+async def alocation_list_with_slot_details(request):
+    try:
+        return await reference_data.acached_response(request, 'location_details', abuild_location_details)
+    except Exception as e:
+        return json_response({"error": str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+async def abuild_location_details():
+    locations = [location async for location in Location.objects.prefetch_related(
+        'slot_pricings__slot_type_id',
+        'slot_pricings__vehicle_type_id'
+    )]
+    return LocationDetailSerializer(locations, many=True).data
+
 @api_view(['PUT'])
 @permission_classes([AllowAny])
 def update_location_with_pricings(request, location_id):
@@ -52,7 +80,10 @@ def update_location_with_pricings(request, location_id):
         with transaction.atomic():
             serializer.is_valid(raise_exception=True)
             serializer.save()
-        return Response({"message": "Location and slot pricings updated successfully"}, status=status.HTTP_200_OK)
+        return Response({
+            "message": "Location and slot pricings updated successfully",
+            "pricing_changes": serializer.pricing_changes
+        }, status=status.HTTP_200_OK)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -61,7 +92,14 @@ def update_location_with_pricings(request, location_id):
 def delete_location(request, location_id):
     try:
         location = Location.objects.get(id=location_id)
-        location.delete()
+        with transaction.atomic():
+            # Its reservations' notifications go with it; unread ones leave the counters
+            unread = dict(
+                Notification.objects.filter(reservation__location=location, is_read=False).order_by()
+                .values_list('user_id').annotate(count=Count('id'))
+            )
+            location.delete()
+            notifications.on_deleted(unread)
         return Response({"message": "Location deleted successfully"}, status=status.HTTP_204_NO_CONTENT)
     except Location.DoesNotExist:
         return Response({"error": "Location not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -81,63 +119,138 @@ def check_slot_availability(request):
         vehicle_type_id = data['vehicle_type_id']
         date = data['date']
         time = data['time']
+        duration_hours = data['duration_hours']
 
-        # Calculate time range for 1-hour slot
-        search_start = datetime.combine(date, time)
-        search_end = search_start + timedelta(hours=1)
-
-        # Fetch relevant pricing and reservations
+        # Fetch relevant pricing with slot type details in one query
         slot_pricings = SlotPricing.objects.filter(
             location_id=location_id,
             vehicle_type_id=vehicle_type_id
-        )
-        reservations = Reservation.objects.filter(
-            location_id=location_id,
-            vehicle_type_id=vehicle_type_id,
-            date=date,
-            is_cancelled=False
-        )
+        ).select_related('slot_type_id')
 
-        overlapping_counts = {}
-
-        for res in reservations:
-            res_start = datetime.combine(res.date, res.time)
-            res_end = res_start + timedelta(hours=res.duration_hours)
-
-            # Check for time overlap
-            if res_start < search_end and search_start < res_end:
-                key = res.slot_type.id
-                overlapping_counts[key] = overlapping_counts.get(key, 0) + 1
-
-        results = []
-        for pricing in slot_pricings:
-            reserved = overlapping_counts.get(pricing.slot_type_id.id, 0)
-            available = pricing.available_slots - reserved
-            results.append({
-                'slot_type': pricing.slot_type_id.name,
-                'rate_per_hour': pricing.rate_per_hour,
-                'available_slots': max(available, 0),
-                'description': pricing.slot_type_id.description,
-                'type': pricing.slot_type_id.type,
-            })
+        # Peak concurrent reservations per slot type across the requested window,
+        # including reservations spilling over midnight in either direction
+        peak_counts = availability.peak_occupancy(location_id, vehicle_type_id, date, time, duration_hours)
 
+        results = [_availability_result(pricing, peak_counts) for pricing in slot_pricings]
         return Response({'results': results}, status=status.HTTP_200_OK)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+# Async version of check_slot_availability, routed under ASGI (ASYNC_READ_VIEWS)
+@async_api_view(['POST'])
+async def acheck_slot_availability(request):
+    serializer = SlotAvailabilitySearchSerializer(data=request_data(request))
+    if not serializer.is_valid():
+        return json_response(serializer.errors, status.HTTP_400_BAD_REQUEST)
+
+    try:
+        data = serializer.validated_data
+        slot_pricings = SlotPricing.objects.filter(
+            location_id=data['location_id'],
+            vehicle_type_id=data['vehicle_type_id']
+        ).select_related('slot_type_id')
+        peak_counts = await availability.apeak_occupancy(
+            data['location_id'], data['vehicle_type_id'], data['date'], data['time'], data['duration_hours']
+        )
+        results = [_availability_result(pricing, peak_counts) async for pricing in slot_pricings]
+        return json_response({'results': results})
+    except Exception as e:
+        return json_response({"error": str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def _availability_result(pricing, peak_counts):
+    reserved = peak_counts.get(pricing.slot_type_id.id, 0)
+    available = pricing.available_slots - reserved
+    return {
+        'slot_type': pricing.slot_type_id.name,
+        'rate_per_hour': pricing.rate_per_hour,
+        'available_slots': max(available, 0),
+        'description': pricing.slot_type_id.description,
+        'type': pricing.slot_type_id.type,
+    }
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def availability_grid(request):
+    serializer = AvailabilityGridSerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        data = serializer.validated_data
+        # Free slots per day, hour and slot type for the whole range at once
+        grid = build_availability_grid(
+            data['location_id'],
+            data['vehicle_type_id'],
+            data['start_date'],
+            data['days']
+        )
+        return Response(grid, status=status.HTTP_200_OK)
+    except Exception as e:
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 @api_view(['GET'])
 def locations_and_vehicle_types(request):
     try:
-        # Fetch all locations and vehicle types
-        locations = Location.objects.all()
-        vehicles = VehicleType.objects.all()
+        return reference_data.cached_response(request, 'locations_and_vehicle_types', build_locations_and_vehicle_types)
+    except Exception as e:
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        location_data = LocationSerializer(locations, many=True).data
-        vehicle_data = VehicleTypeSerializer(vehicles, many=True).data
+def build_locations_and_vehicle_types():
+    # Fetch all locations and vehicle types
+    locations = Location.objects.all()
+    vehicles = VehicleType.objects.all()
+    return {
+        'locations': LocationSerializer(locations, many=True).data,
+        'vehicle_types': VehicleTypeSerializer(vehicles, many=True).data,
+    }
 
-        return Response({
-            'locations': location_data,
-            'vehicle_types': vehicle_data,
-        })
+# Async version of locations_and_vehicle_types, routed under ASGI (ASYNC_READ_VIEWS)
+@async_api_view(['GET'])
+async def alocations_and_vehicle_types(request):
+    try:
+        return await reference_data.acached_response(
+            request, 'locations_and_vehicle_types', abuild_locations_and_vehicle_types
+        )
+    except Exception as e:
+        return json_response({"error": str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+async def abuild_locations_and_vehicle_types():
+    locations = [location async for location in Location.objects.all()]
+    vehicles = [vehicle async for vehicle in VehicleType.objects.all()]
+    return {
+        'locations': LocationSerializer(locations, many=True).data,
+        'vehicle_types': VehicleTypeSerializer(vehicles, many=True).data,
+    }
+
+CATALOG_CONTENT_TYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def import_location_catalog(request):
+    serializer = CatalogImportSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        # Decode the upload lazily so large files are never held in memory as text
+        upload = serializer.validated_data['file']
+        report = catalog.import_catalog(
+            codecs.iterdecode(upload, 'utf-8-sig'), serializer.validated_data['file_format']
+        )
+        return Response(report, status=status.HTTP_200_OK)
+    except (catalog.CatalogFormatError, UnicodeDecodeError) as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_location_catalog(request):
+    params = CatalogExportSerializer(data=request.query_params)
+    if not params.is_valid():
+        return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    file_format = params.validated_data['file_format']
+    response = StreamingHttpResponse(catalog.export_catalog(file_format), content_type=CATALOG_CONTENT_TYPES[file_format])
+    response['Content-Disposition'] = f'attachment; filename="locations.{file_format}"'
+    return response
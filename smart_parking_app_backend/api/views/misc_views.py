@@ -1,11 +1,47 @@
 # Placeholder for other miscellaneous views, utilities, or health checks.
 
-from rest_framework.decorators import api_view
+import hmac
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import BasePermission, IsAdminUser
 from rest_framework.response import Response
+from ..services import metrics, task_queue
 
 @api_view(['GET'])
 def health_check(request):
     """
     Basic health check endpoint to verify server is running.
     """
-    return Response({"status": "ok"}, status=200)
\ No newline at end of file
+    return Response({"status": "ok"}, status=200)
+
+@api_view(['GET'])
+def readiness_check(request):
+    """
+    Readiness probe: the server can reach its database.
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    except Exception as e:
+        return Response({"status": "unavailable", "error": str(e)}, status=503)
+    return Response({"status": "ok"}, status=200)
+
+class HasScrapeToken(BasePermission):
+    # Lets a metrics scraper in with METRICS_SCRAPE_TOKEN instead of a JWT
+    def has_permission(self, request, view):
+        expected = getattr(settings, 'METRICS_SCRAPE_TOKEN', None)
+        sent = request.headers.get('X-Metrics-Token')
+        return bool(expected and sent) and hmac.compare_digest(sent.encode(), expected.encode())
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser | HasScrapeToken])
+def metrics_view(request):
+    """
+    Request metrics of this worker process, plus the shared task queue's depth
+    and latency, in the Prometheus text format.
+    """
+    body = metrics.render() + metrics.render_task_queue(task_queue.stats())
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -2,8 +2,37 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from ..models import Notification
-from ..serializers.notification_serializers import NotificationSerializer
+from rest_framework.exceptions import AuthenticationFailed
+import asyncio
+import json
+from time import monotonic
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Q
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from ..async_api import async_api_view, json_response
+from ..models import ArchivedNotification, Notification
+from ..pagination import InvalidCursor, union_keyset_page
+from ..serializers.notification_serializers import (
+    NotificationSerializer,
+    NotificationFeedQuerySerializer,
+    MarkNotificationsReadSerializer
+)
+from ..services import notifications
+from ..services.notification_bus import get_broker
+
+# Seconds between keep-alive comments on an idle stream
+STREAM_HEARTBEAT = getattr(settings, 'NOTIFICATION_STREAM_HEARTBEAT', 15)
+# Most missed notifications replayed when a client resumes
+STREAM_BACKLOG_LIMIT = 100
+# Seconds between checks for notifications written by other processes (the
+# task worker, the sweeper), whose broker events never reach this process
+STREAM_POLL_INTERVAL = getattr(settings, 'NOTIFICATION_STREAM_POLL_INTERVAL', 2)
 
 @api_view(['PATCH'])
 @permission_classes([IsAuthenticated])
@@ -11,7 +40,10 @@ def mark_all_notifications_read(request):
     try:
         user = request.user
         # Update all unread notifications for the user
-        updated_count = Notification.objects.filter(user=user, is_read=False).update(is_read=True)
+        with transaction.atomic():
+            updated_count = Notification.objects.filter(user=user, is_read=False).update(is_read=True)
+            if updated_count:
+                notifications.on_read(user.id, updated_count)
         return Response({
             "success": True,
             "message": f"{updated_count} notifications marked as read."
@@ -24,7 +56,8 @@ def mark_all_notifications_read(request):
 def count_unread_notifications(request):
     try:
         user = request.user
-        unread_count = Notification.objects.filter(user=user, is_read=False).count()
+        # Served from the denormalized counter instead of counting rows
+        unread_count = notifications.unread_count(user.id)
         return Response({
             "success": True,
             "unread_count": unread_count
@@ -32,6 +65,18 @@ def count_unread_notifications(request):
     except Exception as e:
         return Response({"success": False, "error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+# Async version of count_unread_notifications, routed under ASGI (ASYNC_READ_VIEWS)
+@async_api_view(['GET'], authenticated=True)
+async def acount_unread_notifications(request):
+    try:
+        unread_count = await notifications.aunread_count(request.user.id)
+        return json_response({
+            "success": True,
+            "unread_count": unread_count
+        })
+    except Exception as e:
+        return json_response({"success": False, "error": str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def list_unread_notifications(request):
@@ -40,7 +85,7 @@ def list_unread_notifications(request):
         # Fetch unread notifications sorted by creation time
         unread_notifications = Notification.objects.filter(
             user=user, is_read=False
-        ).order_by('-created_at')
+        ).select_related('reservation__location').order_by('-created_at')
         serializer = NotificationSerializer(unread_notifications, many=True)
         return Response({
             "success": True,
@@ -48,4 +93,160 @@ def list_unread_notifications(request):
             "data": serializer.data
         }, status=status.HTTP_200_OK)
     except Exception as e:
-        return Response({"success": False, "error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        return Response({"success": False, "error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def notification_feed(request):
+    params = NotificationFeedQuerySerializer(data=request.query_params)
+    if not params.is_valid():
+        return Response({"success": False, "errors": params.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        filters = params.validated_data
+        # Reservation and location are joined so each page is a single query
+        feed = Notification.objects.filter(user=request.user).select_related('reservation__location')
+        if filters['status'] != 'all':
+            feed = feed.filter(is_read=filters['status'] == 'read')
+        sources = [feed]
+        if filters['status'] != 'unread':
+            # Archived notifications are all read
+            sources.append(ArchivedNotification.objects.filter(user=request.user).select_related('reservation__location'))
+        page, next_cursor = union_keyset_page(sources, ('created_at', 'id'), filters.get('cursor'), filters['page_size'])
+        return Response({
+            "success": True,
+            "data": NotificationSerializer(page, many=True).data,
+            "next_cursor": next_cursor
+        }, status=status.HTTP_200_OK)
+    except InvalidCursor as e:
+        return Response({"success": False, "error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({"success": False, "error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['PATCH'])
+@permission_classes([IsAuthenticated])
+def mark_notifications_read(request):
+    serializer = MarkNotificationsReadSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({"success": False, "errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        user = request.user
+        data = serializer.validated_data
+        selected = Q()
+        if data.get('ids'):
+            selected |= Q(id__in=data['ids'])
+        if data.get('up_to_id') is not None:
+            selected |= Q(id__lte=data['up_to_id'])
+        # Mark the whole selection in one UPDATE
+        with transaction.atomic():
+            updated_count = Notification.objects.filter(selected, user=user, is_read=False).update(is_read=True)
+            if updated_count:
+                notifications.on_read(user.id, updated_count)
+        return Response({
+            "success": True,
+            "message": f"{updated_count} notifications marked as read."
+        }, status=status.HTTP_200_OK)
+    except Exception as e:
+        return Response({"success": False, "error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def _authenticate_stream(request):
+    # EventSource cannot send headers, so the access token may also come as ?token=
+    authenticator = JWTAuthentication()
+    header = authenticator.get_header(request)
+    raw_token = authenticator.get_raw_token(header) if header else request.GET.get('token')
+    if not raw_token:
+        return None
+    return authenticator.get_user(authenticator.get_validated_token(raw_token))
+
+def _missed_notifications(user, last_event_id):
+    # Notifications created after the last one the client saw, oldest first
+    missed = Notification.objects.filter(user=user, id__gt=last_event_id).select_related(
+        'reservation__location'
+    ).order_by('id')[:STREAM_BACKLOG_LIMIT]
+    return [
+        {'type': 'notification', 'id': notification.id, 'data': NotificationSerializer(notification).data}
+        for notification in missed
+    ]
+
+def _format_event(event):
+    lines = []
+    if 'id' in event:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['type']}")
+    lines.append(f"data: {json.dumps(event['data'], cls=DjangoJSONEncoder)}")
+    return '\n'.join(lines) + '\n\n'
+
+def _latest_notification_id(user):
+    return Notification.objects.filter(user=user).order_by('-id').values_list('id', flat=True).first() or 0
+
+async def _event_stream(user, last_event_id):
+    # Subscribe before reading the backlog so nothing created in between is lost
+    broker = get_broker()
+    queue = broker.subscribe(user.id)
+    try:
+        if last_event_id is None:
+            # Nothing to replay; polling picks up from the newest notification
+            last_event_id = await sync_to_async(_latest_notification_id)(user)
+        else:
+            for event in await sync_to_async(_missed_notifications)(user, last_event_id):
+                last_event_id = event['id']
+                yield _format_event(event)
+        sent_count = await notifications.aunread_count(user.id)
+        yield _format_event({'type': 'unread_count', 'data': {'unread_count': sent_count}})
+
+        idle_since = monotonic()
+        while True:
+            try:
+                events = [await asyncio.wait_for(queue.get(), STREAM_POLL_INTERVAL)]
+            except asyncio.TimeoutError:
+                # The broker only carries events published in this process, so
+                # the database is the channel for everything written elsewhere
+                events = await sync_to_async(_missed_notifications)(user, last_event_id)
+                count = await notifications.aunread_count(user.id)
+                events.append({'type': 'unread_count', 'data': {'unread_count': count}})
+
+            for event in events:
+                if event['type'] == 'notification':
+                    # Skip anything already sent from the backlog or a poll
+                    if event['id'] <= last_event_id:
+                        continue
+                    last_event_id = event['id']
+                elif event['type'] == 'unread_count':
+                    if event['data']['unread_count'] == sent_count:
+                        continue
+                    sent_count = event['data']['unread_count']
+                idle_since = monotonic()
+                yield _format_event(event)
+
+            if monotonic() - idle_since >= STREAM_HEARTBEAT:
+                idle_since = monotonic()
+                yield ': keep-alive\n\n'
+    finally:
+        broker.unsubscribe(user.id, queue)
+
+async def notification_stream(request):
+    # Server-sent events: new notifications and unread-count changes for the user
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI the endless stream would be collected before anything is
+        # sent, holding a worker thread forever. 204 tells EventSource to stop
+        # reconnecting; clients fall back to fetching the count.
+        return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+    try:
+        user = await sync_to_async(_authenticate_stream)(request)
+    except (InvalidToken, TokenError, AuthenticationFailed) as e:
+        # AuthenticationFailed: a valid token for a deactivated or deleted user
+        return JsonResponse({"success": False, "error": str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+    if user is None:
+        return JsonResponse({"success": False, "error": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return JsonResponse({"success": False, "error": "Invalid last event id."}, status=status.HTTP_400_BAD_REQUEST)
+
+    response = StreamingHttpResponse(_event_stream(user, last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
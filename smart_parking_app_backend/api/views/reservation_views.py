@@ -2,35 +2,136 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
+import heapq
+import json
+from itertools import islice
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from ..serializers.reservation_serializers import (
     CreateReservationSerializer,
     ReservationSerializer,
     AdminCancelReservationSerializer,
     ReservationCheckSerializer,
-    ReservationAdminSerializer
+    ReservationAdminSerializer,
+    AdminReservationFilterSerializer,
+    UserReservationFilterSerializer,
+    BulkReservationActionSerializer
 )
-from ..models import Reservation, Notification
+from ..async_api import async_api_view, json_response
+from ..idempotency import idempotent
+from ..models import ArchivedReservation, CheckoutSession, Reservation, SlotPricing
+from ..pagination import InvalidCursor, akeyset_page, aunion_keyset_page, keyset_page, union_keyset_page
+from ..services import availability, occupancy, reservation_actions, rollups, task_queue
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent(atomic=True)
 def create_reservation(request):
     serializer = CreateReservationSerializer(data=request.data)
-    if serializer.is_valid():
-        serializer.save(user=request.user)  # Link reservation to current user
-        return Response({"message": "Reservation created successfully"}, status=status.HTTP_201_CREATED)
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    session = serializer.validated_data.get('checkout_session')
+    if session is not None and session.user_id != request.user.id:
+        return Response({"checkout_session": ["This checkout session belongs to another user."]}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        # Save and claim capacity together so a full hour rolls back the reservation
+        with transaction.atomic():
+            extra = {}
+            if session is not None:
+                # Paid state comes from the gateway, never from the client. The lock
+                # orders this with the payment worker marking the session paid.
+                session = CheckoutSession.objects.select_for_update().get(pk=session.pk)
+                # Checked again under the lock: a concurrent booking with the same
+                # session may have committed since the serializer looked
+                if Reservation.objects.filter(checkout_session=session).exists():
+                    return Response({"checkout_session": ["This checkout session already paid for another reservation."]}, status=status.HTTP_400_BAD_REQUEST)
+                extra['is_paid'] = session.status == CheckoutSession.PAID
+            reservation = serializer.save(user=request.user, **extra)  # Link reservation to current user
+            occupancy.claim(reservation)
+            rollups.record_created(reservation)
+    except SlotPricing.DoesNotExist:
+        return Response({"error": "This slot type is not offered for the selected vehicle type and location."}, status=status.HTTP_400_BAD_REQUEST)
+    except occupancy.CapacityExceeded as e:
+        return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+
+    transaction.on_commit(lambda: availability.record_reservation(reservation))
+    return Response({"message": "Reservation created successfully", "id": reservation.id}, status=status.HTTP_201_CREATED)
+
+USER_SCHEDULE_ORDER = ('date', 'time', 'id')
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_reservations(request):
+    params = UserReservationFilterSerializer(data=request.query_params)
+    if not params.is_valid():
+        return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+
     try:
-        user = request.user
-        reservations = Reservation.objects.filter(user=user).order_by('-date', '-time')
-        serializer = ReservationSerializer(reservations, many=True)
-        return Response(serializer.data)
+        filters = params.validated_data
+        reservations, archived = _user_reservation_querysets(request.user, filters['when'])
+        if filters['when'] == 'upcoming':
+            page, next_cursor = keyset_page(
+                reservations, USER_SCHEDULE_ORDER, filters.get('cursor'), filters['page_size'], descending=False
+            )
+        else:
+            page, next_cursor = union_keyset_page(
+                [reservations, archived], USER_SCHEDULE_ORDER, filters.get('cursor'), filters['page_size']
+            )
+        serializer = ReservationSerializer(page, many=True)
+        return Response({"results": serializer.data, "next_cursor": next_cursor})
+    except InvalidCursor as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+# Async version of user_reservations, routed under ASGI (ASYNC_READ_VIEWS)
+@async_api_view(['GET'], authenticated=True)
+async def auser_reservations(request):
+    params = UserReservationFilterSerializer(data=request.GET)
+    if not params.is_valid():
+        return json_response(params.errors, status.HTTP_400_BAD_REQUEST)
+
+    try:
+        filters = params.validated_data
+        reservations, archived = _user_reservation_querysets(request.user, filters['when'])
+        if filters['when'] == 'upcoming':
+            page, next_cursor = await akeyset_page(
+                reservations, USER_SCHEDULE_ORDER, filters.get('cursor'), filters['page_size'], descending=False
+            )
+        else:
+            page, next_cursor = await aunion_keyset_page(
+                [reservations, archived], USER_SCHEDULE_ORDER, filters.get('cursor'), filters['page_size']
+            )
+        serializer = ReservationSerializer(page, many=True)
+        return json_response({"results": serializer.data, "next_cursor": next_cursor})
+    except InvalidCursor as e:
+        return json_response({"error": str(e)}, status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return json_response({"error": str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def _user_reservation_querysets(user, when):
+    # Live and archived reservations of the user for a `when` filter; upcoming
+    # ones are never archived
+    # Nested objects are joined in so every page is a single query
+    related = ('user', 'location', 'slot_type', 'vehicle_type')
+    reservations = Reservation.objects.filter(user=user).select_related(*related)
+    archived = ArchivedReservation.objects.filter(user=user).select_related(*related)
+
+    # Upcoming runs soonest first; past and all run newest first
+    now = timezone.localtime()
+    starts_from_now = Q(date__gt=now.date()) | Q(date=now.date(), time__gte=now.time())
+    if when == 'upcoming':
+        return reservations.filter(starts_from_now), None
+    if when == 'past':
+        reservations = reservations.exclude(starts_from_now)
+        archived = archived.exclude(starts_from_now)
+    return reservations, archived
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def cancel_reservation(request, reservation_id):
@@ -39,8 +140,10 @@ def cancel_reservation(request, reservation_id):
         if reservation.is_cancelled:
             return Response({"message": "Reservation already cancelled"}, status=status.HTTP_400_BAD_REQUEST)
 
-        reservation.is_cancelled = True
-        reservation.save()
+        # Cancel and free its capacity; a concurrent cancel may have won the race
+        if not occupancy.cancel(reservation):
+            return Response({"message": "Reservation already cancelled"}, status=status.HTTP_400_BAD_REQUEST)
+        transaction.on_commit(lambda: availability.discard_reservation(reservation))
 
         return Response({"message": "Reservation cancelled successfully"}, status=status.HTTP_200_OK)
     except Reservation.DoesNotExist:
@@ -52,12 +155,11 @@ def cancel_reservation(request, reservation_id):
 @permission_classes([IsAdminUser])
 def mark_reservation_as_paid(request, reservation_id):
     try:
-        reservation = Reservation.objects.get(id=reservation_id)
-        reservation.is_paid = True
-        reservation.save()
+        # Conditional update of the locked row: a repeat, or a concurrent
+        # request, finds it already paid and leaves the rollups alone
+        if reservation_actions.apply_to_one('mark_paid', reservation_id) == 'not_found':
+            return Response({"error": "Reservation not found."}, status=status.HTTP_404_NOT_FOUND)
         return Response({"message": f"Reservation {reservation_id} marked as paid."}, status=status.HTTP_200_OK)
-    except Reservation.DoesNotExist:
-        return Response({"error": "Reservation not found."}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -72,38 +174,12 @@ def admin_cancel_reservation(request, reservation_id):
     serializer = AdminCancelReservationSerializer(reservation, data={'is_cancelled': True}, partial=True)
 
     if serializer.is_valid():
-        serializer.save()
-
-        # Build appropriate refund/cancellation message
-        refund_methods = ['GCash', 'Maya', 'Card']
-        if reservation.mode_of_payment in refund_methods:
-            message = (
-                f"Your reservation on {reservation.date} at {reservation.location.name} "
-                f"has been cancelled. A refund will be processed shortly."
-            )
-        elif reservation.mode_of_payment == 'Cash':
-            if reservation.is_paid:
-                message = (
-                    f"Your reservation on {reservation.date} at {reservation.location.name} "
-                    f"has been cancelled. Please contact the administrator for a refund."
-                )
-            else:
-                message = (
-                    f"Your reservation on {reservation.date} at {reservation.location.name} "
-                    f"has been cancelled."
-                )
-        else:
-            message = (
-                f"Your reservation on {reservation.date} at {reservation.location.name} "
-                f"has been cancelled."
-            )
-
-        # Notify the user
-        Notification.objects.create(
-            user=reservation.user,
-            reservation=reservation,
-            message=message
-        )
+        # Cancel and free its capacity once; only the request that actually
+        # cancelled it notifies the user, from a background worker
+        with transaction.atomic():
+            if occupancy.cancel(reservation):
+                transaction.on_commit(lambda: availability.discard_reservation(reservation))
+                task_queue.enqueue('send_cancellation_notices', {'reservation_ids': [reservation.id]})
 
         return Response({
             "message": "Reservation cancelled successfully",
@@ -116,12 +192,10 @@ def admin_cancel_reservation(request, reservation_id):
 @permission_classes([IsAdminUser])
 def mark_check_in(request, reservation_id):
     try:
+        if reservation_actions.apply_to_one('check_in', reservation_id) == 'not_found':
+            return Response({"error": "Reservation not found"}, status=status.HTTP_404_NOT_FOUND)
         reservation = Reservation.objects.get(id=reservation_id)
-        serializer = ReservationCheckSerializer(reservation, data={"has_arrived": True}, partial=True)
-        if serializer.is_valid():
-            serializer.save()
-            return Response({"message": "Check-in marked successfully", "data": serializer.data})
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"message": "Check-in marked successfully", "data": ReservationCheckSerializer(reservation).data})
     except Reservation.DoesNotExist:
         return Response({"error": "Reservation not found"}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
@@ -131,25 +205,85 @@ def mark_check_in(request, reservation_id):
 @permission_classes([IsAdminUser])
 def mark_check_out(request, reservation_id):
     try:
+        if reservation_actions.apply_to_one('check_out', reservation_id) == 'not_found':
+            return Response({"error": "Reservation not found"}, status=status.HTTP_404_NOT_FOUND)
         reservation = Reservation.objects.get(id=reservation_id)
-        serializer = ReservationCheckSerializer(reservation, data={"has_exited": True}, partial=True)
-        if serializer.is_valid():
-            serializer.save()
-            return Response({"message": "Check-out marked successfully", "data": serializer.data})
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"message": "Check-out marked successfully", "data": ReservationCheckSerializer(reservation).data})
     except Reservation.DoesNotExist:
         return Response({"error": "Reservation not found"}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+# Conditions behind each admin status filter
+RESERVATION_STATUS_FILTERS = {
+    'pending': Q(is_approved=False, is_cancelled=False),
+    'approved': Q(is_approved=True, is_cancelled=False),
+    'paid': Q(is_paid=True, is_cancelled=False),
+    'unpaid': Q(is_paid=False, is_cancelled=False),
+    'cancelled': Q(is_cancelled=True),
+    'parked': Q(has_arrived=True, has_exited=False),
+    'completed': Q(has_exited=True),
+}
+ADMIN_LISTING_ORDER = ('created_at', 'id')
+STREAM_CHUNK_SIZE = 500
+
+def filter_admin_reservations(reservations, filters):
+    if 'start_date' in filters:
+        reservations = reservations.filter(date__gte=filters['start_date'])
+    if 'end_date' in filters:
+        reservations = reservations.filter(date__lte=filters['end_date'])
+    if 'location_id' in filters:
+        reservations = reservations.filter(location_id=filters['location_id'])
+    if 'status' in filters:
+        reservations = reservations.filter(RESERVATION_STATUS_FILTERS[filters['status']])
+    if 'mode_of_payment' in filters:
+        reservations = reservations.filter(mode_of_payment=filters['mode_of_payment'])
+    return reservations
+
+def stream_reservations(querysets):
+    # Yield a JSON array one chunk of rows at a time, merging the querysets'
+    # rows into a single newest-first order
+    yield '['
+    first = True
+    ordering = [f'-{name}' for name in ADMIN_LISTING_ORDER]
+    rows = heapq.merge(
+        *[queryset.order_by(*ordering).iterator(chunk_size=STREAM_CHUNK_SIZE) for queryset in querysets],
+        key=lambda row: [getattr(row, name) for name in ADMIN_LISTING_ORDER], reverse=True
+    )
+    for chunk in iter(lambda: list(islice(rows, STREAM_CHUNK_SIZE)), []):
+        for row in ReservationAdminSerializer(chunk, many=True).data:
+            yield ('' if first else ',') + json.dumps(row, cls=DjangoJSONEncoder)
+            first = False
+    yield ']'
+
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def admin_all_reservations(request):
+    params = AdminReservationFilterSerializer(data=request.query_params)
+    if not params.is_valid():
+        return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+
     try:
-        # Fetch all reservations with related data for admin viewing
-        reservations = Reservation.objects.select_related('location', 'slot_type', 'vehicle_type', 'user').all()
-        serializer = ReservationAdminSerializer(reservations, many=True)
-        return Response(serializer.data)
+        filters = params.validated_data
+        # Fetch reservations with related data for admin viewing, filtered server-side,
+        # from the live table and the archive
+        related = ('location', 'slot_type', 'vehicle_type', 'user')
+        sources = [
+            filter_admin_reservations(model.objects.select_related(*related), filters)
+            for model in (Reservation, ArchivedReservation)
+        ]
+
+        # Export mode writes rows as they are read instead of building one list
+        if filters['stream']:
+            return StreamingHttpResponse(stream_reservations(sources), content_type='application/json')
+
+        page, next_cursor = union_keyset_page(
+            sources, ADMIN_LISTING_ORDER, filters.get('cursor'), filters['page_size']
+        )
+        serializer = ReservationAdminSerializer(page, many=True)
+        return Response({"results": serializer.data, "next_cursor": next_cursor})
+    except InvalidCursor as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -157,11 +291,38 @@ def admin_all_reservations(request):
 @permission_classes([IsAdminUser])
 def approve_reservation(request, reservation_id):
     try:
-        reservation = Reservation.objects.get(pk=reservation_id)
-        reservation.is_approved = True
-        reservation.save()
+        outcome = reservation_actions.apply_to_one('approve', reservation_id)
+        if outcome == 'not_found':
+            return Response({'error': 'Reservation not found'}, status=status.HTTP_404_NOT_FOUND)
+        # A concurrent cancel has already released its capacity
+        if outcome == 'cancelled':
+            return Response({'error': 'Cancelled reservations cannot be approved'}, status=status.HTTP_400_BAD_REQUEST)
         return Response({'message': 'Reservation approved successfully'})
-    except Reservation.DoesNotExist:
-        return Response({'error': 'Reservation not found'}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
-        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def admin_bulk_reservation_action(request):
+    # Approve, mark paid, check in, check out or cancel many reservations at once
+    serializer = BulkReservationActionSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    data = serializer.validated_data
+
+    try:
+        if 'ids' in data:
+            results, has_more = reservation_actions.apply_to_ids(data['action'], data['ids']), False
+        else:
+            # Large filters are worked through in batches; repeat while has_more is true
+            results, has_more = reservation_actions.apply_to_queryset(
+                data['action'], filter_admin_reservations(Reservation.objects.all(), data['filter'])
+            )
+        return Response({
+            "action": data['action'],
+            "updated": sum(1 for result in results if result['outcome'] == 'updated'),
+            "results": results,
+            "has_more": has_more,
+        }, status=status.HTTP_200_OK)
+    except Exception as e:
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -10,6 +10,7 @@ from ..serializers.user_serializers import (
     UserUpdateSerializer,
     UserProfileSerializer
 )
+from ..async_api import async_api_view, json_response
 
 @api_view(['POST'])
 @permission_classes([IsAdminUser])
@@ -75,4 +76,18 @@ def view_profile(request):
             "data": serializer.data
         })
     except Exception as e:
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+# Async version of view_profile, routed under ASGI (ASYNC_READ_VIEWS)
+@async_api_view(['GET'], authenticated=True)
+async def aview_profile(request):
+    try:
+        # The user was loaded by the async authentication, so nothing is queried here
+        serializer = UserProfileSerializer(request.user)
+        return json_response({
+            "success": True,
+            "message": "User profile fetched successfully",
+            "data": serializer.data
+        })
+    except Exception as e:
+        return json_response({"error": str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
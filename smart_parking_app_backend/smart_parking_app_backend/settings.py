@@ -17,6 +17,7 @@ load_dotenv()
 
 PAYMONGO_PUBLIC_KEY = os.getenv('PAYMONGO_PUBLIC_KEY')
 PAYMONGO_SECRET_KEY = os.getenv('PAYMONGO_SECRET_KEY')
+PAYMONGO_WEBHOOK_SECRET = os.getenv('PAYMONGO_WEBHOOK_SECRET')
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -50,6 +51,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -87,6 +89,16 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock at BEGIN so concurrent bookings queue up
+            # instead of failing when a read lock cannot be upgraded
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # File-backed test database so threaded tests get real locking
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
@@ -142,4 +154,71 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
 ]
 
-CORS_ALLOW_CREDENTIALS = True
\ No newline at end of file
+CORS_ALLOW_CREDENTIALS = True
+
+# Availability search
+# In-memory interval indexes are rebuilt after this many seconds
+AVAILABILITY_INDEX_TTL = int(os.getenv('AVAILABILITY_INDEX_TTL', 30))
+AVAILABILITY_INDEX_MAX_ENTRIES = 512
+
+# Serve the hot read endpoints with their async views (see api/urls.py).
+# Turn on when running under ASGI, e.g. uvicorn.
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', '0') == '1'
+
+# Admin dashboard summary is recomputed at most once per this many seconds
+DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', 10))
+# Past-day trend totals are kept per process for this many seconds, which
+# bounds how late changes written by other processes show up
+ROLLUP_PAST_DAY_TTL = int(os.getenv('ROLLUP_PAST_DAY_TTL', 60))
+
+# Shared secret a Prometheus scraper sends as the X-Metrics-Token header to
+# read /api/metrics/ without an admin login. Unset: admins only.
+METRICS_SCRAPE_TOKEN = os.getenv('METRICS_SCRAPE_TOKEN')
+
+# Notification push channel (served under ASGI)
+NOTIFICATION_BROKER = 'api.services.notification_bus.InProcessBroker'
+NOTIFICATION_STREAM_HEARTBEAT = 15
+NOTIFICATION_STREAM_POLL_INTERVAL = 2
+
+# PayMongo gateway client: pooled connections, (connect, read) timeouts in seconds,
+# retries for requests the gateway cannot have acted on, and a circuit breaker
+PAYMONGO_API_BASE = os.getenv('PAYMONGO_API_BASE', 'https://api.paymongo.com/v1')
+PAYMONGO_CONNECT_TIMEOUT = 3.05
+PAYMONGO_READ_TIMEOUT = 10
+PAYMONGO_MAX_RETRIES = 2
+PAYMONGO_BREAKER_THRESHOLD = 5
+PAYMONGO_BREAKER_RESET_TIMEOUT = 30
+
+# Payment webhooks: accepted clock skew for signatures (seconds), events applied
+# per worker batch, and how old a pending checkout must be before it is polled
+PAYMONGO_WEBHOOK_TOLERANCE = 300
+PAYMENT_EVENT_BATCH_SIZE = 500
+PAYMENT_RECONCILE_AFTER = 15 * 60
+
+# Idempotency-Key handling for reservation and checkout creation (seconds):
+# how long responses are replayed, how long a duplicate waits for the original,
+# and when an unfinished record is considered abandoned
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+IDEMPOTENCY_WAIT_TIMEOUT = 10
+IDEMPOTENCY_STALE_AFTER = 60
+
+# Background task queue (manage.py run_tasks). Times in seconds: how long a
+# claimed task is leased to a worker, retry backoff bounds, and how long
+# finished tasks are kept
+TASK_WORKER_THREADS = 4
+TASK_MAX_ATTEMPTS = 5
+TASK_LEASE_SECONDS = 300
+TASK_RETRY_BACKOFF = 2
+TASK_RETRY_MAX_BACKOFF = 300
+TASK_RETENTION = 24 * 60 * 60
+
+# Reservation sweeper (manage.py sweep_reservations): minutes after a
+# reservation ends before it counts as a no-show or overstay, unless its
+# location sets its own, and reservations handled per batch
+NO_SHOW_GRACE_MINUTES = 120
+SWEEP_BATCH_SIZE = 500
+
+# Archiving (manage.py archive_reservations): reservations dated more than
+# this many days ago move to the archive tables, this many per transaction
+RESERVATION_RETENTION_DAYS = 365
+ARCHIVE_CHUNK_SIZE = 1000